@@ -0,0 +1,67 @@
+from core.components import Chunk, Document
+from core.processes import DialogueGenerator
+from mock_openai_server import MockOpenAIServer
+from argparse import ArgumentParser
+import json
+import os
+import tempfile
+import time
+
+def write_documents(jsonl_path: str, n_documents: int, chunks_per_document: int) -> None:
+    # Chunks of ~2500 characters, so that each source text (~5000 characters) is about two chunks
+    for doc_idx in range(n_documents):
+        doc_id = f"dc{doc_idx}"
+        chunks = [
+            Chunk(id=Chunk.get_id(doc_id, chunk_idx), text=f"Sentence {chunk_idx} of document {doc_idx}. " * 60)
+            for chunk_idx in range(chunks_per_document)
+        ]
+        Document(output_file=jsonl_path, file_name=f"doc{doc_idx}.pdf", id=doc_id, chunks=chunks).save()
+
+def run(documents_jsonl: str, prompt_path: str, output_jsonl: str, base_url: str, concurrency: int,
+        requests_per_minute: int) -> tuple[float, list[str]]:
+    # Time to generate all the dialogues from scratch, and the saved records in order
+    if os.path.exists(output_jsonl):
+        os.remove(output_jsonl)
+    generator = DialogueGenerator(
+        documents_jsonl,
+        output_jsonl,
+        prompt_path,
+        concurrency=concurrency,
+        requests_per_minute=requests_per_minute,
+        base_url=base_url
+    )
+    start = time.perf_counter()
+    generator.generate_all()
+    elapsed = time.perf_counter() - start
+    with open(output_jsonl, "r", encoding="utf-8") as f:
+        return elapsed, [json.loads(line)["id"] for line in f]
+
+def main(args):
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    with tempfile.TemporaryDirectory() as tmp_dir, MockOpenAIServer(delay=args.delay) as server:
+        documents_jsonl = os.path.join(tmp_dir, "documents.jsonl")
+        write_documents(documents_jsonl, args.documents, args.chunks)
+        print(f"{args.documents} documents of {args.chunks} chunks, {args.delay}s of latency per request")
+        print(f"{'concurrency':>11} {'dialogues':>9} {'seconds':>8} {'dialogues/s':>11} {'max in flight':>13} {'speedup':>8}")
+        baseline_time = reference_ids = None
+        for concurrency in args.concurrency:
+            server.reset_stats()
+            output_jsonl = os.path.join(tmp_dir, f"dialogues_{concurrency}.jsonl")
+            elapsed, ids = run(documents_jsonl, args.prompt_path, output_jsonl, server.base_url, concurrency, args.requests_per_minute)
+            baseline_time = baseline_time or elapsed
+            reference_ids = reference_ids or ids
+            if ids != reference_ids:
+                raise ValueError(f"The dialogues saved with concurrency {concurrency} differ from the first run.")
+            print(f"{concurrency:>11} {len(ids):>9} {elapsed:>8.2f} {len(ids) / elapsed:>11.1f} "
+                  f"{server.stats['max_in_flight']:>13} {baseline_time / elapsed:>7.1f}x")
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Measures the dialogue generation throughput against a local mock OpenAI server, for several concurrency levels.")
+    parser.add_argument("--prompt_path", type=str, default="prompts/dialogue_prompt.txt")
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--chunks", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=0.2, help="Latency of each request in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests_per_minute", type=int, default=None)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,129 @@
+from core.components import DPODialogue, DPOTurn
+from core.loaders import DPODialogueLoader
+from argparse import ArgumentParser
+import os
+import random
+import tempfile
+import time
+
+class LegacyDPODialogueLoader(DPODialogueLoader):
+    """
+    DPODialogueLoader before the DPO trees, copied as is: the file is only indexed by DPO dialogue ID
+    and the queries scan the IDs of every dialogue. The reference the current loader must agree with.
+    """
+    def load_data(self) -> list[DPODialogue]:
+        if not os.path.exists(self.jsonl_path):
+            return []
+        with open(self.jsonl_path, 'r', encoding='utf-8') as file:
+            data = [DPODialogue(json_str=line) for line in file if line.strip()]
+        self.id2idx = {dialogue.id: idx for idx, dialogue in enumerate(data)}
+        return data
+
+    def load_index(self):
+        return {dialogue.id for dialogue in self.data}
+
+    def get_unique_dpo_ids(self) -> list[str]:
+        uniques = set()
+        for dialogue in self.data:
+            id = dialogue.id
+            if id in uniques:
+                continue
+            uniques.add(id)
+
+            prev = DPODialogue.get_previous_dpo_id(id)
+            while prev:
+                uniques.discard(prev)
+                prev = DPODialogue.get_previous_dpo_id(prev)
+        lst = list(uniques)
+        lst.sort(key=lambda x: (len(x), x))
+        return lst
+
+    def get_dpo_turns_by_dialogue_id(self, dpo_dialogue_id: str) -> list[DPOTurn]:
+        dpo_dialogue = self.get_dpo_dialogue_by_id(dpo_dialogue_id)
+        turns = [dpo_dialogue.last_turn]
+        prev = DPODialogue.get_previous_dpo_id(dpo_dialogue_id)
+        while prev:
+            dpo_dialogue = self.get_dpo_dialogue_by_id(prev)
+            turns.append(dpo_dialogue.last_turn)
+            prev = DPODialogue.get_previous_dpo_id(prev)
+        return turns[::-1]
+
+    def get_dpo_dialogues_by_dialogue_id(self, dialogue_id: str) -> list[DPODialogue]:
+        unique_dpo_ids = self.get_unique_dpo_ids()
+        dpo_dialogues = [dpo_id for dpo_id in unique_dpo_ids if dpo_id.startswith(dialogue_id)]
+        return [self.data[self.id2idx[dpo_id]] for dpo_id in dpo_dialogues]
+
+    def contains_std_dialogue(self, dialogue_id: str) -> bool:
+        return any(dialogue_id in dialogue.id for dialogue in self.data)
+
+def write_dpo_dialogues(jsonl_path: str, n_rows: int, branching: int, depth: int, seed: int) -> list[str]:
+    # DPO trees of `branching` continuations per turn and `depth` turns, written parents first as
+    # DPOGenerator does. Returns the standard dialogue IDs.
+    rng = random.Random(seed)
+    rows_per_tree = sum(branching ** level for level in range(1, depth + 1))
+    std_ids = [f"dc{i // 4}_ch[{i % 4}_{i % 4 + 1}]" for i in range(max(1, n_rows // rows_per_tree))]
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        for std_id in std_ids:
+            stack = [[]]
+            while stack:
+                rules_idx_used = stack.pop()
+                if len(rules_idx_used) == depth:
+                    continue
+                for rule_idx in rng.sample(range(33), branching):
+                    child = rules_idx_used + [rule_idx]
+                    turn = DPOTurn(
+                        student_question=f"question {len(child)}",
+                        positive_answer=f"positive answer {rule_idx}",
+                        negative_answer=f"negative answer {rule_idx}",
+                        rule_used=rule_idx
+                    )
+                    dialogue = DPODialogue(id=DPODialogue.get_id(std_id, child), last_turn=turn, output_jsonl=jsonl_path)
+                    f.write(dialogue.to_json_str() + "\n")
+                    stack.append(child)
+    return std_ids
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jsonl_path = os.path.join(tmp_dir, "dpo_dialogues.jsonl")
+        std_ids = write_dpo_dialogues(jsonl_path, args.rows, args.branching, args.depth, args.seed)
+        legacy_time, legacy = timed(LegacyDPODialogueLoader, jsonl_path)
+        current_time, current = timed(DPODialogueLoader, jsonl_path)
+        print(f"{len(current.data)} DPO dialogues of {len(std_ids)} standard dialogues, {len(current.leaves)} leaves")
+        print(f"{'operation':<38} {'legacy (s)':>10} {'trees (s)':>10} {'speedup':>8}")
+        print(f"{'load':<38} {legacy_time:>10.3f} {current_time:>10.3f} {legacy_time / current_time:>7.1f}x")
+
+        # Half of the lookups are for standard dialogues that have no DPO dialogue
+        rng = random.Random(args.seed)
+        queried = [rng.choice(std_ids) for _ in range(args.queries)]
+        missing = [f"dc{len(std_ids) + i}_ch[0_1]" for i in range(args.queries)]
+        leaf_ids = [rng.choice(current.get_unique_dpo_ids()) for _ in range(args.queries)]
+        operations = [
+            ("get_unique_dpo_ids", lambda loader: [loader.get_unique_dpo_ids()]),
+            (f"contains_std_dialogue x{2 * args.queries}",
+             lambda loader: [loader.contains_std_dialogue(std_id) for std_id in queried + missing]),
+            (f"get_dpo_dialogues_by_dialogue_id x{args.queries}",
+             lambda loader: [[d.id for d in loader.get_dpo_dialogues_by_dialogue_id(std_id)] for std_id in queried]),
+            (f"get_dpo_turns_by_dialogue_id x{args.queries}",
+             lambda loader: [[t.to_dict() for t in loader.get_dpo_turns_by_dialogue_id(dpo_id)] for dpo_id in leaf_ids]),
+        ]
+        for name, operation in operations:
+            legacy_time, legacy_result = timed(operation, legacy)
+            current_time, current_result = timed(operation, current)
+            if legacy_result != current_result:
+                raise ValueError(f"{name} differs between the legacy loader and the DPO trees.")
+            print(f"{name:<38} {legacy_time:>10.3f} {current_time:>10.3f} {legacy_time / current_time:>7.1f}x")
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Compares the DPODialogueLoader queries on the DPO trees with the original ID scans, on a synthetic file.")
+    parser.add_argument("--rows", type=int, default=1000000, help="Approximate number of DPO dialogues")
+    parser.add_argument("--branching", type=int, default=2, help="Continuations of each turn")
+    parser.add_argument("--depth", type=int, default=3, help="Turns of each dialogue")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
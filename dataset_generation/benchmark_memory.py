@@ -0,0 +1,52 @@
+from core.components import DPODialogue, DPOTurn
+from argparse import ArgumentParser
+import gc
+import tracemalloc
+
+# Subclasses without __slots__ get a __dict__ again, i.e. the memory layout of the components before
+# they were slotted
+class DictDPOTurn(DPOTurn):
+    pass
+
+class DictDPODialogue(DPODialogue):
+    pass
+
+def build(n_turns: int, turn_cls: type, dialogue_cls: type) -> list:
+    # One DPO dialogue per turn, as DPODialogueLoader holds them, with distinct short strings
+    return [
+        dialogue_cls(
+            id=DPODialogue.get_id(f"dc{i // 100}_ch[0_1]", [i % 33]),
+            last_turn=turn_cls(
+                student_question=f"question {i}",
+                positive_answer=f"positive answer {i}",
+                negative_answer=f"negative answer {i}",
+                rule_used=i % 33
+            ),
+            output_jsonl="unused.jsonl"
+        )
+        for i in range(n_turns)
+    ]
+
+def measure(n_turns: int, turn_cls: type, dialogue_cls: type) -> int:
+    # Bytes allocated to hold the objects, strings included
+    gc.collect()
+    tracemalloc.start()
+    objects = build(n_turns, turn_cls, dialogue_cls)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return size
+
+def main(args):
+    print(f"{args.turns} DPO turns (one DPODialogue each)")
+    sizes = {}
+    for name, turn_cls, dialogue_cls in [("dict", DictDPOTurn, DictDPODialogue), ("slots", DPOTurn, DPODialogue)]:
+        sizes[name] = measure(args.turns, turn_cls, dialogue_cls)
+        print(f"{name:>6}: {sizes[name] / 2**20:8.1f} MB, {sizes[name] / args.turns:6.0f} bytes per turn")
+    print(f"saved: {(sizes['dict'] - sizes['slots']) / 2**20:.1f} MB ({1 - sizes['slots'] / sizes['dict']:.0%})")
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Measures the memory held by DPO turns with slotted and dict-backed components.")
+    parser.add_argument("--turns", type=int, default=1000000)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,39 @@
+from core import serialization
+from migrate_dataset import detect_component
+from argparse import ArgumentParser
+import time
+
+def measure(function, items: list, repeat: int) -> float:
+    # Best time of a few runs over all the items, in seconds
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            function(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(args):
+    component_cls = detect_component(args.jsonl)
+    with open(args.jsonl, "r", encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    size_mb = sum(len(line.encode("utf-8")) for line in lines) / 2**20
+    print(f"{args.jsonl}: {len(lines)} {component_cls.__name__} records, {size_mb:.1f} MB")
+    print(f"{'backend':>8} {'decode rec/s':>13} {'decode MB/s':>12} {'encode rec/s':>13} {'encode MB/s':>12}")
+
+    for backend in serialization.available_backends():
+        serialization.set_backend(backend)
+        # Records are decoded from the file as is (v1 or v2) and encoded in the current format
+        components = [component_cls(json_str=line) for line in lines]
+        encoded_mb = sum(len(component.to_json_str().encode("utf-8")) for component in components) / 2**20
+        decode_time = measure(lambda line: component_cls(json_str=line), lines, args.repeat)
+        encode_time = measure(lambda component: component.to_json_str(), components, args.repeat)
+        print(f"{backend:>8} {len(lines) / decode_time:>13.0f} {size_mb / decode_time:>12.1f} "
+              f"{len(lines) / encode_time:>13.0f} {encoded_mb / encode_time:>12.1f}")
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Measures the encode/decode throughput of the components with each installed JSON backend.")
+    parser.add_argument("--jsonl", type=str, default="data/dialogues.jsonl")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args)
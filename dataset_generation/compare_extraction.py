@@ -0,0 +1,157 @@
+from core.components import Document
+from core.loaders import DocumentLoader
+from core.processes import ChunkExtractor
+from core import serialization
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from pypdf import PdfReader, PdfWriter
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+def read_documents(output_jsonl: str) -> dict[str, dict]:
+    # The saved documents by ID, independent of the order they were saved in
+    return {document.id: serialization.loads(document.to_json_str()) for document in DocumentLoader(output_jsonl).data}
+
+def extract(pdfs_path: str, output_jsonl: str, **kwargs) -> tuple[float, dict[str, dict]]:
+    # Time to extract the PDF files from scratch, and the saved documents
+    start = time.perf_counter()
+    ChunkExtractor(pdfs_path, output_jsonl, **kwargs).extract_texts()
+    return time.perf_counter() - start, read_documents(output_jsonl)
+
+def compare(reference: dict[str, dict], documents: dict[str, dict]) -> list[str]:
+    """
+    Returns:
+        list[str]: The differences between two extractions, empty if they saved the same documents.
+    """
+    problems = [f"{doc_id} is missing" for doc_id in reference.keys() - documents.keys()]
+    problems += [f"{doc_id} is unexpected" for doc_id in documents.keys() - reference.keys()]
+    problems += [
+        f"{doc_id} ({reference[doc_id]['file_name']}) differs"
+        for doc_id in reference.keys() & documents.keys()
+        if reference[doc_id] != documents[doc_id]
+    ]
+    return sorted(problems)
+
+@contextmanager
+def recording_reads():
+    # Records the names of the PDF files read by the extractions of this process
+    reads = []
+    read_pdf_text, read_pdf_pages = ChunkExtractor._read_pdf_text, ChunkExtractor._read_pdf_pages
+    def recorded(read):
+        def read_recorded(pdf_file):
+            reads.append(os.path.basename(pdf_file))
+            return read(pdf_file)
+        return staticmethod(read_recorded)
+    ChunkExtractor._read_pdf_text, ChunkExtractor._read_pdf_pages = recorded(read_pdf_text), recorded(read_pdf_pages)
+    try:
+        yield reads
+    finally:
+        ChunkExtractor._read_pdf_text, ChunkExtractor._read_pdf_pages = read_pdf_text, read_pdf_pages
+
+def check_manifest(pdfs_path: str, tmp_dir: str, reference: dict[str, dict], reference_jsonl: str) -> int:
+    """
+    Runs the manifest extractions on a copy of the PDF directory: a first run, a re-run, a run after
+    adding, renaming, duplicating and touching files, and the adoption of an output saved without a
+    manifest. Checks which files each run reads and that the existing documents keep their IDs.
+
+    Returns:
+        int: The number of runs that did not behave as expected.
+    """
+    pdfs_copy = os.path.join(tmp_dir, "pdfs")
+    shutil.copytree(pdfs_path, pdfs_copy)
+    output_jsonl, manifest_jsonl = os.path.join(tmp_dir, "manifest.jsonl"), os.path.join(tmp_dir, "manifest_entries.jsonl")
+    pdf_files = ChunkExtractor._load_pdf_files(pdfs_copy)
+    failures = 0
+
+    def run(name: str, expected_reads: list[str], expected: dict[str, dict], output_jsonl: str, manifest_jsonl: str,
+            new_document: tuple[str, str] = None) -> None:
+        # new_document is the (ID, file name) of the one document expected besides the expected ones
+        nonlocal failures
+        with recording_reads() as reads:
+            start = time.perf_counter()
+            ChunkExtractor(pdfs_copy, output_jsonl, manifest_jsonl=manifest_jsonl).extract_texts()
+            elapsed = time.perf_counter() - start
+        documents = read_documents(output_jsonl)
+        others = dict(documents)
+        problems = []
+        if new_document is not None:
+            new_id, new_file_name = new_document
+            if others.pop(new_id, {}).get("file_name") != new_file_name:
+                problems.append(f"{new_file_name} was not saved as {new_id}")
+        problems += compare(expected, others)
+        if sorted(reads) != sorted(expected_reads):
+            problems.append(f"read {sorted(reads)} instead of {sorted(expected_reads)}")
+        failures += bool(problems)
+        report(name, elapsed, documents, problems)
+
+    all_files = [os.path.basename(pdf_file) for pdf_file in pdf_files]
+    run("manifest", all_files, reference, output_jsonl, manifest_jsonl)
+    run("manifest, re-run", [], reference, output_jsonl, manifest_jsonl)
+
+    # A new file sorting first (the pages of the first and last files), the first file renamed, the
+    # second one touched and the third one duplicated: only the new file is read, and gets a new ID
+    writer = PdfWriter()
+    for pdf_file in (pdf_files[0], pdf_files[-1]):
+        for page in PdfReader(pdf_file).pages:
+            writer.add_page(page)
+    with open(os.path.join(pdfs_copy, "0_new.pdf"), "wb") as f:
+        writer.write(f)
+    os.rename(pdf_files[0], os.path.join(os.path.dirname(pdf_files[0]), "zz_" + all_files[0]))
+    if len(pdf_files) > 1:
+        os.utime(pdf_files[1], ns=(os.stat(pdf_files[1]).st_atime_ns, os.stat(pdf_files[1]).st_mtime_ns + 10**9))
+    if len(pdf_files) > 2:
+        shutil.copy(pdf_files[2], os.path.join(os.path.dirname(pdf_files[2]), "copy_" + all_files[2]))
+    new_id = Document.get_id(max(Document.get_int_id(doc_id) for doc_id in reference) + 1)
+    run("manifest, files changed", ["0_new.pdf"], reference, output_jsonl, manifest_jsonl, (new_id, "0_new.pdf"))
+    run("manifest, re-run", [], reference, output_jsonl, manifest_jsonl, (new_id, "0_new.pdf"))
+
+    # An output saved without a manifest is adopted as is
+    for pdf_file in ChunkExtractor._load_pdf_files(pdfs_copy):
+        os.remove(pdf_file)
+    shutil.copytree(pdfs_path, pdfs_copy, dirs_exist_ok=True)
+    adopted_jsonl = os.path.join(tmp_dir, "adopted.jsonl")
+    shutil.copy(reference_jsonl, adopted_jsonl)
+    run("manifest, adoption", [], reference, adopted_jsonl, os.path.join(tmp_dir, "adopted_entries.jsonl"))
+    return failures
+
+def report(name: str, elapsed: float, documents: dict[str, dict], problems: list[str]) -> None:
+    chunks = sum(len(document["chunks"]) for document in documents.values())
+    print(f"{name:<24} {len(documents):>9} {chunks:>7} {elapsed:>8.2f} {len(problems):>8}")
+    for problem in problems[:5]:
+        print(f"    {problem}")
+
+def main(args):
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"{'extraction':<24} {'documents':>9} {'chunks':>7} {'seconds':>8} {'problems':>8}")
+        reference_jsonl = os.path.join(tmp_dir, "sequential.jsonl")
+        elapsed, reference = extract(args.pdfs_path, reference_jsonl)
+        report("sequential", elapsed, reference, [])
+
+        # The document IDs must not depend on the number of workers nor on their completion order
+        for workers in args.workers:
+            elapsed, documents = extract(args.pdfs_path, os.path.join(tmp_dir, f"workers_{workers}.jsonl"), workers=workers)
+            problems = compare(reference, documents)
+            failures += bool(problems)
+            report(f"{workers} workers", elapsed, documents, problems)
+
+        # The pages fed one by one to the incremental chunker must give the chunks of the whole text
+        for workers in [1] + args.workers:
+            elapsed, documents = extract(args.pdfs_path, os.path.join(tmp_dir, f"streaming_{workers}.jsonl"),
+                                         workers=workers, streaming=True)
+            problems = compare(reference, documents)
+            failures += bool(problems)
+            report(f"streaming, {workers} workers", elapsed, documents, problems)
+
+        failures += check_manifest(args.pdfs_path, tmp_dir, reference, reference_jsonl)
+    return failures
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Checks that the ChunkExtractor modes save the same documents as the sequential extraction of a PDF directory.")
+    parser.add_argument("pdfs_path", type=str, help="Directory of PDF files, left untouched")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+    sys.exit(1 if main(args) else 0)
@@ -0,0 +1,128 @@
+from core.components import Document, Chunk, Dialogue, Turn, DPODialogue, DPOTurn
+from core import serialization
+from migrate_dataset import detect_component, migrate_file
+from argparse import ArgumentParser
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+# Pieces the random texts are made of: the characters the two encodings escape differently
+FRAGMENTS = ["the", "student", " ", "\n", "\t", "\"", "\\", "/", "{", "}", "[", "]", ",", ":", "café", "über", "–", "“quote”", "æ", " ", "🙂"]
+
+def random_text(rng: random.Random) -> str:
+    return "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 30)))
+
+def v1_json_str(component) -> str:
+    # The encoding of the components before the format versions: untagged records holding each
+    # sub-component as a JSON string
+    if isinstance(component, Document):
+        return json.dumps({"id": component.id, "file_name": component.file_name,
+                           "chunks": [json.dumps(chunk.to_dict()) for chunk in component.chunks]})
+    if isinstance(component, Dialogue):
+        return json.dumps({"id": component.id, "turns": [json.dumps(turn.to_dict()) for turn in component.turns]})
+    return json.dumps({"id": component.id, "last_turn": json.dumps(component.last_turn.to_dict())})
+
+def random_components(rng: random.Random, n_records: int, output_file: str) -> dict[type, list]:
+    documents, dialogues, dpo_dialogues = [], [], []
+    for i in range(n_records):
+        doc_id = Document.get_id(i)
+        chunks = [Chunk(id=Chunk.get_id(doc_id, j), text=random_text(rng)) for j in range(rng.randint(0, 4))]
+        documents.append(Document(output_file, f"{random_text(rng)}.pdf", doc_id, chunks))
+        dialogue_id = f"{doc_id}_ch[0_1]"
+        turns = [Turn(user=random_text(rng), assistant=random_text(rng)) for _ in range(rng.randint(0, 4))]
+        dialogues.append(Dialogue(output_file, dialogue_id, turns))
+        last_turn = DPOTurn(
+            student_question=random_text(rng),
+            positive_answer=random_text(rng),
+            negative_answer=random_text(rng),
+            rule_used=rng.randint(0, 32)
+        )
+        dpo_dialogues.append(DPODialogue(DPODialogue.get_id(dialogue_id, [last_turn.rule_used]), last_turn, output_jsonl=output_file))
+    return {Document: documents, Dialogue: dialogues, DPODialogue: dpo_dialogues}
+
+def sub_components(component) -> list:
+    if isinstance(component, Document):
+        return component.chunks
+    if isinstance(component, Dialogue):
+        return component.turns
+    return [component.last_turn]
+
+def nested_data(component) -> dict:
+    # The content of a component, independent of the encoding it was read from
+    data = serialization.loads(component.to_json_str())
+    data.pop("version")
+    return data
+
+def check_file(jsonl_path: str, expected: list = None) -> list[str]:
+    """
+    Migrates a copy of a JSONL file and checks that every record, and every sub-component in it, decodes
+    to the same data before and after, and that a second migration leaves the file unchanged.
+
+    Returns:
+        list[str]: The problems found, empty if the migration is lossless.
+    """
+    component_cls = detect_component(jsonl_path)
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        migrated_path = os.path.join(tmp_dir, os.path.basename(jsonl_path))
+        shutil.copy2(jsonl_path, migrated_path)
+        migrate_file(migrated_path, backup=False)
+        with open(jsonl_path, "r", encoding="utf-8") as f:
+            old_lines = [line for line in f if line.strip()]
+        with open(migrated_path, "r", encoding="utf-8") as f:
+            new_lines = [line for line in f if line.strip()]
+            f.seek(0)
+            migrated = f.read()
+        if len(old_lines) != len(new_lines):
+            return [f"{len(old_lines)} records before the migration, {len(new_lines)} after"]
+        for idx, (old_line, new_line) in enumerate(zip(old_lines, new_lines)):
+            old, new = component_cls(json_str=old_line), component_cls(json_str=new_line)
+            if serialization.loads(new_line).get("version") != component_cls.FORMAT_VERSION:
+                problems.append(f"record {idx} is not in format version {component_cls.FORMAT_VERSION}")
+            if nested_data(old) != nested_data(new):
+                problems.append(f"record {idx} ({old.id}) changed")
+            if expected is not None and nested_data(expected[idx]) != nested_data(new):
+                problems.append(f"record {idx} ({old.id}) differs from the component it was written from")
+            for sub in sub_components(new):
+                data = sub.to_dict()
+                if type(sub)(json_dict=data).to_dict() != data or type(sub)(json_str=sub.to_json_str()).to_dict() != data:
+                    problems.append(f"a {type(sub).__name__} of record {idx} ({old.id}) does not re-encode to the same data")
+        migrate_file(migrated_path, backup=False)
+        with open(migrated_path, "r", encoding="utf-8") as f:
+            if f.read() != migrated:
+                problems.append("migrating the file again changed it")
+    return problems
+
+def main(args):
+    failures = 0
+    for backend in serialization.available_backends():
+        serialization.set_backend(backend)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            components = random_components(random.Random(args.seed), args.records, os.path.join(tmp_dir, "unused.jsonl"))
+            for component_cls, records in components.items():
+                jsonl_path = os.path.join(tmp_dir, f"{component_cls.__name__}.jsonl")
+                with open(jsonl_path, "w", encoding="utf-8") as f:
+                    f.writelines(v1_json_str(record) + "\n" for record in records)
+                problems = check_file(jsonl_path, records)
+                failures += bool(problems)
+                print(f"[{backend}] {len(records)} random v1 {component_cls.__name__} records: {len(problems)} problems")
+                for problem in problems[:5]:
+                    print(f"    {problem}")
+        for jsonl_path in args.jsonl_files:
+            problems = check_file(jsonl_path)
+            failures += bool(problems)
+            print(f"[{backend}] {jsonl_path}: {len(problems)} problems")
+            for problem in problems[:5]:
+                print(f"    {problem}")
+    return failures
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Checks that migrate_dataset.py converts v1 documents, dialogues and DPO dialogues to the current format without changing their content, with every installed JSON backend.")
+    parser.add_argument("jsonl_files", type=str, nargs="*", help="JSONL files to check as well, left untouched")
+    parser.add_argument("--records", type=int, default=2000, help="Number of random records of each component")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(1 if main(args) else 0)
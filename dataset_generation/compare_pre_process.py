@@ -0,0 +1,218 @@
+from core.processes import ChunkExtractor
+from argparse import ArgumentParser
+from unidecode import unidecode
+import random
+import re
+import sys
+import tempfile
+import time
+
+class LegacyPreprocessor:
+    """
+    The text pipeline of ChunkExtractor before the single scan segmentation, copied as is: the reference
+    the current _pre_process must reproduce exactly.
+    """
+    EMAIL_TOKEN = "<EMAIL_TOKEN>"
+    URL_TOKEN = "<URL_TOKEN>"
+    SMALL_WORDS_TOKEN = "<SMALL_WORDS_TOKEN>"
+    PUNCTUATION_TOKEN = "<PUNCTUATION_TOKEN>"
+
+    def __init__(self, chunk_min_length: int = 1000, chunk_max_length: int = 7000):
+        self.CHUNK_MIN_LENGTH = chunk_min_length
+        self.CHUNK_MAX_LENGTH = chunk_max_length
+
+    def pre_process(self, text: str) -> list[str]:
+        text = unidecode(text)
+        text = self._remove_references(text)
+        text, emails = self._remove_emails(text)
+        text, urls = self._remove_urls(text)
+        text, small_words = self._remove_small_words(text, 4)
+        text, punctuation = self._remove_punctuation(text)
+        text = self._add_small_words(text, small_words)
+        text = self._add_urls(text, urls)
+        text = self._add_emails(text, emails)
+
+        chunks = text.split(self.PUNCTUATION_TOKEN)
+        for i in range(len(chunks)):
+            if i < len(punctuation):
+                chunks[i] = chunks[i] + punctuation[i]
+
+        chunks = self._unify_chunks(chunks)
+        chunks = self._polish_chunks(chunks)
+
+        return chunks
+
+    def _remove_references(self, text: str) -> str:
+        search_text = text.lower()
+        references_count = search_text.count("references")
+        if references_count == 0:
+            return text
+
+        references_index = -1
+        if " references " in search_text:
+            references_index = search_text.rindex(" references ")
+        elif " references" in search_text:
+            references_index = search_text.rindex(" references")
+        elif "references" in search_text:
+            references_index = search_text.rindex("references")
+            words = [
+                "coreferences",
+                "crossreferences",
+                "dereferences",
+                "georeferences",
+                "preferences",
+                "references",
+                "subreferences"
+            ]
+            max_length = max(len(word) for word in words)
+            left_idx = references_index - max_length if references_index - max_length > 0 else 0
+            right_idx = references_index + len("references")
+            matched_word = search_text[left_idx:right_idx]
+            for word in words:
+                if word in matched_word:
+                    references_index = -1
+                    break
+        return text[:references_index]
+
+    def _remove_emails(self, text: str):
+        email_regex = r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+"
+        emails = re.findall(email_regex, text)
+        text = re.sub(email_regex, self.EMAIL_TOKEN, text)
+        return text, emails
+
+    def _remove_urls(self, text: str):
+        url_regex = r"https?://[^\s]+"
+        urls = re.findall(url_regex, text)
+        text = re.sub(url_regex, self.URL_TOKEN, text)
+        return text, urls
+
+    def _remove_punctuation(self, text: str):
+        punctuation = re.findall(r"[.!?;]", text)
+        text = re.sub(r"[.!?;]", self.PUNCTUATION_TOKEN, text)
+        return text, punctuation
+
+    def _remove_small_words(self, text: str, max_length: int):
+        small_word_regex = r"\b\w{1," + str(max_length) + r"}\.(?!\n)"
+        small_words = re.findall(small_word_regex, text)
+        text = re.sub(small_word_regex, self.SMALL_WORDS_TOKEN, text)
+        return text, small_words
+
+    def _add_emails(self, text: str, emails: list):
+        for email in emails:
+            text = text.replace(self.EMAIL_TOKEN, email, 1)
+        return text
+
+    def _add_urls(self, text: str, urls: list):
+        for url in urls:
+            text = text.replace(self.URL_TOKEN, url, 1)
+        return text
+
+    def _add_small_words(self, text: str, small_words: list):
+        for word in small_words:
+            text = text.replace(self.SMALL_WORDS_TOKEN, word, 1)
+        return text
+
+    def _unify_chunks(self, chunks: list[str]) -> list[str]:
+        if len(chunks) <= 1:
+            return chunks
+
+        unified_chunks = [chunks[0]]
+        matches = ["\n", "\t", " "]
+
+        for i in range(1, len(chunks)):
+            last_chunk = unified_chunks[-1]
+            current_chunk = chunks[i]
+            if (len(last_chunk) < self.CHUNK_MIN_LENGTH or
+                current_chunk.startswith(tuple(matches)) or
+                last_chunk.endswith(tuple(matches))) and \
+                len(last_chunk) + len(current_chunk) < self.CHUNK_MAX_LENGTH:
+                unified_chunks[-1] += ' ' + current_chunk
+            else:
+                unified_chunks.append(current_chunk)
+        return unified_chunks
+
+    def _polish_chunks(self, chunks: list[str]) -> list[str]:
+        polished_chunks = []
+        for chunk in chunks:
+            chunk = chunk.replace("\n", "").strip()
+            if not chunk or len(re.sub(r"[^a-zA-Z0-9]", "", chunk)) / len(chunk) < 0.5:
+                continue
+            polished_chunks.append(chunk)
+        return polished_chunks
+
+# Pieces the random texts are made of, dense in the cases the segmentation must get right: emails and
+# URLs glued to words and punctuation, small words, newlines after dots, non-ASCII text, references
+FRAGMENTS = [
+    "the", "learning", "students", "Fig", "e.g", "i.e", "al", "etc", "x", "ab", "abcd", "abcde", "_ab", "a_b",
+    " ", " ", " ", "  ", "\n", "\t", ".", ".", ".", "!", "?", ";", ",", ":", "@", "_", "-", "+", "/",
+    "x@y.com", "a.b@c-d.org", "_ab.@cd.e", "https://", "http://a.b/c?d", "https://x.org/a.b;c", "www",
+    "café", "über", "–", "“quote”", "Straße", "æ",
+    " references ", "References", "preferences", "coreferences", "\n1. ", "3.14", "2024."
+]
+
+def random_text(rng: random.Random, max_fragments: int) -> str:
+    return "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, max_fragments)))
+
+def random_pages(rng: random.Random, text: str, max_pages: int) -> list[str]:
+    # Splits a text at random positions, as the pages of a PDF may cut it anywhere
+    cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(0, max_pages - 1)))
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+def compare(extractor: ChunkExtractor, legacy: LegacyPreprocessor, text: str) -> bool:
+    return extractor._pre_process(text) == legacy.pre_process(text)
+
+def compare_streaming(extractor: ChunkExtractor, pages: list[str]) -> bool:
+    return list(extractor._pre_process_pages(pages)) == extractor._pre_process("".join(pages))
+
+def main(args):
+    legacy = LegacyPreprocessor(args.chunk_min_length, args.chunk_max_length)
+    extractor = ChunkExtractor(tempfile.mkdtemp(), "unused.jsonl", args.chunk_min_length, args.chunk_max_length)
+    mismatches = 0
+
+    rng = random.Random(args.seed)
+    start = time.time()
+    for i in range(args.texts):
+        text = random_text(rng, args.max_fragments)
+        if not compare(extractor, legacy, text):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"mismatch on random text {i}: {text!r}")
+        pages = random_pages(rng, text, args.max_pages)
+        if not compare_streaming(extractor, pages):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"streaming mismatch on random text {i}: {pages!r}")
+    print(f"{args.texts} random texts compared in {time.time() - start:.1f}s")
+
+    # Real documents, e.g. the text of the PDFs
+    for path in args.files:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        start = time.time()
+        legacy_chunks = legacy.pre_process(text)
+        legacy_time = time.time() - start
+        start = time.time()
+        chunks = extractor._pre_process(text)
+        current_time = time.time() - start
+        if chunks != legacy_chunks:
+            mismatches += 1
+            print(f"mismatch on {path}")
+        if not compare_streaming(extractor, random_pages(rng, text, args.max_pages)):
+            mismatches += 1
+            print(f"streaming mismatch on {path}")
+        print(f"{path}: {len(chunks)} chunks, legacy {legacy_time:.3f}s, current {current_time:.3f}s")
+
+    print(f"{mismatches} mismatches")
+    return mismatches
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Checks that ChunkExtractor._pre_process gives the same chunks as the original token based pipeline, and the streaming mode the same chunks as _pre_process on the text split into random pages, on random texts and on text files.")
+    parser.add_argument("files", type=str, nargs="*", help="UTF-8 text files to compare as well")
+    parser.add_argument("--texts", type=int, default=20000, help="Number of random texts")
+    parser.add_argument("--max_fragments", type=int, default=60)
+    parser.add_argument("--max_pages", type=int, default=12, help="Maximum number of pages the texts are split into for the streaming mode")
+    parser.add_argument("--chunk_min_length", type=int, default=20)
+    parser.add_argument("--chunk_max_length", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(1 if main(args) else 0)
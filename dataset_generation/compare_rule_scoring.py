@@ -0,0 +1,103 @@
+from core.processes import DPOGenerator
+from core.loaders import DialogueLoader
+from core.components import DPOTurn
+from argparse import ArgumentParser
+import os
+import random
+import tempfile
+import time
+
+def sample_turns(dialogues_json: str, max_turns: int, seed: int) -> list[tuple[list[DPOTurn], object]]:
+    """
+    Samples (conversation so far, upcoming turn) pairs from the dialogues, using the original
+    tutor answers as the conversation so far.
+    """
+    dialogues = DialogueLoader(dialogues_json)
+    samples = []
+    for dialogue in dialogues:
+        context = []
+        for turn in dialogue.turns:
+            samples.append((list(context), turn))
+            context.append(DPOTurn(
+                student_question=turn.user,
+                positive_answer=turn.assistant,
+                negative_answer=turn.assistant,
+                rule_used=0
+            ))
+    random.Random(seed).shuffle(samples)
+    return samples[:max_turns]
+
+def score_all(generator: DPOGenerator, samples: list) -> tuple[list[list[int]], dict, float]:
+    generator.usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    start = time.time()
+    scores = [generator._score_rules(context, turn) for context, turn in samples]
+    return scores, dict(generator.usage), time.time() - start
+
+def top_rules(scores: list[int], rule_indices: list[int]) -> set[int]:
+    # The rules the DFS would choose from: the highest scoring ones, if they score 4 or 5
+    best = max(scores)
+    if best < 4:
+        return set()
+    return {rule_idx for rule_idx, score in zip(rule_indices, scores) if score == best}
+
+def compare(reference: list[list[int]], batched: list[list[int]], rule_indices: list[int]) -> dict:
+    pairs = [(a, b) for ref_scores, bat_scores in zip(reference, batched) for a, b in zip(ref_scores, bat_scores)]
+    jaccards = []
+    for ref_scores, bat_scores in zip(reference, batched):
+        ref_top, bat_top = top_rules(ref_scores, rule_indices), top_rules(bat_scores, rule_indices)
+        union = ref_top | bat_top
+        jaccards.append(len(ref_top & bat_top) / len(union) if union else 1.0)
+    return {
+        "exact": sum(a == b for a, b in pairs) / len(pairs),
+        "within_1": sum(abs(a - b) <= 1 for a, b in pairs) / len(pairs),
+        "applicable": sum((a >= 4) == (b >= 4) for a, b in pairs) / len(pairs),
+        "top_jaccard": sum(jaccards) / len(jaccards)
+    }
+
+def main(args):
+    samples = sample_turns(args.dialogues_json, args.max_turns, args.seed)
+    print(f"Comparing rule scorings on {len(samples)} turns.")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        def make_generator(group_size=None, batched=False):
+            return DPOGenerator(
+                args.dialogues_json,
+                os.path.join(tmp_dir, "unused.jsonl"),
+                args.rules_list,
+                args.good_answer_and_question_prompt,
+                args.choose_rule_prompt,
+                model=args.model,
+                concurrency=args.concurrency,
+                base_url=args.openai_base_url,
+                batch_rules_prompt_path=args.batch_rules_prompt if batched else None,
+                rules_group_size=group_size
+            )
+
+        with make_generator() as reference_gen:
+            reference, ref_usage, ref_time = score_all(reference_gen, samples)
+        ref_tokens = ref_usage["prompt_tokens"] + ref_usage["completion_tokens"]
+        print(f"{'mode':>12} {'requests':>9} {'tokens':>10} {'time (s)':>9} {'exact':>6} {'±1':>6} {'4+':>6} {'top J':>6}")
+        print(f"{'per-rule':>12} {ref_usage['requests']:>9} {ref_tokens:>10} {ref_time:>9.1f}")
+        for group_size in args.group_sizes:
+            with make_generator(group_size, batched=True) as generator:
+                batched, usage, elapsed = score_all(generator, samples)
+            tokens = usage["prompt_tokens"] + usage["completion_tokens"]
+            metrics = compare(reference, batched, reference_gen.rule_indices)
+            print(f"{'group ' + str(group_size):>12} {usage['requests']:>9} {tokens:>10} {elapsed:>9.1f} "
+                  f"{metrics['exact']:>6.2f} {metrics['within_1']:>6.2f} {metrics['applicable']:>6.2f} {metrics['top_jaccard']:>6.2f}"
+                  f"   ({ref_tokens / max(tokens, 1):.1f}x fewer tokens)")
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Measures the agreement between per-rule and batched rule scoring.")
+    parser.add_argument("--dialogues_json", type=str, required=True)
+    parser.add_argument("--rules_list", type=str, required=True)
+    parser.add_argument("--choose_rule_prompt", type=str, required=True)
+    parser.add_argument("--batch_rules_prompt", type=str, required=True)
+    parser.add_argument("--good_answer_and_question_prompt", type=str, required=True)
+    parser.add_argument("--group_sizes", type=int, nargs="+", default=[32, 8])
+    parser.add_argument("--max_turns", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--model", type=str, default="gpt-4o")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--openai_base_url", type=str, default=None)
+    args = parser.parse_args()
+    main(args)
@@ -1,9 +1,11 @@
 from . import processes
 from . import components
 from . import loaders
+from . import clients
 
 __all__ = [
     "processes",
     "components",
-    "loaders"
+    "loaders",
+    "clients"
 ]
\ No newline at end of file
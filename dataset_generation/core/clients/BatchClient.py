@@ -0,0 +1,247 @@
+from openai import OpenAI
+from pydantic import BaseModel
+from .ResponseCache import ResponseCache
+from ..logger import logger
+import hashlib
+import json
+import os
+import time
+
+class BatchClient:
+    """
+    A client for the OpenAI Batch API, sending many structured chat completion requests as one batch.
+    Requests are written to a batch JSONL file in the work directory, submitted, polled until done and
+    their parsed responses returned by custom_id. The batch ID is saved next to the input file, so a run
+    interrupted while waiting resumes polling the same batch instead of submitting it again.
+    Attributes:
+        client (OpenAI): OpenAI client instance for API calls
+        model (str): The model of every request
+        work_dir (str): Directory holding the batch input files and their state
+        poll_interval (float): Seconds between two status checks
+        completion_window (str): The completion window of the batches
+        cache (ResponseCache): Optional response cache, cached requests are not sent
+    Methods:
+        run: Sends a list of requests as batches and returns the parsed responses
+    Example:
+        batch_client = BatchClient(OpenAI(), "gpt-4o", "batches/")
+        responses = batch_client.run("scoring", [("req-1", prompt, UseRuleSchema)])
+        score = responses["req-1"]["rule_fit_score"]
+    """
+    ENDPOINT = "/v1/chat/completions"
+    MAX_REQUESTS = 50000 # Maximum number of requests in a single batch
+    FINAL_STATUSES = ["completed", "failed", "expired", "cancelled"]
+
+    def __init__(self,
+                 client: OpenAI,
+                 model: str,
+                 work_dir: str,
+                 poll_interval: float = 60,
+                 completion_window: str = "24h",
+                 cache: ResponseCache = None):
+        self.client = client
+        self.model = model
+        self.work_dir = work_dir
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.cache = cache
+        os.makedirs(work_dir, exist_ok=True)
+
+    def run(self, name: str, requests: list[tuple[str, str, type[BaseModel]]]) -> dict[str, dict]:
+        """
+        Sends the requests as one or more batches and waits for their results.
+
+        Args:
+            name (str): Name of the batch, used for the files in the work directory
+            requests (list[tuple[str, str, type[BaseModel]]]): The custom_id, prompt and response schema of each request
+
+        Returns:
+            dict[str, dict]: The parsed response of each request by custom_id. Failed requests are logged and missing.
+
+        Raises:
+            ValueError: If two requests share the same custom_id
+        """
+        custom_ids = [custom_id for custom_id, _, _ in requests]
+        if len(set(custom_ids)) != len(custom_ids):
+            raise ValueError(f"Batch {name}: custom_id values must be unique.")
+
+        results = {}
+        pending = []
+        for custom_id, prompt, schema in requests:
+            cached = self.cache.get(self.model, schema.__name__, prompt) if self.cache is not None else None
+            if cached is not None:
+                results[custom_id] = cached
+            else:
+                pending.append((custom_id, prompt, schema))
+        logger.info(f"Batch {name}: {len(results)} requests answered by the cache, {len(pending)} to send.")
+
+        for part, start in enumerate(range(0, len(pending), self.MAX_REQUESTS)):
+            results.update(self._run_part(f"{name}_{part}", pending[start:start+self.MAX_REQUESTS]))
+        return results
+
+    def _run_part(self, name: str, requests: list[tuple[str, str, type[BaseModel]]]) -> dict[str, dict]:
+        content = "".join(json.dumps(self._request_line(*request)) + "\n" for request in requests)
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        input_path = os.path.join(self.work_dir, f"{name}.input.jsonl")
+        state_path = os.path.join(self.work_dir, f"{name}.batch.json")
+
+        batch_id = None
+        if os.path.exists(state_path):
+            with open(state_path, "r") as f:
+                state = json.load(f)
+            # Only the very same requests can resume a previous batch
+            if state["input_sha256"] == digest:
+                batch_id = state["batch_id"]
+                logger.info(f"Batch {name}: resuming batch {batch_id}.")
+        if batch_id is None:
+            with open(input_path, "w") as f:
+                f.write(content)
+            batch_id = self._submit(input_path)
+            with open(state_path, "w") as f:
+                json.dump({"batch_id": batch_id, "input_sha256": digest}, f)
+            logger.info(f"Batch {name}: submitted batch {batch_id} with {len(requests)} requests.")
+
+        schemas = {custom_id: (prompt, schema) for custom_id, prompt, schema in requests}
+        results = {}
+        for line in self._wait(batch_id).splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            custom_id = result["custom_id"]
+            if custom_id not in schemas:
+                continue
+            parsed = self._parse_result(result, schemas[custom_id][1])
+            if parsed is None:
+                continue
+            results[custom_id] = parsed
+            if self.cache is not None:
+                prompt, schema = schemas[custom_id]
+                self.cache.put(self.model, schema.__name__, prompt, parsed)
+        if len(results) < len(requests):
+            logger.error(f"Batch {name}: {len(requests) - len(results)} of {len(requests)} requests failed.")
+        return results
+
+    def _request_line(self, custom_id: str, prompt: str, schema: type[BaseModel]) -> dict:
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": self.ENDPOINT,
+            "body": {
+                "model": self.model,
+                "messages": [
+                    {"role": "user", "content": prompt}
+                ],
+                "response_format": self.response_format(schema)
+            }
+        }
+
+    @staticmethod
+    def response_format(schema: type[BaseModel]) -> dict:
+        """
+        Returns the strict structured output response_format of a pydantic model, the same one the beta
+        parse helper sends: its JSON schema with every object closed and all its properties required.
+
+        Args:
+            schema (type[BaseModel]): The response schema
+
+        Returns:
+            dict: The response_format field of the request body
+        """
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "schema": BatchClient._strict_json_schema(schema.model_json_schema()),
+                "name": schema.__name__,
+                "strict": True
+            }
+        }
+
+    @staticmethod
+    def _strict_json_schema(node):
+        # Closes the objects and requires all their properties, in the sub-schemas and definitions too
+        if isinstance(node, list):
+            return [BatchClient._strict_json_schema(item) for item in node]
+        if not isinstance(node, dict):
+            return node
+        strict = {}
+        for key, value in node.items():
+            if key in ("properties", "$defs"):
+                # Mappings of names to sub-schemas
+                value = {name: BatchClient._strict_json_schema(sub_schema) for name, sub_schema in value.items()}
+            elif key in ("items", "anyOf", "allOf"):
+                value = BatchClient._strict_json_schema(value)
+            elif key == "default" and value is None:
+                continue
+            strict[key] = value
+        if strict.get("type") == "object":
+            strict.setdefault("additionalProperties", False)
+            if "properties" in strict:
+                strict["required"] = list(strict["properties"])
+        return strict
+
+    @staticmethod
+    def _parse_result(result: dict, schema: type[BaseModel]) -> dict:
+        # Returns the parsed content of a batch output line, None (and logs why) if the request failed
+        custom_id = result["custom_id"]
+        response = result.get("response")
+        if result.get("error") or response is None or response["status_code"] != 200:
+            logger.error(f"Batch request {custom_id} failed: {result.get('error') or (response or {}).get('body')}")
+            return None
+        message = response["body"]["choices"][0]["message"]
+        if message.get("refusal") or message.get("content") is None:
+            logger.error(f"Batch request {custom_id} refused: {message.get('refusal')}")
+            return None
+        try:
+            return schema.model_validate_json(message["content"]).model_dump()
+        except Exception as e:
+            logger.error(f"Batch request {custom_id} returned an invalid response: {e}")
+            return None
+
+    def _submit(self, input_path: str) -> str:
+        """
+        Uploads the batch input file and creates the batch.
+
+        Args:
+            input_path (str): Path to the batch input JSONL file
+
+        Returns:
+            str: The ID of the batch
+        """
+        with open(input_path, "rb") as f:
+            batch_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=self.ENDPOINT,
+            completion_window=self.completion_window
+        )
+        return batch.id
+
+    def _wait(self, batch_id: str) -> str:
+        """
+        Polls a batch until it reaches a final status.
+
+        Args:
+            batch_id (str): The ID of the batch
+
+        Returns:
+            str: The content of the output file followed by the content of the error file, in the
+                 batch output JSONL format
+
+        Raises:
+            Exception: If the batch ended without any output
+        """
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in self.FINAL_STATUSES:
+                break
+            counts = batch.request_counts
+            logger.info(f"Batch {batch_id} is {batch.status} ({counts.completed if counts else 0}/{counts.total if counts else '?'}).")
+            time.sleep(self.poll_interval)
+        if batch.status != "completed":
+            if batch.output_file_id is None and batch.error_file_id is None:
+                raise Exception(f"Batch {batch_id} {batch.status} without any output: {batch.errors}")
+            logger.warning(f"Batch {batch_id} {batch.status}, using its partial output.")
+        outputs = []
+        for file_id in [batch.output_file_id, batch.error_file_id]:
+            if file_id is not None:
+                outputs.append(self.client.files.content(file_id).text)
+        return "\n".join(outputs)
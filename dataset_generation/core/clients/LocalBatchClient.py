@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI
+from .BatchClient import BatchClient
+from .ResponseCache import ResponseCache
+import json
+import os
+import shutil
+
+class LocalBatchClient(BatchClient):
+    """
+    A file-based stand-in for the OpenAI Batch API, for offline runs and tests of the batch mode.
+    Submitting copies the batch input file into an endpoint directory, and waiting executes its requests
+    one by one against the chat completions endpoint of the client (e.g. a local mock server), writing
+    an output file in the Batch API format. Everything else (request files, custom_id matching, parsing,
+    resuming, caching) is shared with BatchClient.
+    Attributes:
+        endpoint_dir (str): Directory holding the submitted inputs, outputs and statuses of the batches
+        workers (int): Number of requests executed at once when processing a batch
+    """
+    def __init__(self,
+                 client: OpenAI,
+                 model: str,
+                 work_dir: str,
+                 workers: int = 8,
+                 cache: ResponseCache = None):
+        super().__init__(client, model, work_dir, poll_interval=0, cache=cache)
+        self.endpoint_dir = os.path.join(work_dir, "local_endpoint")
+        self.workers = workers
+        os.makedirs(self.endpoint_dir, exist_ok=True)
+
+    def _submit(self, input_path: str) -> str:
+        batch_id = f"batch_local_{len(os.listdir(self.endpoint_dir))}"
+        shutil.copy(input_path, os.path.join(self.endpoint_dir, f"{batch_id}.input.jsonl"))
+        self._write_status(batch_id, "validating")
+        return batch_id
+
+    def _wait(self, batch_id: str) -> str:
+        output_path = os.path.join(self.endpoint_dir, f"{batch_id}.output.jsonl")
+        with open(os.path.join(self.endpoint_dir, f"{batch_id}.status.json"), "r") as f:
+            status = json.load(f)["status"]
+        if status != "completed":
+            self._write_status(batch_id, "in_progress")
+            with open(os.path.join(self.endpoint_dir, f"{batch_id}.input.jsonl"), "r") as f:
+                lines = [json.loads(line) for line in f if line.strip()]
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(self._execute, lines))
+            with open(output_path, "w") as f:
+                for result in results:
+                    f.write(json.dumps(result) + "\n")
+            self._write_status(batch_id, "completed")
+        with open(output_path, "r") as f:
+            return f.read()
+
+    def _execute(self, line: dict) -> dict:
+        # Runs one request of the batch, returning its line of the output file
+        try:
+            completion = self.client.chat.completions.create(**line["body"])
+            response = {"status_code": 200, "body": completion.to_dict()}
+            error = None
+        except Exception as e:
+            response = None
+            error = {"code": type(e).__name__, "message": str(e)}
+        return {"id": f"{line['custom_id']}_response", "custom_id": line["custom_id"], "response": response, "error": error}
+
+    def _write_status(self, batch_id: str, status: str) -> None:
+        with open(os.path.join(self.endpoint_dir, f"{batch_id}.status.json"), "w") as f:
+            json.dump({"id": batch_id, "status": status}, f)
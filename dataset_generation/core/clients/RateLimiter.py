@@ -0,0 +1,113 @@
+import threading
+import time
+
+class RateLimiter:
+    """
+    A thread-safe rate limiter for the OpenAI API, enforcing both a requests-per-minute and a
+    tokens-per-minute budget with two token buckets.
+    Each bucket holds up to one minute worth of budget and is refilled continuously, so short
+    bursts are allowed while the long term rate never exceeds the limits.
+    Attributes:
+        requests_per_minute (int): Maximum number of requests per minute, None for no limit
+        tokens_per_minute (int): Maximum number of tokens per minute, None for no limit
+    Methods:
+        acquire: Blocks until a request of the given size can be sent
+        adjust: Corrects the token budget once the actual usage of a request is known
+        estimate_tokens: Rough estimate of the number of tokens of a text
+    Example:
+        limiter = RateLimiter(requests_per_minute=500, tokens_per_minute=200000)
+        estimated = RateLimiter.estimate_tokens(prompt)
+        limiter.acquire(estimated)
+        completion = client.chat.completions.create(...)
+        limiter.adjust(estimated, completion.usage.total_tokens)
+    """
+    CHARS_PER_TOKEN = 4 # Rough average for english text
+
+    def __init__(self, requests_per_minute: int = None, tokens_per_minute: int = None):
+        if requests_per_minute is not None and requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be a positive integer.")
+        if tokens_per_minute is not None and tokens_per_minute <= 0:
+            raise ValueError("tokens_per_minute must be a positive integer.")
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._available_requests = float(requests_per_minute or 0)
+        self._available_tokens = float(tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """
+        Estimates the number of tokens of a text without a tokenizer.
+
+        Args:
+            text (str): The text to estimate
+
+        Returns:
+            int: The estimated number of tokens
+        """
+        return len(text) // RateLimiter.CHARS_PER_TOKEN + 1
+
+    def acquire(self, tokens: int = 0) -> None:
+        """
+        Blocks until both buckets have enough budget for one request of the given number of tokens,
+        then takes it. Requests larger than the whole tokens-per-minute budget wait for a full bucket.
+
+        Args:
+            tokens (int, optional): The (estimated) number of tokens of the request. Defaults to 0
+        """
+        if self.tokens_per_minute is not None:
+            tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill()
+                wait = max(
+                    self._time_to(self._available_requests, 1, self.requests_per_minute),
+                    self._time_to(self._available_tokens, tokens, self.tokens_per_minute)
+                )
+                if wait == 0:
+                    if self.requests_per_minute is not None:
+                        self._available_requests -= 1
+                    if self.tokens_per_minute is not None:
+                        self._available_tokens -= tokens
+                    return
+            time.sleep(wait)
+
+    def adjust(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """
+        Gives back (or takes) the difference between the estimated and the actual tokens of a request.
+        The token bucket may go below zero, delaying the following requests accordingly.
+
+        Args:
+            estimated_tokens (int): The number of tokens passed to acquire
+            actual_tokens (int): The number of tokens actually used
+        """
+        if self.tokens_per_minute is None:
+            return
+        with self._lock:
+            self._available_tokens = min(
+                self._available_tokens + estimated_tokens - actual_tokens,
+                float(self.tokens_per_minute)
+            )
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute is not None:
+            self._available_requests = min(
+                self._available_requests + elapsed * self.requests_per_minute / 60,
+                float(self.requests_per_minute)
+            )
+        if self.tokens_per_minute is not None:
+            self._available_tokens = min(
+                self._available_tokens + elapsed * self.tokens_per_minute / 60,
+                float(self.tokens_per_minute)
+            )
+
+    @staticmethod
+    def _time_to(available: float, needed: float, per_minute: int) -> float:
+        # Seconds until the bucket holds the needed amount, 0 if it already does or if there is no limit
+        if per_minute is None or available >= needed:
+            return 0
+        return (needed - available) * 60 / per_minute
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+class ResponseCache:
+    """
+    A persistent, content-addressed cache of the parsed OpenAI responses, stored in SQLite.
+    Responses are keyed by the SHA-256 of the model, the response schema name and the prompt, so
+    replaying a pipeline with identical inputs makes no network calls. When a maximum size is given,
+    the least recently used responses are evicted once the stored responses exceed it.
+    Attributes:
+        db_path (str): Path to the SQLite database file
+        max_size (int): Maximum total size of the stored responses in bytes, None for no limit
+        hits (int): Number of lookups answered by the cache since it was opened
+        misses (int): Number of lookups not found in the cache since it was opened
+    Methods:
+        get: Returns the cached response for a request, None if missing
+        put: Stores the response of a request
+        stats: Returns the hit/miss counters and the size of the cache
+    Example:
+        cache = ResponseCache("responses.sqlite", max_size=1 << 30)
+        response = cache.get("gpt-4o", "UseRuleSchema", prompt)
+        if response is None:
+            response = query(prompt)
+            cache.put("gpt-4o", "UseRuleSchema", prompt, response)
+    """
+    def __init__(self, db_path: str, max_size: int = None):
+        if max_size is not None and max_size <= 0:
+            raise ValueError("max_size must be a positive number of bytes.")
+        self.db_path = db_path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # A single connection shared by all threads, serialized by the lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def get_key(model: str, schema_name: str, prompt: str) -> str:
+        """
+        Computes the cache key of a request.
+
+        Args:
+            model (str): The model queried
+            schema_name (str): The name of the response format schema
+            prompt (str): The prompt sent
+
+        Returns:
+            str: The hex digest identifying the request
+        """
+        return hashlib.sha256("\0".join([model, schema_name, prompt]).encode("utf-8")).hexdigest()
+
+    def get(self, model: str, schema_name: str, prompt: str) -> dict:
+        """
+        Looks up the response of a request, marking it as recently used.
+
+        Args:
+            model (str): The model queried
+            schema_name (str): The name of the response format schema
+            prompt (str): The prompt sent
+
+        Returns:
+            dict: The cached parsed response, None if the request is not in the cache.
+        """
+        key = self.get_key(model, schema_name, prompt)
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, model: str, schema_name: str, prompt: str, response: dict) -> None:
+        """
+        Stores the response of a request, evicting the least recently used ones if needed.
+
+        Args:
+            model (str): The model queried
+            schema_name (str): The name of the response format schema
+            prompt (str): The prompt sent
+            response (dict): The parsed response
+        """
+        key = self.get_key(model, schema_name, prompt)
+        response_str = json.dumps(response)
+        size = len(response_str.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, response_str, size, time.time())
+            )
+            self._size += size - (old[0] if old else 0)
+            if self.max_size is not None and self._size > self.max_size:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        # Deletes the least recently used responses until the cache fits in max_size again
+        to_delete = []
+        freed = 0
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access")
+        for key, size in rows:
+            if self._size - freed <= self.max_size:
+                break
+            to_delete.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+        self._size -= freed
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: The hits and misses since the cache was opened, the number of stored responses and their size in bytes.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "size": self._size}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,11 @@
+from .RateLimiter import RateLimiter
+from .ResponseCache import ResponseCache
+from .BatchClient import BatchClient
+from .LocalBatchClient import LocalBatchClient
+
+__all__ = [
+    "RateLimiter",
+    "ResponseCache",
+    "BatchClient",
+    "LocalBatchClient"
+]
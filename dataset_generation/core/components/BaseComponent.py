@@ -3,9 +3,13 @@ class BaseComponent:
     Base class for all components in the dataset generation pipeline.
     This class provides a common interface for components that need to be serialized to JSON
     and saved to a file in JSONL format.
+    Components holding sub-components are saved in the on-disk format FORMAT_VERSION, tagged in
+    each record as "version". Version 1 (untagged) stored every sub-component as a JSON string
+    inside the record, version 2 stores them as nested JSON objects. Both are readable.
     Attributes:
         output_file (str): Path to the output file where the component will be saved.
-        **kwargs: Additional keyword arguments that will be set as attributes of the instance.
+        **kwargs: Additional keyword arguments that will be set as attributes of the instance,
+            they must be declared in the __slots__ of the subclass.
     Methods:
         to_json_str(): 
             Convert the component to a JSON string representation.
@@ -15,12 +19,19 @@ class BaseComponent:
             Must be implemented by subclasses.
             Args:
                 json_str (str): JSON string representation of the component.
-        save():
-            Append the component's JSON representation to the output file in JSONL format.
+        save(writer=None):
+            Append the component's JSON representation to the output file in JSONL format,
+            directly or through a buffered JSONLWriter.
+        get_format_version(data):
+            Return the on-disk format version of a decoded record.
         __str__():
             Return a string representation of the component.
             Must be implemented by subclasses.
     """
+    FORMAT_VERSION = 2
+    # Subclasses declare their attributes in __slots__, so instances carry no __dict__
+    __slots__ = ("output_file",)
+
     def __init__(self, output_file: str, **kwargs):
         self.output_file = output_file
         for key, value in kwargs.items():
@@ -34,11 +45,31 @@ class BaseComponent:
     
     def __str__(self):
         raise NotImplementedError
+
+    @classmethod
+    def get_format_version(cls, data: dict) -> int:
+        """
+        Returns the on-disk format version of a decoded record, 1 for the untagged records.
+
+        Raises:
+            ValueError: If the record was written by a newer, unknown format version.
+        """
+        version = data.get("version", 1)
+        if version > cls.FORMAT_VERSION:
+            raise ValueError(f"Unsupported format version {version} of record {data.get('id')}, "
+                             f"the latest known is {cls.FORMAT_VERSION}.")
+        return version
     
-    def save(self):
+    def save(self, writer=None):
         """
         Appending the json string to the output file (JSONL format)
+
+        Args:
+            writer (JSONLWriter): Buffered writer to save through, the file is opened for this record only if None
         """
-        with open(self.output_file, 'a') as f:
+        if writer is not None:
+            writer.save(self)
+            return
+        with open(self.output_file, 'a', encoding='utf-8') as f:
             f.write(self.to_json_str())
             f.write('\n')
\ No newline at end of file
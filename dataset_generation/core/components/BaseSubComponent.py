@@ -1,12 +1,24 @@
+from .. import serialization
+
 class BaseSubComponent:
+    # Sub-components are the most numerous objects in memory: subclasses declare their attributes
+    # in __slots__, so instances carry no __dict__
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
             setattr(self, key, value)
     
     def to_json_str(self):
-        raise NotImplementedError
+        return serialization.dumps(self.to_dict())
     
     def from_json_str(self, json_str: str):
+        self.from_dict(serialization.loads(json_str))
+
+    def to_dict(self) -> dict:
+        raise NotImplementedError
+
+    def from_dict(self, data: dict):
         raise NotImplementedError
     
     def __str__(self):
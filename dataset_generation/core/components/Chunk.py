@@ -1,5 +1,4 @@
 from .BaseSubComponent import BaseSubComponent
-import json
 
 class Chunk(BaseSubComponent):
     """
@@ -16,22 +15,30 @@ class Chunk(BaseSubComponent):
         id (str, optional): The chunk identifier. Defaults to None.
         text (str, optional): The text content. Defaults to None.
         json_str (str, optional): JSON string for initialization. Defaults to None.
+        json_dict (dict, optional): Decoded JSON object for initialization. Defaults to None.
     Raises:
-        Exception: When neither json_str is provided nor both id and text are provided.
+        Exception: When neither json_str/json_dict is provided nor both id and text are provided.
     Methods:
         extract_ids(chunk_id): Splits chunk ID into document ID and chunk number.
         get_id(doc_id, chunk_int_id): Constructs chunk ID from document ID and chunk number.
         to_json_str(): Serializes chunk to JSON string.
         from_json_str(json_str): Initializes chunk from JSON string.
+        to_dict(): Serializes chunk to a JSON object.
+        from_dict(data): Initializes chunk from a JSON object.
         __str__(): Returns string representation of the chunk.
     """
+    __slots__ = ("id", "text")
+
     def __init__(self,
                  id: str=None,
                  text: str=None,
-                 json_str: str = None
+                 json_str: str = None,
+                 json_dict: dict = None
                 ):
         if json_str:
             self.from_json_str(json_str)
+        elif json_dict is not None:
+            self.from_dict(json_dict)
         else:
             if  id is None or \
                 text is None:
@@ -72,14 +79,13 @@ class Chunk(BaseSubComponent):
         """
         return f"{doc_id}_ch{chunk_int_id}"
     
-    def to_json_str(self):
-        return json.dumps({
+    def to_dict(self) -> dict:
+        return {
             "id": self.id,
             "text": self.text
-        })
+        }
     
-    def from_json_str(self, json_str: str):
-        data = json.loads(json_str)
+    def from_dict(self, data: dict):
         self.id = data["id"]
         self.text = data["text"]
     
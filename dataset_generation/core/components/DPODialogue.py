@@ -1,7 +1,7 @@
 from .DPOTurn import DPOTurn
 from .BaseComponent import BaseComponent
 from .Chunk import Chunk
-import json
+from .. import serialization
 
 class DPODialogue(BaseComponent):
     """
@@ -29,6 +29,8 @@ class DPODialogue(BaseComponent):
         Static method to generate a DPO dialogue ID from base dialogue ID and rule indices
     get_previous_dpo_id(dialogue_id: str) -> str
         Static method to get the ID of the previous dialogue in the DPO chain
+    get_rules_idx_used(dialogue_id: str) -> list[int]
+        Static method to get the rule indices (the path in the DPO tree) of a DPO dialogue ID
     get_chunks_ids() -> list[str]
         Get list of chunk IDs associated with this dialogue
     get_doc_id() -> str
@@ -38,6 +40,8 @@ class DPODialogue(BaseComponent):
     from_json_str(json_str: str)
         Deserialize a JSON string into a DPODialogue object
     """
+    __slots__ = ("id", "last_turn")
+
     def __init__(self,
                  id: str=None,
                  last_turn: DPOTurn=None,
@@ -61,6 +65,17 @@ class DPODialogue(BaseComponent):
     def get_id(dialogue_id: str, rules_idx_used: list[int]):
         return f"{dialogue_id}_dpo[{'_'.join([str(idx) for idx in rules_idx_used])}]"
 
+    @staticmethod
+    def get_std_dialogue_id(dialogue_id: str) -> str:
+        """
+        Get the ID of the standard dialogue a DPO dialogue was generated from.
+
+        Example:
+            >>> get_std_dialogue_id("dc1_ch[0_1]_dpo[1_2_3]")
+            "dc1_ch[0_1]"
+        """
+        return dialogue_id[:dialogue_id.index("_dpo")]
+
     @staticmethod
     def get_previous_dpo_id(dialogue_id: str) -> str:
         """
@@ -83,13 +98,22 @@ class DPODialogue(BaseComponent):
             >>> get_previous_dpo_id("dialogue1_dpo[1]")
             None
         """
-        rules_idx_used = dialogue_id[dialogue_id.rindex("[")+1:dialogue_id.rindex("]")]
-        rules_idx_used = rules_idx_used.split("_")
-        rules_idx_used = [int(idx) for idx in rules_idx_used]
-        rules_idx_used = rules_idx_used[:-1]
+        rules_idx_used = DPODialogue.get_rules_idx_used(dialogue_id)[:-1]
         if len(rules_idx_used) == 0:
             return None
-        return DPODialogue.get_id(dialogue_id[:dialogue_id.index("_dpo")], rules_idx_used)
+        return DPODialogue.get_id(DPODialogue.get_std_dialogue_id(dialogue_id), rules_idx_used)
+
+    @staticmethod
+    def get_rules_idx_used(dialogue_id: str) -> list[int]:
+        """
+        Get the indices of the rules applied along the DPO chain, i.e. the path of the dialogue in its DPO tree.
+
+        Example:
+            >>> get_rules_idx_used("dc1_ch[0_1]_dpo[1_2_3]")
+            [1, 2, 3]
+        """
+        rules_idx_used = dialogue_id[dialogue_id.rindex("[")+1:dialogue_id.rindex("]")]
+        return [int(idx) for idx in rules_idx_used.split("_")]
     
     def get_chunks_ids(self) -> list[str]:
         """
@@ -117,15 +141,19 @@ class DPODialogue(BaseComponent):
         return self.id.split("_ch")[0]
     
     def to_json_str(self):
-        return json.dumps({
+        return serialization.dumps({
             "id": self.id,
-            "last_turn": self.last_turn.to_json_str()
+            "version": self.FORMAT_VERSION,
+            "last_turn": self.last_turn.to_dict()
         })
 
     def from_json_str(self, json_str: str):
-        data = json.loads(json_str)
+        data = serialization.loads(json_str)
         self.id = data["id"]
-        self.last_turn = DPOTurn(json_str=data["last_turn"])
+        if self.get_format_version(data) == 1:
+            self.last_turn = DPOTurn(json_str=data["last_turn"])
+        else:
+            self.last_turn = DPOTurn(json_dict=data["last_turn"])
     
     def __str__(self):
         string = f"Dialogue ID: {self.id}\n"
@@ -0,0 +1,71 @@
+from .BaseComponent import BaseComponent
+from .. import serialization
+
+class DPOJournalEntry(BaseComponent):
+    """
+    A class representing a snapshot of the DFS state of a single dialogue in DPOGenerator.
+    The entries are appended to a JSONL journal each time the DFS of a dialogue makes progress, so
+    that a restarted run can resume the dialogue where it stopped. The last entry of a dialogue wins.
+    The class is based on the entry ID:
+    - ID: The ID of the standard dialogue, e.g. dc1_ch[0_1]
+
+    Attributes:
+        output_file (str): Path to the journal JSONL file.
+        id (str): The ID of the standard dialogue.
+        seed (int): The seed of the random choices of the dialogue.
+        path (list[int]): The rules of the DPO turns chosen so far, i.e. the current DFS path.
+        scores (list[int]): The scores of the rules for the next turn, if already queried but not used
+            yet, None otherwise.
+        done (bool): Whether the DFS of the dialogue is over.
+    Methods:
+        to_json_str(): Converts the entry to a JSON string.
+        from_json_str(json_str): Loads the entry from a JSON string.
+    """
+    __slots__ = ("id", "seed", "path", "scores", "done")
+
+    def __init__(self,
+                 output_file: str=None,
+                 id: str=None,
+                 seed: int=None,
+                 path: list[int]=None,
+                 scores: list[int]=None,
+                 done: bool=False,
+                 json_str: str = None
+                ):
+        if json_str:
+            self.from_json_str(json_str)
+        else:
+            if id is None or seed is None or path is None or output_file is None:
+                raise ValueError("You either load the entry from json_str or provide id, seed, path, output_file")
+
+            super().__init__(
+                output_file,
+                id=id,
+                seed=seed,
+                path=path,
+                scores=scores,
+                done=done
+            )
+
+    def to_json_str(self):
+        return serialization.dumps({
+            "id": self.id,
+            "seed": self.seed,
+            "path": self.path,
+            "scores": self.scores,
+            "done": self.done
+        })
+
+    def from_json_str(self, json_str: str):
+        data = serialization.loads(json_str)
+        self.id = data["id"]
+        self.seed = data["seed"]
+        self.path = data["path"]
+        self.scores = data["scores"]
+        self.done = data["done"]
+
+    def __str__(self):
+        string = f"Journal entry: {self.id}\n"
+        string += f"Path: {self.path}\n"
+        string += f"Done: {self.done}\n"
+        return string
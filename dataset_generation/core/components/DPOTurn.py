@@ -1,5 +1,4 @@
 from .BaseSubComponent import BaseSubComponent
-import json
 
 class DPOTurn(BaseSubComponent):
     """A class representing a DPO (Direct Preference Optimization) conversational turn.
@@ -14,18 +13,25 @@ class DPOTurn(BaseSubComponent):
     Methods:
         to_json_str(): Converts the turn data to a JSON string
         from_json_str(json_str): Populates the turn data from a JSON string
+        to_dict(): Converts the turn data to a JSON object
+        from_dict(data): Populates the turn data from a JSON object
         __str__(): Returns a shortened string representation of the turn
         __repr__(): Returns a complete string representation of the turn
     """
+    __slots__ = ("student_question", "positive_answer", "negative_answer", "rule_used")
+
     def __init__(self,
                  student_question: str=None,
                  positive_answer: str=None,
                  negative_answer: str=None,
                  rule_used: int=None,
-                 json_str: str = None
+                 json_str: str = None,
+                 json_dict: dict = None
                 ):
         if json_str:
             self.from_json_str(json_str)
+        elif json_dict is not None:
+            self.from_dict(json_dict)
         else:
             if student_question is None or \
                 positive_answer is None or \
@@ -39,16 +45,15 @@ class DPOTurn(BaseSubComponent):
                 rule_used=rule_used
             )
     
-    def to_json_str(self):
-        return json.dumps({
+    def to_dict(self) -> dict:
+        return {
             "positive_answer": self.positive_answer,
             "negative_answer": self.negative_answer,
             "rule_used": self.rule_used,
             "student_question": self.student_question
-        })
+        }
     
-    def from_json_str(self, json_str: str):
-        data = json.loads(json_str)
+    def from_dict(self, data: dict):
         self.positive_answer = data["positive_answer"]
         self.negative_answer = data["negative_answer"]
         self.rule_used = data["rule_used"]
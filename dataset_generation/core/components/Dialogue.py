@@ -1,7 +1,7 @@
 from .BaseComponent import BaseComponent
 from .Turn import Turn
 from .Chunk import Chunk
-import json
+from .. import serialization
 
 class Dialogue(BaseComponent):
     """
@@ -28,6 +28,8 @@ class Dialogue(BaseComponent):
         >>> dialogue = Dialogue(output_file="output.json", id="doc1_ch[1_2_3]", turns=[turn1, turn2])
         >>> dialogue = Dialogue(json_str='{"id": "doc1_ch[1_2]", "turns": [...]}')
     """
+    __slots__ = ("id", "turns")
+
     def __init__(self,
                  output_file: str=None,
                  id: str=None,
@@ -89,15 +91,19 @@ class Dialogue(BaseComponent):
         return [Chunk.get_id(doc_id, chunk_int_id) for chunk_int_id in chunk_int_ids]
     
     def to_json_str(self):
-        return json.dumps({
+        return serialization.dumps({
             "id": self.id,
-            "turns": [turn.to_json_str() for turn in self.turns]
+            "version": self.FORMAT_VERSION,
+            "turns": [turn.to_dict() for turn in self.turns]
         })
 
     def from_json_str(self, json_str: str):
-        data = json.loads(json_str)
+        data = serialization.loads(json_str)
         self.id = data["id"]
-        self.turns = [Turn(json_str=turn) for turn in data["turns"]]
+        if self.get_format_version(data) == 1:
+            self.turns = [Turn(json_str=turn) for turn in data["turns"]]
+        else:
+            self.turns = [Turn(json_dict=turn) for turn in data["turns"]]
     
     def __str__(self):
        string = f"Dialogue: {self.id}\n"
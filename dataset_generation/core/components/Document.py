@@ -1,6 +1,6 @@
 from .BaseComponent import BaseComponent
 from .Chunk import Chunk
-import json
+from .. import serialization
 
 class Document(BaseComponent):
     """A class representing a document composed of multiple chunks.
@@ -16,10 +16,13 @@ class Document(BaseComponent):
         chunks (list[Chunk]): List of Chunk objects that make up the document.
     Methods:
         get_id(int_id): Generates a document ID from an integer.
+        get_int_id(doc_id): Extracts the integer from a document ID.
         get_chunk_by_id(chunk_id): Retrieves a specific chunk by its ID.
         to_json_str(): Converts document data to JSON string.
         from_json_str(json_str): Loads document data from JSON string.
     """
+    __slots__ = ("id", "file_name", "chunks")
+
     def __init__(self,
                  output_file: str=None,
                  file_name: str=None,
@@ -43,6 +46,10 @@ class Document(BaseComponent):
     @staticmethod
     def get_id(int_id: int) -> str:
         return f"dc{int_id}"
+
+    @staticmethod
+    def get_int_id(doc_id: str) -> int:
+        return int(doc_id[len("dc"):])
     
     def get_chunk_by_id(self, chunk_id: str) -> Chunk:
         """
@@ -61,17 +68,21 @@ class Document(BaseComponent):
         return None
     
     def to_json_str(self):
-        return json.dumps({
+        return serialization.dumps({
             "id": self.id,
+            "version": self.FORMAT_VERSION,
             "file_name": self.file_name,
-            "chunks": [chunk.to_json_str() for chunk in self.chunks]
+            "chunks": [chunk.to_dict() for chunk in self.chunks]
         })
     
     def from_json_str(self, json_str):
-        data = json.loads(json_str)
+        data = serialization.loads(json_str)
         self.id = data["id"] 
         self.file_name = data["file_name"]
-        self.chunks = [Chunk(json_str=chunk) for chunk in data["chunks"]]
+        if self.get_format_version(data) == 1:
+            self.chunks = [Chunk(json_str=chunk) for chunk in data["chunks"]]
+        else:
+            self.chunks = [Chunk(json_dict=chunk) for chunk in data["chunks"]]
     
     def __str__(self):
         string = f"Document ID: {self.id}\n"
@@ -0,0 +1,84 @@
+from .BaseComponent import BaseComponent
+from .. import serialization
+
+class ManifestEntry(BaseComponent):
+    """
+    A class representing the extraction record of a single PDF file.
+    The entries are appended to a JSONL manifest by the ChunkExtractor so that a re-run can tell
+    whether a file was already processed without parsing it again. The entry is identified by the
+    content hash of the file, so renaming or moving a file keeps its document ID.
+    The class is based on the entry ID:
+    - ID: The SHA-256 hex digest of the file content.
+
+    Attributes:
+        output_file (str): Path to the manifest JSONL file.
+        id (str): SHA-256 hex digest of the file content.
+        path (str): Absolute path of the file when it was last seen.
+        size (int): Size of the file in bytes, used together with mtime as a fast path.
+        mtime (int): Modification time of the file in nanoseconds.
+        doc_id (str): The document ID assigned to the file.
+        chunk_ids (list[str]): IDs of the chunks extracted from the file. Empty if the file
+            did not produce a document (no text or corrupted text).
+    Methods:
+        get_stat_key(path, size, mtime): Builds the key used for the size/mtime fast path.
+        to_json_str(): Converts the entry to a JSON string.
+        from_json_str(json_str): Loads the entry from a JSON string.
+    """
+    __slots__ = ("id", "path", "size", "mtime", "doc_id", "chunk_ids")
+
+    def __init__(self,
+                 output_file: str=None,
+                 id: str=None,
+                 path: str=None,
+                 size: int=None,
+                 mtime: int=None,
+                 doc_id: str=None,
+                 chunk_ids: list[str]=None,
+                 json_str: str = None
+                ):
+        if json_str:
+            self.from_json_str(json_str)
+        else:
+            if id is None or path is None or size is None or mtime is None or \
+                doc_id is None or chunk_ids is None or output_file is None:
+                raise ValueError("You either load the file from json_str or provide id, path, size, mtime, doc_id, chunk_ids, output_file")
+
+            super().__init__(
+                output_file,
+                id=id,
+                path=path,
+                size=size,
+                mtime=mtime,
+                doc_id=doc_id,
+                chunk_ids=chunk_ids
+            )
+
+    @staticmethod
+    def get_stat_key(path: str, size: int, mtime: int) -> tuple[str, int, int]:
+        return (path, size, mtime)
+
+    def to_json_str(self):
+        return serialization.dumps({
+            "id": self.id,
+            "path": self.path,
+            "size": self.size,
+            "mtime": self.mtime,
+            "doc_id": self.doc_id,
+            "chunk_ids": self.chunk_ids
+        })
+
+    def from_json_str(self, json_str: str):
+        data = serialization.loads(json_str)
+        self.id = data["id"]
+        self.path = data["path"]
+        self.size = data["size"]
+        self.mtime = data["mtime"]
+        self.doc_id = data["doc_id"]
+        self.chunk_ids = data["chunk_ids"]
+
+    def __str__(self):
+        string = f"Manifest entry: {self.id}\n"
+        string += f"Path: {self.path}\n"
+        string += f"Document ID: {self.doc_id}\n"
+        string += f"Chunks: {len(self.chunk_ids)}\n"
+        return string
@@ -1,5 +1,4 @@
 from .BaseSubComponent import BaseSubComponent
-import json
 
 class Turn(BaseSubComponent):
     """A class representing a turn in a conversation between a user and an assistant.
@@ -9,24 +8,32 @@ class Turn(BaseSubComponent):
         user (str, optional): The user's message in the conversation turn.
         assistant (str, optional): The assistant's response in the conversation turn.
         json_str (str, optional): A JSON string representation of a turn to load from.
+        json_dict (dict, optional): The decoded JSON object of a turn to load from.
     Raises:
-        ValueError: If neither json_str is provided nor both user and assistant are provided.
+        ValueError: If neither json_str/json_dict is provided nor both user and assistant are provided.
     Attributes:
         user (str): The user's message in the conversation turn.
         assistant (str): The assistant's response in the conversation turn.
     Methods:
         to_json_str(): Converts the turn to a JSON string representation.
         from_json_str(json_str): Loads the turn from a JSON string representation.
+        to_dict(): Converts the turn to a JSON object.
+        from_dict(data): Loads the turn from a JSON object.
         __str__(): Returns a truncated string representation of the turn.
         __repr__(): Returns a complete string representation of the turn.
     """
+    __slots__ = ("user", "assistant")
+
     def __init__(self,
                  user: str=None,
                  assistant: str=None,
-                 json_str: str = None
+                 json_str: str = None,
+                 json_dict: dict = None
                 ):
         if json_str:
             self.from_json_str(json_str)
+        elif json_dict is not None:
+            self.from_dict(json_dict)
         else:
             if user is None or assistant is None:
                 raise ValueError("You either load the file from json_str or provide role, content")
@@ -36,14 +43,13 @@ class Turn(BaseSubComponent):
                 assistant=assistant
             )
     
-    def to_json_str(self):
-        return json.dumps({
+    def to_dict(self) -> dict:
+        return {
             "user": self.user,
             "assistant": self.assistant
-        })
+        }
     
-    def from_json_str(self, json_str):
-        data = json.loads(json_str)
+    def from_dict(self, data: dict):
         self.user = data["user"]
         self.assistant = data["assistant"]
         
@@ -5,6 +5,8 @@ from .Turn import Turn
 from .DPODialogue import DPODialogue
 from .DPOTurn import DPOTurn
 from .PedagogicalRules import PedagogicalRules
+from .ManifestEntry import ManifestEntry
+from .DPOJournalEntry import DPOJournalEntry
 
 __all__ = [
     "Chunk",
@@ -13,5 +15,7 @@ __all__ = [
     "Turn",
     "DPODialogue",
     "DPOTurn",
-    "PedagogicalRules"
+    "PedagogicalRules",
+    "ManifestEntry",
+    "DPOJournalEntry"
 ]
\ No newline at end of file
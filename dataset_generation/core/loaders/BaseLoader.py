@@ -2,10 +2,16 @@ class BaseLoader:
     """Base class for dataset loaders.
     This class provides a foundation for implementing dataset loaders that read from JSONL files.
     It implements basic dictionary-like behavior with key lookups and length queries.
+    In lazy mode, loaders that support it only index the byte offsets and IDs of the records
+    (see LazyRecordList) and decode each record when it is accessed.
     Args:
         jsonl_path (str): Path to the JSONL file containing the dataset.
+        lazy (bool): Whether to decode the records on demand instead of at load time.
+        cache_size (int): Number of decoded records kept in memory in lazy mode.
     Attributes:
         jsonl_path (str): Path to the JSONL file.
+        lazy (bool): Whether the records are decoded on demand.
+        cache_size (int): Number of decoded records kept in memory in lazy mode.
         data: The loaded dataset (format depends on implementation).
         index: Index structure for the dataset (format depends on implementation).
     Methods:
@@ -17,8 +23,10 @@ class BaseLoader:
     Raises:
         NotImplementedError: When load_data() or load_index() are not implemented by child class.
     """
-    def __init__(self, jsonl_path):
+    def __init__(self, jsonl_path, lazy: bool = False, cache_size: int = 128):
         self.jsonl_path = jsonl_path
+        self.lazy = lazy
+        self.cache_size = cache_size
         self.data = self.load_data()
         self.index = self.load_index()
     
@@ -1,30 +1,55 @@
 from ..components import DPODialogue, DPOTurn
 from .BaseLoader import BaseLoader
+from .LazyRecordList import LazyRecordList
 import os
 
 class DPODialogueLoader(BaseLoader):
-    def __init__(self, jsonl_path):
-        super().__init__(jsonl_path)
+    """
+    Loader for DPO dialogues. Besides the data list, it keeps the dialogues as a forest of prefix trees:
+    one tree per standard dialogue, where each DPO dialogue is the node reached by following its rule
+    indices from the root. Every node is a dict with the DPO dialogue "id" (the standard dialogue ID for
+    the root), its "parent" node and its "children" nodes by rule index. Nodes may exist for dialogues
+    missing from the file, when they are on the path to a loaded one.
+    Attributes:
+        id2idx (dict): DPO dialogue ID -> index in the data list
+        trees (dict): Standard dialogue ID -> root node of its DPO tree
+        id2node (dict): DPO dialogue ID -> its node
+        leaves (set): IDs of the loaded DPO dialogues with no loaded continuation
+    """
+    def __init__(self, jsonl_path, lazy: bool = False, cache_size: int = 128):
+        super().__init__(jsonl_path, lazy, cache_size)
     
     def load_data(self) -> list[DPODialogue]:
         """
         Loads DPODialogue data from a JSONL file.
 
         The method reads dialogue data from a JSONL file and creates DPODialogue objects for each line.
-        Also builds an index mapping dialogue IDs to their position in the data list.
+        Also builds an index mapping dialogue IDs to their position in the data list. In lazy mode only
+        the offsets and IDs of the dialogues are read, which is all the DPO trees need.
 
         Returns:
-            list: List of DPODialogue objects created from the JSONL file data.
+            list: List of DPODialogue objects created from the JSONL file data (a LazyRecordList in lazy mode).
                   Returns empty list if file doesn't exist.
 
         Side Effects:
-            Sets self.id2idx mapping dialogue IDs to indices in the returned list.
+            Sets self.id2idx mapping dialogue IDs to indices in the returned list, and builds
+            the DPO trees (self.trees, self.id2node, self.leaves).
         """
+        self.id2idx = {}
+        self.trees = {}
+        self.id2node = {}
+        self.leaves = set()
+        if self.lazy:
+            data = LazyRecordList(self.jsonl_path, DPODialogue, self.cache_size)
+            for idx, dialogue_id in enumerate(data.ids):
+                self._index_dialogue(dialogue_id, idx)
+            return data
         if not os.path.exists(self.jsonl_path):
             return []
-        with open(self.jsonl_path, 'r') as file:
+        with open(self.jsonl_path, 'r', encoding='utf-8') as file:
             data = [DPODialogue(json_str=line) for line in file if line.strip()]
-        self.id2idx = {dialogue.id: idx for idx, dialogue in enumerate(data)}
+        for idx, dialogue in enumerate(data):
+            self._index_dialogue(dialogue.id, idx)
         return data
     
     def load_index(self):
@@ -35,12 +60,51 @@ class DPODialogueLoader(BaseLoader):
         Returns:
             set: A set of dialogue IDs extracted from the data collection.
         """
-        index = {dialogue.id for dialogue in self.data}
+        index = set(self.id2idx.keys())
         return index
     
+    def _index_dialogue(self, dialogue_id: str, idx: int) -> None:
+        # Inserts the dialogue in its DPO tree, O(depth)
+        self.id2idx[dialogue_id] = idx
+        std_id = DPODialogue.get_std_dialogue_id(dialogue_id)
+        node = self.trees.get(std_id)
+        if node is None:
+            node = self.trees[std_id] = {"id": std_id, "parent": None, "children": {}}
+        rules_idx_used = DPODialogue.get_rules_idx_used(dialogue_id)
+        last_depth = len(rules_idx_used) - 1
+        for depth, rule_idx in enumerate(rules_idx_used):
+            # Its ancestors are not leaves anymore
+            self.leaves.discard(node["id"])
+            child = node["children"].get(rule_idx)
+            if child is None:
+                child_id = dialogue_id if depth == last_depth else DPODialogue.get_id(std_id, rules_idx_used[:depth+1])
+                child = {"id": child_id, "parent": node, "children": {}}
+                node["children"][rule_idx] = child
+                self.id2node[child_id] = child
+            node = child
+        if not node["children"]:
+            self.leaves.add(dialogue_id)
+
+    def add_dpo_dialogue(self, dialogue: DPODialogue, writer=None) -> None:
+        """
+        Saves a new DPO dialogue and keeps the in-memory indexes up to date.
+
+        Args:
+            dialogue (DPODialogue): The DPO dialogue to be added.
+            writer (JSONLWriter): Buffered writer to save the dialogue through.
+        """
+        dialogue.save(writer)
+        if writer is not None and self.lazy:
+            # The lazy index records the offset of the dialogue, so it must be in the file already
+            writer.flush()
+        self._index_dialogue(dialogue.id, len(self.data))
+        self.data.append(dialogue)
+        self.index.add(dialogue.id)
+
     def get_unique_dpo_ids(self) -> list[str]:
         """
-        Extracts unique DPO IDs from dialogue data, keeping only the longest version of each ID.
+        Returns the unique DPO IDs of the dialogue data, keeping only the longest version of each ID,
+        i.e. the leaves of the DPO trees.
 
         For example, given IDs like:
             - dc1_ch[0_1]_dpo[11_19_7_25]
@@ -54,49 +118,30 @@ class DPODialogueLoader(BaseLoader):
         Returns:
             list: A sorted list of unique DPO IDs, ordered first by length and then alphabetically.
         """
-        # Basically we have a list of DPODialogue objects, their ids are structured as follows:
-        # dc1_ch[0_1]_dpo[11_19_7_25]
-        # dc1_ch[0_1]_dpo[11_19_4]
-        # dc1_ch[0_1]_dpo[7]
-        # dc1_ch[0_1]_dpo[11]
-        # We would like to save only the longest id, so we can get the unique DPO ids
-        uniques = set()
-        for dialogue in self.data:
-            id = dialogue.id
-            if id in uniques:
-                continue
-            uniques.add(id)
-
-            prev = DPODialogue.get_previous_dpo_id(id)
-            while prev: # REALLY INNEFICIENT, maybe come up with a better way to do this [TODO]
-                uniques.discard(prev)
-                prev = DPODialogue.get_previous_dpo_id(prev)
-        lst = list(uniques)
-        # Now sort by length and then by the id itself
-        lst.sort(key=lambda x: (len(x), x))
-        return lst
-    
+        return sorted(self.leaves, key=lambda x: (len(x), x))
+
     def get_dpo_turns_by_dialogue_id(self, dpo_dialogue_id: str) -> list[DPOTurn]:
         """
         Get a list of DPOTurn objects for a given DPO dialogue ID, ordered chronologically.
 
-        Given a DPO dialogue ID, retrieves all turns in the dialogue chain by traversing
-        backwards through previous dialogues and collecting their last turns. The turns 
-        are returned in chronological order (oldest to newest).
+        Given a DPO dialogue ID, retrieves all turns in the dialogue chain by walking up
+        its DPO tree and collecting the last turns of its ancestors. The turns are returned
+        in chronological order (oldest to newest).
 
         Args:
             dpo_dialogue_id (str): The ID of the DPO dialogue to get turns for
 
         Returns:
             list[DPOTurn]: List of DPOTurn objects in chronological order
+
+        Raises:
+            KeyError: If the dialogue or one of its ancestors is not in the dataset.
         """
-        dpo_dialogue = self.get_dpo_dialogue_by_id(dpo_dialogue_id)
-        turns = [dpo_dialogue.last_turn]
-        prev = DPODialogue.get_previous_dpo_id(dpo_dialogue_id)
-        while prev:
-            dpo_dialogue = self.get_dpo_dialogue_by_id(prev)
-            turns.append(dpo_dialogue.last_turn)
-            prev = DPODialogue.get_previous_dpo_id(prev)
+        node = self.id2node[dpo_dialogue_id]
+        turns = []
+        while node["parent"] is not None:
+            turns.append(self.get_dpo_dialogue_by_id(node["id"]).last_turn)
+            node = node["parent"]
         return turns[::-1]
     
     def get_dpo_dialogue_by_id(self, dpo_dialogue_id: str) -> DPODialogue:
@@ -117,19 +162,24 @@ class DPODialogueLoader(BaseLoader):
     
     def get_dpo_dialogues_by_dialogue_id(self, dialogue_id: str) -> list[DPODialogue]:
         """
-        Retrieves all DPO dialogues that match a given dialogue ID prefix.
+        Retrieves the longest DPO dialogues (the leaves of the DPO tree) generated from a standard dialogue.
 
         Args:
-            dialogue_id (str): The dialogue ID prefix to search for.
+            dialogue_id (str): The standard dialogue ID.
 
         Returns:
-            list: A list of dialogue objects whose IDs start with the given dialogue_id.
-                  Each dialogue object is retrieved from the data using the stored ID-to-index mapping.
+            list: The leaf DPO dialogues of the dialogue, ordered by ID length and then alphabetically.
+                  Empty if the dialogue has no DPO dialogues.
         """
-        unique_dpo_ids = self.get_unique_dpo_ids()
-        dpo_dialogues = [dpo_id for dpo_id in unique_dpo_ids if dpo_id.startswith(dialogue_id)]
-        dpo_dialogues = [self.data[self.id2idx[dpo_id]] for dpo_id in dpo_dialogues]
-        return dpo_dialogues
+        leaf_ids = []
+        stack = [self.trees[dialogue_id]] if dialogue_id in self.trees else []
+        while stack:
+            node = stack.pop()
+            if node["id"] in self.leaves:
+                leaf_ids.append(node["id"])
+            stack.extend(node["children"].values())
+        leaf_ids.sort(key=lambda x: (len(x), x))
+        return [self.get_dpo_dialogue_by_id(dpo_id) for dpo_id in leaf_ids]
     
     def contains_std_dialogue(self, dialogue_id: str) -> bool:
         """
@@ -141,5 +191,4 @@ class DPODialogueLoader(BaseLoader):
         Returns:
             bool: True if there's at least one DPO dialogue with the given dialogue ID, False otherwise.
         """
-        # [TODO] This is a naive implementation, maybe come up with a more efficient way to do this
-        return any(dialogue_id in dialogue.id for dialogue in self.data)
+        return dialogue_id in self.trees
@@ -0,0 +1,74 @@
+import os
+from ..components.DPOJournalEntry import DPOJournalEntry
+from .BaseLoader import BaseLoader
+
+class DPOJournalLoader(BaseLoader):
+    def __init__(self, jsonl_path: str):
+        super().__init__(jsonl_path)
+
+    def load_data(self) -> list[DPOJournalEntry]:
+        """
+        Load the DFS journal from a JSONL file.
+
+        The journal is append only: every progress of a dialogue appends a new snapshot of its
+        state, so the last entry of each dialogue wins.
+
+        Returns:
+            list[DPOJournalEntry]: A list of DPOJournalEntry objects, one per dialogue.
+                                   Returns empty list if file does not exist.
+
+        Side Effects:
+            Sets self.id2idx mapping dialogue IDs to indices in the returned list.
+        """
+        self.id2idx = {}
+        if not os.path.exists(self.jsonl_path):
+            return []
+        data = []
+        with open(self.jsonl_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    self._add_to_data(data, DPOJournalEntry(json_str=line))
+        return data
+
+    def load_index(self) -> set[str]:
+        """
+        Returns a set containing the IDs of all the dialogues in the journal.
+        Used by the __contains__ method to check if a dialogue was started.
+
+        Returns:
+            set: A set of dialogue IDs.
+        """
+        return set(self.id2idx.keys())
+
+    def _add_to_data(self, data: list[DPOJournalEntry], entry: DPOJournalEntry) -> None:
+        if entry.id in self.id2idx:
+            data[self.id2idx[entry.id]] = entry
+        else:
+            self.id2idx[entry.id] = len(data)
+            data.append(entry)
+
+    def add_entry(self, entry: DPOJournalEntry, writer=None) -> None:
+        """
+        Saves a new snapshot to the journal and keeps the in-memory state up to date.
+
+        Args:
+            entry (DPOJournalEntry): The entry to be added.
+            writer (JSONLWriter): Buffered writer to save the entry through.
+        """
+        entry.save(writer)
+        self._add_to_data(self.data, entry)
+        self.index.add(entry.id)
+
+    def get_entry(self, dialogue_id: str) -> DPOJournalEntry:
+        """
+        Retrieves the last snapshot of a dialogue.
+
+        Args:
+            dialogue_id (str): The ID of the standard dialogue.
+
+        Returns:
+            DPOJournalEntry: The entry if found, None otherwise.
+        """
+        if dialogue_id not in self.id2idx:
+            return None
+        return self.data[self.id2idx[dialogue_id]]
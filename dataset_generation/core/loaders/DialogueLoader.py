@@ -1,27 +1,36 @@
 import os
 from .BaseLoader import BaseLoader
+from .LazyRecordList import LazyRecordList
 from ..components.Dialogue import Dialogue
 
 class DialogueLoader(BaseLoader):
-    def __init__(self, jsonl_path):
-        super().__init__(jsonl_path)
+    def __init__(self, jsonl_path, lazy: bool = False, cache_size: int = 128):
+        super().__init__(jsonl_path, lazy, cache_size)
     
     def load_data(self):
         """
         Load dialogues from a JSONL file and create an index mapping dialogue IDs to their positions.
+        In lazy mode only the offsets and IDs of the dialogues are read.
 
         Returns:
-            list: A list of Dialogue objects created from the JSONL file.
+            list: A list of Dialogue objects created from the JSONL file (a LazyRecordList in lazy mode).
                   Returns empty list if file doesn't exist.
 
         Side Effects:
-            Updates self.id2idx with a mapping of dialogue IDs to their index positions.
+            Updates self.ids with the dialogue IDs in file order and self.id2idx with a mapping
+            of dialogue IDs to their index positions.
         """
-        if not os.path.exists(self.jsonl_path):
-            return []
-        with open(self.jsonl_path, 'r') as file:
-            data = [Dialogue(json_str=line) for line in file if line.strip()]
-        self.id2idx = {dialogue.id: idx for idx, dialogue in enumerate(data)}
+        if self.lazy:
+            data = LazyRecordList(self.jsonl_path, Dialogue, self.cache_size)
+            self.ids = data.ids
+        elif os.path.exists(self.jsonl_path):
+            with open(self.jsonl_path, 'r', encoding='utf-8') as file:
+                data = [Dialogue(json_str=line) for line in file if line.strip()]
+            self.ids = [dialogue.id for dialogue in data]
+        else:
+            data = []
+            self.ids = []
+        self.id2idx = {dialogue_id: idx for idx, dialogue_id in enumerate(self.ids)}
         return data
     
     def get_dialogues_by_document_id(self, document_id: str) -> list[Dialogue]:
@@ -34,7 +43,7 @@ class DialogueLoader(BaseLoader):
         Returns:
             list: A list of dialogue objects where the dialogue ID contains the given document_id.
         """
-        return [dialogue for dialogue in self.data if document_id in dialogue.id]
+        return [self.data[idx] for idx, dialogue_id in enumerate(self.ids) if document_id in dialogue_id]
     
     def get_dialogue_by_id(self, dialogue_id: str) -> Dialogue:
         """
@@ -58,7 +67,7 @@ class DialogueLoader(BaseLoader):
         Returns:
             set: A set containing unique dialogue IDs from the loaded data.
         """
-        index = {dialogue.id for dialogue in self.data}
+        index = set(self.id2idx.keys())
         return index
     
     def get_ids(self) -> set[str]:
@@ -68,4 +77,4 @@ class DialogueLoader(BaseLoader):
         Returns:
             list: A list containing all dialogue IDs from the loaded data.
         """
-        return set([dialogue.id for dialogue in self.data])
\ No newline at end of file
+        return set(self.id2idx.keys())
\ No newline at end of file
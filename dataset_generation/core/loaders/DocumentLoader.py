@@ -1,10 +1,11 @@
 import os
 from ..components.Document import Document
 from .BaseLoader import BaseLoader
+from .LazyRecordList import LazyRecordList
 
 class DocumentLoader(BaseLoader):
-    def __init__(self, jsonl_path: str):
-        super().__init__(jsonl_path)
+    def __init__(self, jsonl_path: str, lazy: bool = False, cache_size: int = 128):
+        super().__init__(jsonl_path, lazy, cache_size)
     
     def load_data(self) -> list[Document]:
         """
@@ -12,19 +13,26 @@ class DocumentLoader(BaseLoader):
 
         This method reads a JSONL file specified by self.jsonl_path and creates Document 
         objects from each non-empty line. It also builds an index mapping document IDs
-        to their positions in the resulting list.
+        to their positions in the resulting list. In lazy mode only the offsets and IDs
+        of the documents are read, the documents being decoded when accessed.
 
         Returns:
-            list[Document]: A list of Document objects created from the JSONL file data.
+            list[Document]: A list of Document objects created from the JSONL file data
+                            (a LazyRecordList in lazy mode).
                             Returns empty list if file does not exist.
 
         Note:
             - Skips empty lines in the input file
             - Updates self.strid2idx with {document_id: index} mapping
         """
+        if self.lazy:
+            data = LazyRecordList(self.jsonl_path, Document, self.cache_size)
+            self.strid2idx = {doc_id: idx for idx, doc_id in enumerate(data.ids)}
+            return data
+        self.strid2idx = {}
         if not os.path.exists(self.jsonl_path):
             return []
-        with open(self.jsonl_path, 'r') as file:
+        with open(self.jsonl_path, 'r', encoding='utf-8') as file:
             data = [Document(json_str=line) for line in file if line.strip()]
         self.strid2idx = {doc.id: idx for idx, doc in enumerate(data)}
         return data
@@ -52,5 +60,5 @@ class DocumentLoader(BaseLoader):
         Returns:
             set: A set of document IDs extracted from the data collection.
         """
-        index = {document.id for document in self.data}
+        index = set(self.strid2idx.keys())
         return index
\ No newline at end of file
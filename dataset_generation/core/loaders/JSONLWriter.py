@@ -0,0 +1,204 @@
+from ..logger import logger
+from itertools import groupby
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError: # Not available on Windows, where only the threads of one process are serialized
+    fcntl = None
+
+class JSONLWriter:
+    """
+    A buffered writer appending records to JSONL files, shared by everything a process saves.
+    Each output file is opened once, and the records are buffered and written in batches, when the buffer
+    exceeds max_buffer_size bytes, when its oldest record is older than flush_interval seconds, or at
+    checkpoints. Checkpoints also fsync the files, so everything saved before them is durable.
+    The records of all files are written in the order they were saved: if a process dies, each file holds
+    a prefix of what was saved, and a file never holds a record saved after one missing from another file
+    (e.g. a journal entry is never on disk without the DPO dialogues saved before it). Every batch is
+    written with a single locked append, and a partial last line left by a killed process is repaired
+    when the file is opened, so no partial record is left behind. The writer can be fed by several
+    threads, and several processes can append to the same files with their own writer.
+    Attributes:
+        max_buffer_size (int): Size in bytes of the buffered records that triggers a write
+        flush_interval (float): Maximum age in seconds of a buffered record
+        fsync (bool): Whether the checkpoints fsync the written files
+    Methods:
+        write: Buffers a line for a file
+        save: Buffers the JSON line of a component for its output file
+        flush: Writes the buffered records
+        checkpoint: Writes the buffered records and makes them durable
+        close: Checkpoints and closes the files
+    Example:
+        with JSONLWriter() as writer:
+            for dialogue in dialogues:
+                dialogue.save(writer)
+    """
+    def __init__(self, max_buffer_size: int = 1 << 20, flush_interval: float = 5.0, fsync: bool = True):
+        if max_buffer_size <= 0 or flush_interval <= 0:
+            raise ValueError("max_buffer_size and flush_interval must be positive.")
+        self.max_buffer_size = max_buffer_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._pending = [] # (path, line) in saving order
+        self._pending_size = 0
+        self._oldest = None # time.monotonic() of the oldest pending record
+        self._fds = {}
+        self._unsynced = [] # Paths written since the last checkpoint, in writing order
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, path: str, line: str) -> None:
+        """
+        Buffers a line for a file.
+
+        Args:
+            path (str): Path to the JSONL file
+            line (str): The record, without the trailing newline
+
+        Raises:
+            ValueError: If the writer is closed
+        """
+        with self._lock:
+            if self._closed.is_set():
+                raise ValueError("JSONLWriter: write to a closed writer.")
+            self._pending.append((path, line))
+            self._pending_size += len(line) + 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if self._pending_size >= self.max_buffer_size:
+                self._flush_locked()
+
+    def save(self, component) -> None:
+        """
+        Buffers the JSON line of a component for its output file.
+
+        Args:
+            component (BaseComponent): The component to save
+        """
+        self.write(component.output_file, component.to_json_str())
+
+    def flush(self) -> None:
+        """
+        Writes the buffered records to their files.
+        """
+        with self._lock:
+            self._flush_locked()
+
+    def checkpoint(self) -> None:
+        """
+        Writes the buffered records and, if fsync is set, flushes the written files to disk.
+        """
+        with self._lock:
+            self._flush_locked()
+            if self.fsync:
+                for path in self._unsynced:
+                    os.fsync(self._fds[path])
+            self._unsynced = []
+
+    def close(self) -> None:
+        """
+        Checkpoints and closes the files. Closing twice does nothing.
+        """
+        with self._lock:
+            if self._closed.is_set():
+                return
+            try:
+                self.checkpoint()
+            finally:
+                self._closed.set()
+                for fd in self._fds.values():
+                    os.close(fd)
+                self._fds = {}
+        self._flusher.join()
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.flush_interval / 2):
+            with self._lock:
+                if self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval:
+                    try:
+                        self._flush_locked()
+                    except OSError as e:
+                        logger.error(f"JSONLWriter: periodic flush failed, retrying at the next one: {e}")
+
+    def _flush_locked(self) -> None:
+        # Consecutive records of the same file are written at once, keeping the global order
+        written = 0
+        try:
+            for path, records in groupby(self._pending, key=lambda record: record[0]):
+                lines = [line for _, line in records]
+                self._append(path, "".join(line + "\n" for line in lines).encode("utf-8"))
+                written += len(lines)
+        finally:
+            # Whatever could not be written stays pending
+            self._pending = self._pending[written:]
+            self._pending_size = sum(len(line) + 1 for _, line in self._pending)
+            self._oldest = None if not self._pending else self._oldest
+
+    def _append(self, path: str, data: bytes) -> None:
+        fd = self._get_fd(path)
+        self._lock_file(fd)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            self._unlock_file(fd)
+        if path not in self._unsynced:
+            self._unsynced.append(path)
+
+    def _get_fd(self, path: str) -> int:
+        if path not in self._fds:
+            fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o666)
+            self._lock_file(fd)
+            try:
+                self._repair(path, fd)
+            finally:
+                self._unlock_file(fd)
+            self._fds[path] = fd
+        return self._fds[path]
+
+    @staticmethod
+    def _repair(path: str, fd: int, block_size: int = 1 << 16) -> None:
+        # Completes or removes a last line without its newline, left by a process killed while writing
+        size = os.fstat(fd).st_size
+        if size == 0 or os.pread(fd, 1, size - 1) == b"\n":
+            return
+        line_start = 0
+        end = size
+        while end > 0:
+            start = max(0, end - block_size)
+            newline = os.pread(fd, end - start, start).rfind(b"\n")
+            if newline != -1:
+                line_start = start + newline + 1
+                break
+            end = start
+        last_line = os.pread(fd, size - line_start, line_start)
+        try:
+            json.loads(last_line)
+            os.write(fd, b"\n")
+            logger.warning(f"JSONLWriter: added the missing newline at the end of {path}.")
+        except ValueError:
+            os.ftruncate(fd, line_start)
+            logger.warning(f"JSONLWriter: removed a partial record of {size - line_start} bytes at the end of {path}.")
+
+    @staticmethod
+    def _lock_file(fd: int) -> None:
+        if fcntl is not None:
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+
+    @staticmethod
+    def _unlock_file(fd: int) -> None:
+        if fcntl is not None:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
@@ -0,0 +1,229 @@
+from ..logger import logger
+from array import array
+from collections import OrderedDict
+import json
+import mmap
+import os
+import re
+import threading
+
+class LazyRecordList:
+    """
+    A read-only list of the components saved in a JSONL file, decoded on demand.
+    A single pass over the file records the byte offset and the ID of every record; accessing a record
+    then decodes only its line, read straight from a read-only memory map of the file, keeping the last
+    decoded records in a small LRU cache. Since the file is mapped rather than read into private buffers,
+    processes reading the same dataset (e.g. web server or data loader workers) share the OS page cache.
+    The offsets and IDs are persisted in a sidecar index file next to the JSONL file, along with the size,
+    modification time and inode of the file they describe, so later loads skip the pass, and only scan the
+    new lines when the file was appended to since. A file that was modified otherwise is indexed again.
+    Attributes:
+        jsonl_path (str): Path to the JSONL file
+        component_cls (type): The component class of the records, built with component_cls(json_str=line)
+        cache_size (int): Maximum number of decoded records kept in memory
+        index_path (str): Path to the sidecar index file
+        offsets (array): Byte offset of each record in the file
+        ids (list[str]): ID of each record
+    Methods:
+        append: Registers a record just saved at the end of the file
+        close: Unmaps the file
+    Example:
+        documents = LazyRecordList("extracted_texts.jsonl", Document)
+        print(documents.ids[0], documents[0].file_name)
+    """
+    INDEX_VERSION = 2
+    # The components serialize their ID first, so it can be read without parsing the whole line
+    ID_PATTERN = re.compile(rb'\{\s*"id"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+    def __init__(self, jsonl_path: str, component_cls: type, cache_size: int = 128):
+        if cache_size < 0:
+            raise ValueError("cache_size must not be negative.")
+        self.jsonl_path = jsonl_path
+        self.component_cls = component_cls
+        self.cache_size = cache_size
+        self.index_path = f"{jsonl_path}.idx"
+        self.offsets = array("q")
+        self.ids = []
+        self.size = 0 # Bytes of the file covered by the index
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._map = None
+        if os.path.exists(jsonl_path):
+            self._build_index()
+
+    def _build_index(self) -> None:
+        stat = os.stat(self.jsonl_path)
+        indexed = self._load_index_file(stat)
+        if indexed and self.size == stat.st_size:
+            return
+        if indexed:
+            logger.info(f"{self.jsonl_path}: indexing {stat.st_size - self.size} new bytes.")
+        self._scan(self.size)
+        self._save_index_file(stat)
+
+    def _load_index_file(self, stat: os.stat_result) -> bool:
+        # Loads the sidecar index if it still describes (a prefix of) the file, returns whether it did
+        if not os.path.exists(self.index_path):
+            return False
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+            if index["version"] != self.INDEX_VERSION or len(index["offsets"]) != len(index["ids"]):
+                return False
+            size = index["size"]
+            if size > stat.st_size or index["inode"] != stat.st_ino:
+                # A replaced file (e.g. rewritten by migrate_dataset.py) has a new inode
+                return False
+            unchanged = size == stat.st_size and index["mtime_ns"] == stat.st_mtime_ns
+            if not unchanged and not self._same_prefix(index):
+                return False
+        except Exception as e:
+            logger.warning(f"Ignoring the invalid index file {self.index_path}: {e}")
+            return False
+        self.offsets = array("q", index["offsets"])
+        self.ids = index["ids"]
+        self.size = size
+        return True
+
+    def _same_prefix(self, index: dict) -> bool:
+        # An append-only file keeps its indexed prefix: the first and the last indexed records must still
+        # be in place, and the last one must end exactly where the index stops
+        if index["size"] == 0:
+            return True
+        if not index["offsets"]:
+            return False
+        with open(self.jsonl_path, "rb") as f:
+            f.seek(index["offsets"][0])
+            first_line = f.readline()
+            f.seek(index["offsets"][-1])
+            line = f.readline()
+        if index["offsets"][-1] + len(line) != index["size"] or not line.endswith(b"\n"):
+            return False
+        try:
+            return self._read_id(first_line) == index["ids"][0] and self._read_id(line) == index["ids"][-1]
+        except (ValueError, KeyError, TypeError):
+            # The offsets no longer fall on the start of a record
+            return False
+
+    def _scan(self, start: int) -> None:
+        with open(self.jsonl_path, "rb") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if line.strip():
+                    try:
+                        record_id = self._read_id(line) if line.endswith(b"\n") else json.loads(line)["id"]
+                    except ValueError:
+                        # A last line still being written, it will be indexed by a later load
+                        break
+                    self.offsets.append(offset)
+                    self.ids.append(record_id)
+                offset += len(line)
+        self.size = offset
+
+    def _read_id(self, line: bytes) -> str:
+        match = self.ID_PATTERN.match(line)
+        if match:
+            return json.loads(match.group(1))
+        return json.loads(line)["id"]
+
+    def _save_index_file(self, stat: os.stat_result) -> None:
+        # stat is taken before the scan, so a file appended to during the scan is checked at the next load
+        tmp_path = f"{self.index_path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({
+                    "version": self.INDEX_VERSION,
+                    "size": self.size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "inode": stat.st_ino,
+                    "offsets": self.offsets.tolist(),
+                    "ids": self.ids
+                }, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.warning(f"Could not save the index file {self.index_path}: {e}")
+
+    def append(self, record) -> None:
+        """
+        Registers a record that was just saved at the end of the JSONL file (by record.save()).
+
+        Args:
+            record: The saved component
+        """
+        with self._lock:
+            self.offsets.append(self.size)
+            self.ids.append(record.id)
+            self.size = os.path.getsize(self.jsonl_path)
+            self._put_in_cache(len(self.ids) - 1, record)
+
+    def _put_in_cache(self, idx: int, record) -> None:
+        if self.cache_size == 0:
+            return
+        self._cache[idx] = record
+        self._cache.move_to_end(idx)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _get_map(self, end: int) -> mmap.mmap:
+        # Returns a memory map covering the file up to end, mapping the file again if it grew.
+        # A replaced map is not closed, as other threads may still be reading from it.
+        with self._lock:
+            if self._map is None or len(self._map) < end:
+                with open(self.jsonl_path, "rb") as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map
+
+    def _decode(self, idx: int):
+        offset = self.offsets[idx]
+        file_map = self._get_map(self.size)
+        end = file_map.find(b"\n", offset)
+        if end == -1:
+            end = len(file_map)
+        # Decodes the line from a slice of the map, without copying it into a bytes object first
+        with memoryview(file_map) as view, view[offset:end] as line:
+            json_str = str(line, "utf-8")
+        return self.component_cls(json_str=json_str)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("LazyRecordList index out of range")
+        with self._lock:
+            record = self._cache.get(idx)
+            if record is not None:
+                self._cache.move_to_end(idx)
+                return record
+        record = self._decode(idx)
+        with self._lock:
+            self._put_in_cache(idx, record)
+        return record
+
+    def __iter__(self):
+        # Decodes every record in file order, without going through the cache
+        for idx in range(len(self)):
+            yield self._decode(idx)
+
+    def __getstate__(self):
+        # The map, the lock and the cache are per process, a worker maps the file again
+        state = self.__dict__.copy()
+        state["_map"] = None
+        state["_lock"] = None
+        state["_cache"] = OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
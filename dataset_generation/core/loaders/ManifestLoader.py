@@ -0,0 +1,106 @@
+import os
+from ..components.ManifestEntry import ManifestEntry
+from .BaseLoader import BaseLoader
+
+class ManifestLoader(BaseLoader):
+    def __init__(self, jsonl_path: str):
+        super().__init__(jsonl_path)
+
+    def load_data(self) -> list[ManifestEntry]:
+        """
+        Load the manifest entries from a JSONL file.
+
+        The manifest is append only: when a file is seen again under a different path or
+        modification time a new entry with the same content hash is appended, so the last entry
+        of each hash wins.
+
+        Returns:
+            list[ManifestEntry]: A list of ManifestEntry objects, one per content hash.
+                                 Returns empty list if file does not exist.
+
+        Side Effects:
+            Sets self.hash2idx and self.stat2idx, mapping content hashes and
+            (path, size, mtime) keys to indices in the returned list.
+        """
+        self.hash2idx = {}
+        self.stat2idx = {}
+        if not os.path.exists(self.jsonl_path):
+            return []
+        data = []
+        with open(self.jsonl_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    self._add_to_data(data, ManifestEntry(json_str=line))
+        return data
+
+    def load_index(self) -> set[str]:
+        """
+        Returns a set containing all the content hashes in the manifest.
+        Used by the __contains__ method to check if a file content was already processed.
+
+        Returns:
+            set: A set of content hashes.
+        """
+        return set(self.hash2idx.keys())
+
+    def _add_to_data(self, data: list[ManifestEntry], entry: ManifestEntry) -> None:
+        if entry.id in self.hash2idx:
+            data[self.hash2idx[entry.id]] = entry
+        else:
+            self.hash2idx[entry.id] = len(data)
+            data.append(entry)
+        self.stat2idx[ManifestEntry.get_stat_key(entry.path, entry.size, entry.mtime)] = self.hash2idx[entry.id]
+
+    def add_entry(self, entry: ManifestEntry, writer=None) -> None:
+        """
+        Saves a new entry to the manifest and keeps the in-memory indexes up to date.
+
+        Args:
+            entry (ManifestEntry): The entry to be added.
+            writer (JSONLWriter): Buffered writer to save the entry through.
+        """
+        entry.save(writer)
+        self._add_to_data(self.data, entry)
+        self.index.add(entry.id)
+
+    def get_entry_by_hash(self, file_hash: str) -> ManifestEntry:
+        """
+        Retrieves the entry of a file content.
+
+        Args:
+            file_hash (str): The SHA-256 hex digest of the file content.
+
+        Returns:
+            ManifestEntry: The entry if found, None otherwise.
+        """
+        if file_hash not in self.hash2idx:
+            return None
+        return self.data[self.hash2idx[file_hash]]
+
+    def get_entry_by_stat(self, path: str, size: int, mtime: int) -> ManifestEntry:
+        """
+        Retrieves the entry of a file from its path, size and modification time, without
+        having to hash the file.
+
+        Args:
+            path (str): Absolute path of the file.
+            size (int): Size of the file in bytes.
+            mtime (int): Modification time of the file in nanoseconds.
+
+        Returns:
+            ManifestEntry: The entry if found, None otherwise. The entry may describe another
+                           path if the same content was seen there too.
+        """
+        idx = self.stat2idx.get(ManifestEntry.get_stat_key(path, size, mtime))
+        if idx is None:
+            return None
+        return self.data[idx]
+
+    def get_doc_ids(self) -> set[str]:
+        """
+        Retrieves all the document IDs assigned in the manifest.
+
+        Returns:
+            set: A set of document IDs.
+        """
+        return {entry.doc_id for entry in self.data}
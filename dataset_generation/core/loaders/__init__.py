@@ -1,9 +1,17 @@
 from .DialogueLoader import DialogueLoader
 from .DocumentLoader import DocumentLoader
 from .DPODialogueLoader import DPODialogueLoader
+from .ManifestLoader import ManifestLoader
+from .DPOJournalLoader import DPOJournalLoader
+from .LazyRecordList import LazyRecordList
+from .JSONLWriter import JSONLWriter
 
 __all__ = [
     "DialogueLoader",
     "DocumentLoader",
-    "DPODialogueLoader"
+    "DPODialogueLoader",
+    "ManifestLoader",
+    "DPOJournalLoader",
+    "LazyRecordList",
+    "JSONLWriter"
 ]
\ No newline at end of file
@@ -3,9 +3,16 @@ import re
 from unidecode import unidecode
 import os
 import tqdm
+import tempfile
+import hashlib
+from typing import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from ..components import Document
 from ..components import Chunk
+from ..components import ManifestEntry
 from ..loaders import DocumentLoader
+from ..loaders import ManifestLoader
+from ..loaders import JSONLWriter
 from ..logger import logger
 
 class ChunkExtractor:
@@ -26,18 +33,44 @@ class ChunkExtractor:
         output_jsonl (str): Path where the output JSONL file will be saved
         chunk_min_length (int, optional): Minimum length for text chunks. Defaults to 1000
         chunk_max_length (int, optional): Maximum length for text chunks. Defaults to 7000
+        workers (int, optional): Number of worker processes used to extract and pre-process
+            the PDF files. Defaults to 1 (sequential extraction)
+        streaming (bool, optional): If True the PDF pages are fed one by one to an incremental
+            chunker instead of building the whole text first, so the working memory is bounded by
+            the chunk size rather than by the document size. Defaults to False
+        manifest_jsonl (str, optional): Path to a JSONL manifest recording, for each PDF content
+            hash, its document ID and chunk IDs. When given, unchanged files are skipped without
+            being opened (size/mtime fast path) or parsed (content hash), and new files get new
+            document IDs after the existing ones. Defaults to None (no manifest)
     Example:
         >>> extractor = ChunkExtractor("path/to/pdfs", "output.jsonl")
         >>> extractor.extract_texts()
+        >>> ChunkExtractor("path/to/pdfs", "output.jsonl", workers=32).extract_texts()
         - The class handles PDF processing recursively in the specified directory
         - Documents are processed only once (duplicates are skipped)
+        - Document IDs are assigned from the sorted list of PDF files, so they do not depend
+          on the number of workers or on the order in which the workers complete
+        - With a manifest, the document IDs follow the file content instead: adding, removing
+          or reordering PDF files between runs does not change the IDs of the others
         - Text chunks are processed to maintain coherence and readability
-        - Special content (emails, URLs) is preserved using token replacement
+        - Special content (emails, URLs, abbreviations) is preserved when splitting on punctuation
     """
     EMAIL_TOKEN = "<EMAIL_TOKEN>"
     URL_TOKEN = "<URL_TOKEN>"
     SMALL_WORDS_TOKEN = "<SMALL_WORDS_TOKEN>"
     PUNCTUATION_TOKEN = "<PUNCTUATION_TOKEN>"
+    TOKENS = (EMAIL_TOKEN, URL_TOKEN, SMALL_WORDS_TOKEN, PUNCTUATION_TOKEN)
+    EMAIL_REGEX = r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+"
+    URL_REGEX = r"https?://[^\s]+"
+    PUNCTUATION_REGEX = r"[.!?;]"
+    # Single scan equivalent of the token based pipeline, the order of the alternatives is the
+    # order in which emails, URLs, small words and punctuation are replaced there.
+    SEGMENT_REGEX = re.compile(
+        rf"(?P<email>{EMAIL_REGEX})|(?P<url>{URL_REGEX})|\b\w{{1,4}}\.(?!\n)|(?P<punctuation>{PUNCTUATION_REGEX})"
+    )
+    SMALL_WORD_REGEX = re.compile(r"\w{1,4}\.(?!\n)")
+    NON_ASCII_REGEX = re.compile(r"[^\x00-\x7f]+")
+    REFERENCES_MARKER = "references"
     CHUNK_MIN_LENGTH = 1000 # Minimum length of a chunk
     CHUNK_MAX_LENGTH = 7000 # Maximum length of a chunk
 
@@ -45,26 +78,223 @@ class ChunkExtractor:
                  pdfs_path: str,
                  output_jsonl: str,
                  chunk_min_length: int = 1000,
-                 chunk_max_length: int = 7000):
+                 chunk_max_length: int = 7000,
+                 workers: int = 1,
+                 streaming: bool = False,
+                 manifest_jsonl: str = None):
         self.pdf_files = ChunkExtractor._load_pdf_files(pdfs_path)
         self.output_jsonl = output_jsonl
-        self.already_processed = DocumentLoader(output_jsonl)
+        self.already_processed = DocumentLoader(output_jsonl, lazy=True) # Only the IDs are needed upfront
         self.CHUNK_MAX_LENGTH = chunk_max_length
         self.CHUNK_MIN_LENGTH = chunk_min_length
+        self.workers = max(1, workers)
+        self.streaming = streaming
+        self.manifest = ManifestLoader(manifest_jsonl) if manifest_jsonl else None
+        self.file_stats = {} # pdf_file -> (content hash, size, mtime) of the files to extract
         self.id_counter = 0
+        self.writer = None # JSONLWriter of the running extraction, the files are appended to directly otherwise
+
+    def __getstate__(self):
+        """
+        Worker processes only need the chunking parameters, so the (potentially huge)
+        loaded documents and the file list are not pickled along with the instance.
+        """
+        state = self.__dict__.copy()
+        state["already_processed"] = None
+        state["manifest"] = None
+        state["pdf_files"] = []
+        state["file_stats"] = {}
+        state["writer"] = None
+        return state
 
     def extract_texts(self):
         """
         Extracts text from all PDF files, processes it, and saves the documents to a JSONL file.
+
+        The document IDs are assigned upfront following the (sorted) list of PDF files. When
+        self.workers > 1 the extraction and pre-processing run in a process pool, while the
+        documents are still saved by this process only, so the JSONL lines never interleave.
+        With a manifest, only the new or modified files are extracted (see _plan_jobs_from_manifest).
+        The documents and the manifest entries are saved through a buffered JSONLWriter, each entry
+        after its document.
         """
-        logger.info(f"Extracting text from {len(self.pdf_files)} PDF files.")
-        for pdf_file in tqdm.tqdm(self.pdf_files, desc="Extracting text from PDFs"):
+        logger.info(f"Extracting text from {len(self.pdf_files)} PDF files with {self.workers} worker(s).")
+        with JSONLWriter() as self.writer:
             try:
-                self.extract_single_text(pdf_file)
-            except Exception as e:
-                logger.error(f"Error while processing file {pdf_file}: {e}")
-    
-    def extract_single_text(self, pdf_file: str):
+                if self.manifest is not None:
+                    jobs = self._plan_jobs_from_manifest()
+                else:
+                    jobs = [(self._generate_id(), pdf_file) for pdf_file in self.pdf_files]
+                if self.workers > 1:
+                    self._extract_texts_parallel(jobs)
+                    return
+
+                for doc_int_id, pdf_file in tqdm.tqdm(jobs, desc="Extracting text from PDFs"):
+                    try:
+                        document = self.extract_single_text(pdf_file, doc_int_id)
+                        self._record_in_manifest(pdf_file, doc_int_id, document)
+                    except Exception as e:
+                        logger.error(f"Error while processing file {pdf_file}: {e}")
+            finally:
+                self.writer = None
+
+    def _plan_jobs_from_manifest(self) -> list[tuple[int, str]]:
+        """
+        Looks up every PDF file in the manifest and returns the ones that need to be extracted.
+
+        A file is skipped if its (path, size, mtime) is already in the manifest, without opening
+        it. Otherwise its content is hashed: a known hash means the file was only moved or touched,
+        so the manifest is updated with the new path and the file is skipped as well. Documents
+        saved before the manifest existed are adopted by file name. The remaining files get new
+        document IDs, following the highest ID in the manifest or in the output file.
+
+        Returns:
+            list[tuple[int, str]]: The document integer IDs with the PDF files to extract.
+        """
+        known_doc_ids = self.manifest.get_doc_ids()
+        saved_doc_ids = self.already_processed.data.ids
+        # Only the documents missing from the manifest are decoded, from the offsets of the lazy loader
+        unclaimed_documents = {}
+        for idx, doc_id in enumerate(saved_doc_ids):
+            if doc_id not in known_doc_ids:
+                document = self.already_processed.data[idx]
+                unclaimed_documents.setdefault(document.file_name, document)
+        self.id_counter = max(
+            [Document.get_int_id(doc_id) for doc_id in known_doc_ids] +
+            [Document.get_int_id(doc_id) for doc_id in saved_doc_ids],
+            default=0
+        )
+
+        jobs = []
+        planned_hashes = set()
+        for pdf_file in self.pdf_files:
+            path = os.path.abspath(pdf_file)
+            stat = os.stat(path)
+            if self.manifest.get_entry_by_stat(path, stat.st_size, stat.st_mtime_ns):
+                continue
+            file_hash = self._hash_file(path)
+            if file_hash in planned_hashes:
+                logger.info(f"File {pdf_file} has the same content as another file, skipping it.")
+                continue
+            entry = self.manifest.get_entry_by_hash(file_hash)
+            if entry is not None:
+                doc_id, chunk_ids = entry.doc_id, entry.chunk_ids
+            elif os.path.basename(pdf_file) in unclaimed_documents:
+                document = unclaimed_documents.pop(os.path.basename(pdf_file))
+                doc_id, chunk_ids = document.id, [chunk.id for chunk in document.chunks]
+            else:
+                planned_hashes.add(file_hash)
+                self.file_stats[pdf_file] = (file_hash, stat.st_size, stat.st_mtime_ns)
+                jobs.append((self._generate_id(), pdf_file))
+                continue
+            self.manifest.add_entry(ManifestEntry(
+                output_file=self.manifest.jsonl_path,
+                id=file_hash,
+                path=path,
+                size=stat.st_size,
+                mtime=stat.st_mtime_ns,
+                doc_id=doc_id,
+                chunk_ids=chunk_ids
+            ), self.writer)
+        logger.info(f"{len(self.pdf_files) - len(jobs)} PDF files already processed, {len(jobs)} to extract.")
+        return jobs
+
+    def _record_in_manifest(self, pdf_file: str, doc_int_id: int, document: Document) -> None:
+        """
+        Records an extracted PDF file in the manifest, if any. Files that did not produce a
+        document are recorded too (with no chunks) so that they are not parsed again.
+
+        Args:
+            pdf_file (str): Path to the PDF file
+            doc_int_id (int): The integer ID assigned to the file
+            document (Document): The saved document, None if the file did not produce one
+        """
+        if self.manifest is None:
+            return
+        file_hash, size, mtime = self.file_stats.pop(pdf_file)
+        self.manifest.add_entry(ManifestEntry(
+            output_file=self.manifest.jsonl_path,
+            id=file_hash,
+            path=os.path.abspath(pdf_file),
+            size=size,
+            mtime=mtime,
+            doc_id=Document.get_id(doc_int_id),
+            chunk_ids=[chunk.id for chunk in document.chunks] if document else []
+        ), self.writer)
+
+    @staticmethod
+    def _hash_file(path: str, block_size: int = 1 << 20) -> str:
+        """
+        Computes the SHA-256 hex digest of a file, reading it in blocks.
+
+        Args:
+            path (str): Path to the file
+            block_size (int, optional): Number of bytes read at a time. Defaults to 1 MiB
+
+        Returns:
+            str: The hex digest of the file content
+        """
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def _extract_texts_parallel(self, jobs: list[tuple[int, str]]):
+        """
+        Fans out the extraction of the given (doc_int_id, pdf_file) jobs to a process pool.
+
+        The "already processed" checks happen here before submitting, the workers only return
+        the pre-processed chunks (see _extract_chunks) and the documents are built and saved
+        as the results come back.
+
+        Args:
+            jobs (list[tuple[int, str]]): The document integer IDs with their PDF file paths.
+        """
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {}
+            for doc_int_id, pdf_file in jobs:
+                try:
+                    if self._is_already_processed(Document.get_id(doc_int_id), pdf_file):
+                        continue
+                except Exception as e:
+                    logger.error(f"Error while processing file {pdf_file}: {e}")
+                    continue
+                futures[executor.submit(self._extract_chunks, pdf_file)] = (doc_int_id, pdf_file)
+
+            for future in tqdm.tqdm(as_completed(futures), total=len(futures), desc="Extracting text from PDFs"):
+                doc_int_id, pdf_file = futures[future]
+                try:
+                    chunks = future.result()
+                    document = None
+                    if chunks is not None:
+                        document = self._build_document(Document.get_id(doc_int_id), pdf_file, chunks)
+                    if document:
+                        document.save(self.writer)
+                    self._record_in_manifest(pdf_file, doc_int_id, document)
+                except Exception as e:
+                    logger.error(f"Error while processing file {pdf_file}: {e}")
+
+    def _extract_chunks(self, pdf_file: str) -> list[str]:
+        """
+        Reads and pre-processes a single PDF file. This is the unit of work of the process pool,
+        it does not touch the output file.
+
+        Args:
+            pdf_file (str): The file path to the PDF file to be processed.
+
+        Returns:
+            list[str]: The pre-processed chunks, None if the PDF has no text.
+        """
+        logger.info(f"Extracting text from PDF file: {pdf_file}")
+        if self.streaming:
+            return list(self._pre_process_pages(self._read_pdf_pages(pdf_file)))
+        text = self._read_pdf_text(pdf_file)
+        if not text:
+            return None
+        return self._pre_process(text)
+
+    def extract_single_text(self, pdf_file: str, doc_int_id: int = None):
         """
         Extracts text from a single PDF file and saves it as a Document instance in the database.
 
@@ -74,25 +304,68 @@ class ChunkExtractor:
 
         Args:
             pdf_file (str): The file path to the PDF file to be processed.
+            doc_int_id (int, optional): The integer ID of the document. If None, the next
+                sequential ID is generated.
 
         Returns:
-            None
+            Document: The saved document, None if nothing was saved.
 
         Note:
             The method will only save the document if both text extraction and document processing
             are successful (i.e., if they return non-empty/non-None values).
         """
+        if doc_int_id is None:
+            doc_int_id = self._generate_id()
+        if self._is_already_processed(Document.get_id(doc_int_id), pdf_file):
+            return None
         logger.info(f"Extracting text from PDF file: {pdf_file}")
+        document = None
+        if self.streaming:
+            chunks = list(self._pre_process_pages(self._read_pdf_pages(pdf_file)))
+            document = self._build_document(Document.get_id(doc_int_id), pdf_file, chunks)
+        else:
+            text = self._read_pdf_text(pdf_file)
+            if text:
+                document = self.process_text_to_document(text, pdf_file, doc_int_id)
+        if document:
+            document.save(self.writer)
+        return document
+
+    @staticmethod
+    def _read_pdf_text(pdf_file: str) -> str:
+        """
+        Reads the whole text of a PDF file, page by page.
+
+        Args:
+            pdf_file (str): The file path to the PDF file.
+
+        Returns:
+            str: The concatenated text of all the pages.
+        """
         reader = PdfReader(pdf_file)
         text = ""
         for page in reader.pages:
             page_text = page.extract_text()
             if page_text:
                 text += page_text
-        if text:
-            document = self.process_text_to_document(text, pdf_file)
-            if document:
-                document.save()
+        return text
+
+    @staticmethod
+    def _read_pdf_pages(pdf_file: str) -> Iterator[str]:
+        """
+        Lazily reads the text of a PDF file, one page at a time.
+
+        Args:
+            pdf_file (str): The file path to the PDF file.
+
+        Yields:
+            str: The text of each non-empty page.
+        """
+        reader = PdfReader(pdf_file)
+        for page in reader.pages:
+            page_text = page.extract_text()
+            if page_text:
+                yield page_text
 
     @staticmethod
     def _load_pdf_files(pdfs_path: str) -> list[str]:
@@ -103,16 +376,17 @@ class ChunkExtractor:
             pdfs_path (str): The root directory path to search for PDF files.
 
         Returns:
-            list[str]: A list of full paths to all PDF files found in the directory tree.
+            list[str]: A sorted list of full paths to all PDF files found in the directory tree.
+                The order is deterministic so that document IDs are stable across runs.
         """
         pdf_files = []
         for root, _, filenames in os.walk(pdfs_path):
             for filename in filenames:
                 if filename.endswith(".pdf"):
                     pdf_files.append(os.path.join(root, filename))
-        return pdf_files
+        return sorted(pdf_files)
 
-    def process_text_to_document(self, text: str, pdf_file: str) -> Document:
+    def process_text_to_document(self, text: str, pdf_file: str, doc_int_id: int = None) -> Document:
         """
         Process a text and its corresponding PDF file into a Document object.
 
@@ -125,6 +399,8 @@ class ChunkExtractor:
         Args:
             text (str): The text content to be processed
             pdf_file (str): Path to the PDF file associated with the text
+            doc_int_id (int, optional): The integer ID of the document. If None, the next
+                sequential ID is generated.
 
         Returns:
             Document: A Document object containing the processed chunks and metadata
@@ -135,17 +411,49 @@ class ChunkExtractor:
         Raises:
             ValueError: If a document with the same ID exists but with a different file name
         """
-        doc_int_id = self._generate_id()
+        if doc_int_id is None:
+            doc_int_id = self._generate_id()
         doc_id = Document.get_id(doc_int_id)
-        if doc_id in self.already_processed and \
-            self.already_processed.get_document_by_id(doc_id).file_name != os.path.basename(pdf_file):
-            raise ValueError(f"ERROR: Document with ID {doc_id} already processed with a different file name. \
-                             Do not re-run the script with new data if previous data is already present.")
-        if doc_id in self.already_processed:
-            logger.info(f"Document with ID {doc_id} already processed.")
+        if self._is_already_processed(doc_id, pdf_file):
             return None
 
         chunks = self._pre_process(text)
+        return self._build_document(doc_id, pdf_file, chunks)
+
+    def _is_already_processed(self, doc_id: str, pdf_file: str) -> bool:
+        """
+        Checks whether the document has already been saved in a previous run.
+
+        Args:
+            doc_id (str): The document ID assigned to the PDF file
+            pdf_file (str): Path to the PDF file
+
+        Returns:
+            bool: True if the document is already in the output file, False otherwise
+
+        Raises:
+            ValueError: If a document with the same ID exists but with a different file name
+        """
+        if doc_id not in self.already_processed:
+            return False
+        if self.already_processed.get_document_by_id(doc_id).file_name != os.path.basename(pdf_file):
+            raise ValueError(f"ERROR: Document with ID {doc_id} already processed with a different file name. \
+                             Do not re-run the script with new data if previous data is already present.")
+        logger.info(f"Document with ID {doc_id} already processed.")
+        return True
+
+    def _build_document(self, doc_id: str, pdf_file: str, chunks: list[str]) -> Document:
+        """
+        Wraps the pre-processed chunks of a PDF file into a Document object.
+
+        Args:
+            doc_id (str): The document ID assigned to the PDF file
+            pdf_file (str): Path to the PDF file associated with the chunks
+            chunks (list[str]): The pre-processed chunks
+
+        Returns:
+            Document: The Document object, None if the text is corrupted or too short
+        """
         if not chunks or sum(len(chunk.split()) for chunk in chunks) < 200:
             logger.warning(f"Text for file {pdf_file} is probably corrupted or not useful.")
             return None
@@ -175,16 +483,10 @@ class ChunkExtractor:
 
         The preprocessing steps include:
         1. Converting text to ASCII using unidecode
-        2. Removing and storing references
-        3. Extracting and storing emails
-        4. Extracting and storing URLs
-        5. Removing and storing small words (less than 4 characters)
-        6. Removing and storing punctuation
-        7. Restoring small words
-        8. Restoring URLs
-        9. Restoring emails
-        10. Splitting text into chunks based on punctuation
-        11. Unifying and polishing the resulting chunks
+        2. Removing references
+        3. Splitting text into chunks based on punctuation, while preserving emails, URLs and
+           small words (less than 4 characters, e.g. abbreviations) in a single scan
+        4. Unifying and polishing the resulting chunks
 
         Args:
             text (str): The input text to be preprocessed
@@ -192,8 +494,229 @@ class ChunkExtractor:
         Returns:
             list[str]: A list of preprocessed text chunks
         """
-        text = unidecode(text)
+        text = self._to_ascii(text)
         text = self._remove_references(text)
+
+        if any(token in text for token in self.TOKENS):
+            # The text itself contains one of our placeholder tokens, only the token based
+            # pipeline reproduces how those are handled.
+            chunks = self._split_sentences_with_tokens(text)
+        else:
+            chunks, last_sentence_end = self._split_sentences(text)
+            chunks.append(text[last_sentence_end:])
+
+        chunks = self._unify_chunks(chunks)
+        chunks = self._polish_chunks(chunks)
+
+        return chunks
+
+    def _to_ascii(self, text: str) -> str:
+        """
+        Converts the text to ASCII with unidecode. Unidecode maps each character on its own but
+        falls back to a slow per-character loop as soon as the text is not pure ASCII, so only
+        the non-ASCII runs are handed to it.
+
+        Args:
+            text (str): The text to be converted
+
+        Returns:
+            str: The same text as unidecode(text)
+        """
+        return self.NON_ASCII_REGEX.sub(lambda match: unidecode(match.group()), text)
+
+    def _split_sentences(self, text: str, start: int = 0, end: int = None) -> tuple[list[str], int]:
+        """
+        Splits text[start:end] on sentence punctuation with a single scan of SEGMENT_REGEX.
+
+        The regex alternation has the same priorities as the token based pipeline
+        (see _split_sentences_with_tokens): emails first, then URLs, then small words and finally
+        punctuation. Whatever matches one of the first three is kept as is, so only the
+        punctuation outside of them splits the text. This gives exactly the same sentences without
+        building the intermediate texts and without the quadratic token restoring.
+
+        Args:
+            text (str): The text to be split
+            start (int, optional): Position where to start the scan. Defaults to 0
+            end (int, optional): Position where to stop the scan. Defaults to the end of the text
+
+        Returns:
+            tuple[list[str], int]: The sentences found, each one ending with its punctuation, and
+                the position right after the last one (i.e. where the unfinished text begins).
+        """
+        if end is None:
+            end = len(text)
+        sentences = []
+        sentence_start = position = start
+        while True:
+            match = self.SEGMENT_REGEX.search(text, position, end)
+            if match is None:
+                break
+            position = match.end()
+            if match.lastgroup == "punctuation":
+                sentences.append(text[sentence_start:position])
+                sentence_start = position
+            elif match.lastgroup == "email":
+                # The token based pipeline sees "<EMAIL_TOKEN>" here, which is a word boundary,
+                # so a small word glued to the email (only possible with "_") is protected as well,
+                # unless another email or a URL starts there, as those are replaced first.
+                small_word = self.SMALL_WORD_REGEX.match(text, position, end)
+                if small_word:
+                    following = self.SEGMENT_REGEX.match(text, position, end)
+                    if following is None or following.lastgroup not in ("email", "url"):
+                        position = small_word.end()
+        return sentences, sentence_start
+
+    def _pre_process_pages(self, pages: Iterable[str]) -> Iterator[str]:
+        """
+        Streaming version of _pre_process: the pages flow through the same steps (ASCII conversion,
+        references removal, sentence splitting, unification and polishing) and every chunk is
+        yielded as soon as no later page can change it.
+
+        Apart from the emitted chunks, at most one chunk being unified, the current unfinished
+        sentence and a small tail of text are kept in memory. A text following the last candidate
+        "references" marker may still be cut, so it is held back in a temporary file that only
+        spills to disk when it grows beyond CHUNK_MAX_LENGTH.
+        Unlike _pre_process, texts containing the placeholder tokens are always split with the
+        single scan engine.
+
+        Args:
+            pages (Iterable[str]): The text of the document, page by page
+
+        Yields:
+            str: The preprocessed chunks, the same as _pre_process("".join(pages))
+        """
+        texts = self._iter_without_references(pages)
+        sentences = self._iter_sentences(texts)
+        for chunk in self._iter_unified_chunks(sentences):
+            chunk = self._polish_chunk(chunk)
+            if chunk:
+                yield chunk
+
+    def _iter_without_references(self, pages: Iterable[str]) -> Iterator[str]:
+        """
+        Converts the pages to ASCII and removes the references section like _remove_references
+        would do on the whole text, without building it.
+
+        The cut is made at the last " references " if any, else at the last " references", else
+        the last character is dropped if "references" appears at all. Every text before the best
+        candidate found so far is final and is released right away, while the text after it (or
+        the last few characters when there is no candidate) is kept as a tail until a later
+        candidate or the end of the document decides its fate.
+
+        Args:
+            pages (Iterable[str]): The raw text of the document, page by page
+
+        Yields:
+            str: Consecutive pieces of the ASCII text with the references removed
+        """
+        marker = self.REFERENCES_MARKER
+        margin = len(f" {marker} ")  # Enough characters to find a marker spanning two pages
+        tier = 0 # 0: no marker, 1: "references", 2: " references", 3: " references "
+        cut = 0 # Position of the best " references" candidate (tiers 2 and 3)
+        total = 0 # Characters seen so far
+        released = 0 # Characters already yielded
+        window = "" # Lower case copy of the last characters seen
+        tail = tempfile.SpooledTemporaryFile(max_size=self.CHUNK_MAX_LENGTH, mode="w+", newline="")
+
+        def release(boundary):
+            # Yields the tail up to the boundary and keeps the rest
+            nonlocal tail, released
+            tail.seek(0)
+            to_release = boundary - released
+            while to_release > 0:
+                block = tail.read(min(to_release, self.CHUNK_MAX_LENGTH))
+                to_release -= len(block)
+                yield block
+            rest = tail.read()
+            tail.close()
+            tail = tempfile.SpooledTemporaryFile(max_size=self.CHUNK_MAX_LENGTH, mode="w+", newline="")
+            tail.write(rest)
+            released = boundary
+
+        try:
+            for page in pages:
+                page = self._to_ascii(page)
+                search_text = window + page.lower()
+                offset = total - len(window)
+                i = search_text.find(marker)
+                while i != -1:
+                    following = i + len(marker)
+                    # Markers whose following character was already in the window are known
+                    if following >= len(window):
+                        preceded = i > 0 and search_text[i - 1] == " "
+                        followed = following < len(search_text) and search_text[following] == " "
+                        occurrence_tier = 3 if preceded and followed else 2 if preceded else 1
+                        position = offset + i - 1
+                        if occurrence_tier > tier or (occurrence_tier == tier >= 2 and position > cut):
+                            tier = occurrence_tier
+                            cut = position
+                    i = search_text.find(marker, following)
+
+                tail.write(page)
+                total += len(page)
+                window = search_text[-margin:]
+                boundary = cut if tier >= 2 else total - margin
+                if boundary > released:
+                    yield from release(boundary)
+
+            if tier >= 2:
+                boundary = cut
+            elif tier == 1:
+                boundary = total - 1
+            else:
+                boundary = total
+            if boundary > released:
+                yield from release(boundary)
+        finally:
+            tail.close()
+
+    def _iter_sentences(self, texts: Iterable[str]) -> Iterator[str]:
+        """
+        Incremental version of the sentence splitting done in _pre_process.
+
+        The text is only scanned up to its last whitespace: none of the protected patterns
+        (emails, URLs, small words) can span it, so whatever is found before it will not change
+        with the text still to come. The unfinished sentence is carried over to the next piece.
+
+        Args:
+            texts (Iterable[str]): Consecutive pieces of the text
+
+        Yields:
+            str: The sentences, each one ending with its punctuation except the very last one
+        """
+        buffer = ""
+        for text in texts:
+            buffer += text
+            safe_end = max(buffer.rfind(" "), buffer.rfind("\n")) + 1
+            if safe_end == 0:
+                continue
+            sentences, last_sentence_end = self._split_sentences(buffer, 0, safe_end)
+            yield from sentences
+            buffer = buffer[last_sentence_end:]
+        sentences, last_sentence_end = self._split_sentences(buffer)
+        yield from sentences
+        yield buffer[last_sentence_end:]
+
+    def _split_sentences_with_tokens(self, text: str) -> list[str]:
+        """
+        Splits the text on punctuation by temporarily replacing emails, URLs and small words
+        with tokens. This is the original multi-pass pipeline, kept for texts that already contain
+        one of the tokens.
+
+        The steps are:
+        1. Extracting and storing emails
+        2. Extracting and storing URLs
+        3. Removing and storing small words (less than 4 characters)
+        4. Removing and storing punctuation
+        5. Restoring small words, URLs and emails
+        6. Splitting text into chunks based on punctuation
+
+        Args:
+            text (str): The text to be split
+
+        Returns:
+            list[str]: The chunks, each one ending with its punctuation (except the last one)
+        """
         text, emails = self._remove_emails(text)
         text, urls = self._remove_urls(text)
         text, small_words = self._remove_small_words(text, 4)
@@ -206,10 +729,6 @@ class ChunkExtractor:
         for i in range(len(chunks)):
             if i < len(punctuation):
                 chunks[i] = chunks[i] + punctuation[i]
-
-        chunks = self._unify_chunks(chunks)
-        chunks = self._polish_chunks(chunks)
-
         return chunks
         
     def _remove_references(self, text: str) -> str:
@@ -281,26 +800,24 @@ class ChunkExtractor:
         """
         Replaces emails with a token and stores them for later re-insertion.
         """
-        email_regex = r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+"
-        emails = re.findall(email_regex, text)
-        text = re.sub(email_regex, self.EMAIL_TOKEN, text)
+        emails = re.findall(self.EMAIL_REGEX, text)
+        text = re.sub(self.EMAIL_REGEX, self.EMAIL_TOKEN, text)
         return text, emails
 
     def _remove_urls(self, text: str):
         """
         Replaces URLs with a token and stores them for later re-insertion.
         """
-        url_regex = r"https?://[^\s]+"
-        urls = re.findall(url_regex, text)
-        text = re.sub(url_regex, self.URL_TOKEN, text)
+        urls = re.findall(self.URL_REGEX, text)
+        text = re.sub(self.URL_REGEX, self.URL_TOKEN, text)
         return text, urls
 
     def _remove_punctuation(self, text: str):
         """
         Removes punctuation from the text.
         """
-        punctuation = re.findall(r"[.!?;]", text)
-        text = re.sub(r"[.!?;]", self.PUNCTUATION_TOKEN, text)
+        punctuation = re.findall(self.PUNCTUATION_REGEX, text)
+        text = re.sub(self.PUNCTUATION_REGEX, self.PUNCTUATION_TOKEN, text)
         return text, punctuation
 
     def _remove_small_words(self, text: str, max_length: int):
@@ -352,23 +869,34 @@ class ChunkExtractor:
         Returns:
             list[str]: List of unified text chunks where appropriate chunks have been combined
         """
-        if len(chunks) <= 1:
-            return chunks
+        return list(self._iter_unified_chunks(chunks))
 
-        unified_chunks = [chunks[0]]
-        matches = ["\n", "\t", " "]
+    def _iter_unified_chunks(self, chunks: Iterable[str]) -> Iterator[str]:
+        """
+        Generator behind _unify_chunks, a unified chunk is yielded as soon as the next chunk
+        cannot be merged into it.
 
-        for i in range(1, len(chunks)):
-            last_chunk = unified_chunks[-1]
-            current_chunk = chunks[i]
-            if (len(last_chunk) < self.CHUNK_MIN_LENGTH or
-                current_chunk.startswith(tuple(matches)) or
-                last_chunk.endswith(tuple(matches))) and \
+        Args:
+            chunks (Iterable[str]): Text chunks to be unified
+
+        Yields:
+            str: The unified text chunks
+        """
+        matches = ("\n", "\t", " ")
+        last_chunk = None
+        for current_chunk in chunks:
+            if last_chunk is None:
+                last_chunk = current_chunk
+            elif (len(last_chunk) < self.CHUNK_MIN_LENGTH or
+                current_chunk.startswith(matches) or
+                last_chunk.endswith(matches)) and \
                 len(last_chunk) + len(current_chunk) < self.CHUNK_MAX_LENGTH:
-                unified_chunks[-1] += ' ' + current_chunk
+                last_chunk += ' ' + current_chunk
             else:
-                unified_chunks.append(current_chunk)
-        return unified_chunks
+                yield last_chunk
+                last_chunk = current_chunk
+        if last_chunk is not None:
+            yield last_chunk
 
     def _polish_chunks(self, chunks: list[str]) -> list[str]:
         """
@@ -383,11 +911,25 @@ class ChunkExtractor:
         """
         polished_chunks = []
         for chunk in chunks:
-            chunk = chunk.replace("\n", "").strip()
+            chunk = self._polish_chunk(chunk)
+            if chunk:
+                polished_chunks.append(chunk)
+        return polished_chunks
 
-            # If the content of alphanumerical characters is less than 50% of the chunk
-            # then we will discard the chunk.
-            if not chunk or len(re.sub(r"[^a-zA-Z0-9]", "", chunk)) / len(chunk) < 0.5:
-                continue
-            polished_chunks.append(chunk)
-        return polished_chunks
\ No newline at end of file
+    def _polish_chunk(self, chunk: str) -> str:
+        """
+        Polishes a single chunk, see _polish_chunks.
+
+        Args:
+            chunk (str): A text chunk.
+
+        Returns:
+            str: The polished chunk, None if the chunk is not useful.
+        """
+        chunk = chunk.replace("\n", "").strip()
+
+        # If the content of alphanumerical characters is less than 50% of the chunk
+        # then we will discard the chunk.
+        if not chunk or len(re.sub(r"[^a-zA-Z0-9]", "", chunk)) / len(chunk) < 0.5:
+            return None
+        return chunk
\ No newline at end of file
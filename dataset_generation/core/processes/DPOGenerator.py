@@ -1,15 +1,26 @@
-from ..components import PedagogicalRules, DPODialogue, DPOTurn, Turn, Dialogue
-from ..loaders import DPODialogueLoader, DialogueLoader
+from ..components import PedagogicalRules, DPODialogue, DPOTurn, Turn, Dialogue, DPOJournalEntry
+from ..loaders import DPODialogueLoader, DialogueLoader, DPOJournalLoader, JSONLWriter
+from ..clients import RateLimiter, ResponseCache, BatchClient, LocalBatchClient
+from .. import serialization
 from openai import OpenAI
 from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
 import os
 import random
+import threading
 from tqdm import tqdm
 from ..logger import logger
 
 class UseRuleSchema(BaseModel):
     rule_fit_score: int
 
+class RuleScoreSchema(BaseModel):
+    rule_index: int
+    rule_fit_score: int
+
+class RulesScoringSchema(BaseModel):
+    scores: list[RuleScoreSchema]
+
 class GoodAnswerSchema(BaseModel):
     adapted_response: str
     tutor_response: str
@@ -28,6 +39,36 @@ class DPOGenerator:
         good_answer_prompt_path (str): Path to prompt template for generating good answers
         apply_rule_prompt_path (str): Path to prompt template for rule application
         model (str, optional): OpenAI model to use for generation (default: "gpt-4o")
+        concurrency (int, optional): Maximum number of requests in flight within a DFS level, i.e. rule
+            scorings and answer generations (default: 1, sequential)
+        dialogue_concurrency (int, optional): Number of dialogues generated at once by generate_all (default: 1)
+        requests_per_minute (int, optional): Requests per minute limit (default: None, no limit)
+        tokens_per_minute (int, optional): Tokens per minute limit (default: None, no limit)
+        base_url (str, optional): Base URL of an OpenAI-compatible API, e.g. a local mock server (default: None)
+        batch_rules_prompt_path (str, optional): Path to a prompt template scoring several rules in one request.
+            When given, each turn is scored with one request per group of rules instead of one per rule (default: None)
+        rules_group_size (int, optional): Number of rules scored by each batched request, None for all the rules
+            at once. Smaller groups cost more tokens but keep the model focused (default: None)
+        cache_path (str, optional): Path to a SQLite response cache, identical prompts are answered from it
+            without querying the API (default: None, no cache)
+        cache_max_size (int, optional): Maximum size of the cached responses in bytes (default: None, no limit)
+        batch_dir (str, optional): Work directory of the Batch API mode. When given, generate_all advances all the
+            dialogues one turn level at a time and sends the requests of each wave as one batch (default: None)
+        local_batch (bool, optional): Runs the batches with the file-based LocalBatchClient stand-in instead of the
+            OpenAI Batch API (default: False)
+        frontier_path (str, optional): Path of the JSON file where the wave scheduler saves its frontier between
+            waves. When given, generate_all advances all the dialogues one turn level at a time and resumes from
+            the saved frontier after a crash (default: None)
+        journal_path (str, optional): Path of a JSONL journal where the DFS state of each dialogue (current path,
+            seed and pending rule scores) is recorded, so that a restarted run finishes the dialogues it was
+            building without repeating the completed requests (default: None)
+        seed (int, optional): Seed of the random choices. Each dialogue and turn gets its own generator derived from
+            it, so the output does not depend on the scheduling. When None, a random seed is drawn for each
+            dialogue and recorded in the journal (default: None)
+    Example:
+        with DPOGenerator(dialogues_jsonl, dpo_jsonl, rules_txt, good_answer_prompt, apply_rule_prompt, concurrency=8) as generator:
+            generator.generate_all()
+        The request threads of concurrency > 1 are stopped at the end of the with block, or by close().
     """
     K = 3 # The number of leafs to generate for each level of the dfs tree
 
@@ -37,17 +78,74 @@ class DPOGenerator:
                  rules_txt_path: str,
                  good_answer_prompt_path: str,
                  apply_rule_prompt_path: str,
-                 model: str = "gpt-4o"):
+                 model: str = "gpt-4o",
+                 concurrency: int = 1,
+                 dialogue_concurrency: int = 1,
+                 requests_per_minute: int = None,
+                 tokens_per_minute: int = None,
+                 base_url: str = None,
+                 batch_rules_prompt_path: str = None,
+                 rules_group_size: int = None,
+                 cache_path: str = None,
+                 cache_max_size: int = None,
+                 batch_dir: str = None,
+                 local_batch: bool = False,
+                 frontier_path: str = None,
+                 journal_path: str = None,
+                 seed: int = None):
+        if concurrency < 1 or dialogue_concurrency < 1:
+            raise ValueError("concurrency and dialogue_concurrency must be at least 1.")
+        if rules_group_size is not None and rules_group_size < 1:
+            raise ValueError("rules_group_size must be at least 1.")
         self.model = model
         self.client = OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY")
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=base_url
         )
+        self.concurrency = concurrency
+        self.dialogue_concurrency = dialogue_concurrency
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.cache = ResponseCache(cache_path, cache_max_size) if cache_path else None
+        self.frontier_path = frontier_path
+        self.journal = DPOJournalLoader(journal_path) if journal_path else None
+        self.seed = seed
+        self.dialogue_seeds = {} # dialogue_id -> seed of its random choices
+        self.pending_scores = {} # dialogue_id -> rule scores recovered from the journal
+        self.batch_client = None
+        if batch_dir:
+            batch_client_class = LocalBatchClient if local_batch else BatchClient
+            self.batch_client = batch_client_class(self.client, model, batch_dir, cache=self.cache)
+        # Requests are sent from their own pool so that dialogue threads waiting on them can never starve it
+        self.request_pool = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+        self.save_lock = threading.Lock() # Dialogues generated in parallel share the output file
+        self.writer = None # JSONLWriter of the running generation, the files are appended to directly otherwise
+        self.usage_lock = threading.Lock()
+        self.usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
         self.dialogues = DialogueLoader(jsonl_file)
         self.output_jsonl = output_jsonl
         self.already_processed = DPODialogueLoader(output_jsonl)
         self.rules = PedagogicalRules(rules_txt_path)
+        self.rule_indices = [rule_idx for rule_idx, _ in self.rules] # Iterating self.rules is not thread-safe
+        self.batch_rules_prompt = open(batch_rules_prompt_path, "r").read() if batch_rules_prompt_path else None
+        group_size = rules_group_size or len(self.rule_indices)
+        self.rules_groups = [self.rule_indices[i:i+group_size] for i in range(0, len(self.rule_indices), group_size)]
         self.good_answer_prompt = open(good_answer_prompt_path, "r").read()
         self.apply_rule_prompt = open(apply_rule_prompt_path, "r").read()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Shuts down the request pool, waiting for the requests in flight. Requests made afterwards are
+        sent sequentially. Closing twice does nothing.
+        """
+        if self.request_pool is not None:
+            self.request_pool.shutdown(wait=True)
+            self.request_pool = None
     
     def generate_all(self) -> None:
         """
@@ -56,24 +154,300 @@ class DPOGenerator:
         This method iterates through all dialogues stored in the instance and attempts to generate
         preference data for each one. Any errors encountered during processing of individual
         dialogues are caught and logged.
+        With dialogue_concurrency > 1 several dialogues are generated at once, so that the API
+        stays busy while a single dialogue waits on its slowest request.
+        With a batch client or a frontier file the dialogues are instead advanced together, see generate_all_waves.
+        The DPO dialogues and the journal entries are saved through a buffered JSONLWriter, made durable
+        once a dialogue is done and before the frontier is saved.
 
         Raises:
             Exception: Prints error message for any exceptions encountered during processing of individual dialogues.
         """
         logger.info(f"Generating DPO dialogues for {len(self.dialogues)} dialogues.")
-        for dialogue in tqdm(self.dialogues):
+        with JSONLWriter() as self.writer:
             try:
-                if self.already_processed.contains_std_dialogue(dialogue.id):
-                    logger.info(f"Skipping dialogue {dialogue.id} as it has already been processed.")
+                if self.batch_client is not None or self.frontier_path is not None:
+                    self.generate_all_waves()
+                elif self.dialogue_concurrency > 1:
+                    with ThreadPoolExecutor(max_workers=self.dialogue_concurrency) as executor:
+                        futures = [executor.submit(self._generate_dialogue_or_log, dialogue) for dialogue in self.dialogues]
+                        for future in tqdm(futures):
+                            future.result()
+                else:
+                    for dialogue in tqdm(self.dialogues):
+                        self._generate_dialogue_or_log(dialogue)
+            finally:
+                self.writer = None
+        if self.cache is not None:
+            logger.info(f"Response cache: {self.cache.stats()}")
+
+    def _generate_dialogue_or_log(self, dialogue: Dialogue) -> None:
+        try:
+            entry = self.journal.get_entry(dialogue.id) if self.journal is not None else None
+            if entry is not None and entry.done:
+                logger.info(f"Skipping dialogue {dialogue.id} as it has already been processed.")
+                return
+            # Without a journal entry, saved DPO dialogues can only come from a run without journal
+            if entry is None and self.already_processed.contains_std_dialogue(dialogue.id):
+                logger.info(f"Skipping dialogue {dialogue.id} as it has already been processed.")
+                return
+            self.generate_single_dialogue(dialogue)
+        except Exception as e:
+            logger.error(f"Error while processing dialogue {dialogue.id}: {e}")
+    
+    def generate_all_waves(self) -> None:
+        """
+        Generates preferences data for all dialogues, advancing all of them one turn level at a time.
+
+        Each wave handles one turn level of every pending dialogue in two dataset-wide steps: first all
+        the rule scoring prompts, then all the good answer prompts of the selected rules. Each step is
+        sent as one batch through self.batch_client if any, otherwise through the request pool. The path
+        followed in each dialogue is chosen as in dfs_generation, only the order of the requests changes.
+
+        If self.frontier_path is set, the frontier (the dialogues still growing, their current path and,
+        between the two steps, their selected rules) is saved there after each step, and a later run
+        resumes from it. DPO turns already saved by an interrupted wave are reused instead of being
+        generated again. The file is removed once done.
+        """
+        level, frontier = self._load_frontier()
+        while frontier:
+            frontier = [state for state in frontier if level < len(state[2])]
+            if not frontier:
+                break
+            logger.info(f"Generating turn {level} of {len(frontier)} dialogues.")
+            frontier = self._select_frontier(level, frontier)
+            self._save_frontier(level, frontier)
+            frontier = self._expand_frontier(level, frontier)
+            level += 1
+            self._save_frontier(level, frontier)
+        if self.frontier_path is not None and os.path.exists(self.frontier_path):
+            os.remove(self.frontier_path)
+
+    def _select_frontier(self, level: int, frontier: list[tuple]) -> list[tuple]:
+        """
+        Scores, in a single wave, every rule for the upcoming turn of the dialogues of the frontier that
+        have no selected rules yet, and selects the rules to apply.
+
+        Args:
+            level (int): The turn level of the wave
+            frontier (list[tuple]): The (dialogue_id, dpo_turns, raw_turns, rules) states, rules being None
+                                    when not selected yet
+
+        Returns:
+            list[tuple]: The states with their selected rules. Dialogues without applicable rules or whose
+                         scoring failed are dropped.
+        """
+        requests = []
+        for dialogue_id, dpo_turns, raw_turns, rules in frontier:
+            if rules is not None:
+                continue
+            prompts = self._scoring_prompts(dpo_turns, raw_turns[level])
+            requests.extend((f"{dialogue_id}#{i}", prompt, schema) for i, (prompt, schema) in enumerate(prompts))
+        responses = self._run_requests(f"scoring_turn{level}", requests)
+
+        selected = []
+        for dialogue_id, dpo_turns, raw_turns, rules in frontier:
+            if rules is None:
+                scoring_ids = [f"{dialogue_id}#{i}" for i in range(len(self.scoring_jobs))]
+                if any(custom_id not in responses for custom_id in scoring_ids):
+                    logger.error(f"Missing rule scorings for dialogue {dialogue_id} at turn {level}. Dropping it.")
+                    continue
+                scores = self._scores_from_responses([responses[custom_id] for custom_id in scoring_ids])
+                rules = self._select_rules(dialogue_id, level, scores)
+            if rules:
+                selected.append((dialogue_id, dpo_turns, raw_turns, rules))
+        return selected
+
+    def _expand_frontier(self, level: int, frontier: list[tuple]) -> list[tuple]:
+        """
+        Generates, in a single wave, the good answers of the selected rules of every dialogue of the
+        frontier, saves the new DPO turns and picks the one each dialogue continues with.
+
+        Args:
+            level (int): The turn level of the wave
+            frontier (list[tuple]): The (dialogue_id, dpo_turns, raw_turns, rules) states with their selected rules
+
+        Returns:
+            list[tuple]: The frontier of the next turn level.
+        """
+        requests = []
+        for dialogue_id, dpo_turns, raw_turns, rules in frontier:
+            for rule_idx in rules:
+                possible_doc_id = DPODialogue.get_id(dialogue_id, [turn.rule_used for turn in dpo_turns]+[rule_idx])
+                if possible_doc_id in self.already_processed:
+                    continue
+                prompt = self._generate_prompt_good_answer_and_question(
+                    dpo_turns[-1] if dpo_turns else None,
+                    rule_idx,
+                    raw_turns[level]
+                )
+                requests.append((f"{dialogue_id}#r{rule_idx}", prompt, GoodAnswerSchema))
+        responses = self._run_requests(f"answers_turn{level}", requests)
+
+        next_frontier = []
+        for dialogue_id, dpo_turns, raw_turns, rules in frontier:
+            reused_turns = []
+            rules_answers = []
+            for rule_idx in rules:
+                possible_doc_id = DPODialogue.get_id(dialogue_id, [turn.rule_used for turn in dpo_turns]+[rule_idx])
+                if possible_doc_id in self.already_processed:
+                    # Saved by an interrupted run
+                    reused_turns.append(self.already_processed.get_dpo_dialogue_by_id(possible_doc_id).last_turn)
                     continue
-                self.generate_single_dialogue(dialogue)
+                response = responses.get(f"{dialogue_id}#r{rule_idx}")
+                if response is not None:
+                    rules_answers.append((rule_idx, (response["adapted_response"], response["tutor_response"])))
+            local_dpo_turns = reused_turns + self._save_dpo_turns(dialogue_id, dpo_turns, raw_turns[level], rules_answers)
+            if not local_dpo_turns:
+                logger.error(f"No DPO turn generated for dialogue {dialogue_id} at turn {level}. Dropping it.")
+                continue
+            local_dpo_turns.sort(key=lambda turn: rules.index(turn.rule_used))
+            to_continue = self._get_rng(dialogue_id, level, "continue").choice(local_dpo_turns)
+            next_frontier.append((dialogue_id, dpo_turns + [to_continue], raw_turns, None))
+        return next_frontier
+
+    def _run_requests(self, name: str, requests: list[tuple[str, str, type[BaseModel]]]) -> dict[str, dict]:
+        """
+        Sends a wave of requests, as batches if there is a batch client, otherwise through the request pool.
+
+        Args:
+            name (str): Name of the wave, used for the batch files
+            requests (list[tuple[str, str, type[BaseModel]]]): The custom_id, prompt and response schema of each request
+
+        Returns:
+            dict[str, dict]: The parsed response of each request by custom_id. Failed requests are logged and missing.
+        """
+        if not requests:
+            return {}
+        if self.batch_client is not None:
+            return self.batch_client.run(name, requests)
+
+        def query_or_log(request):
+            custom_id, prompt, schema = request
+            try:
+                return self._query_openai(prompt, schema)
             except Exception as e:
-                logger.error(f"Error while processing dialogue {dialogue.id}: {e}")
-    
+                logger.error(f"Request {custom_id} failed: {e}")
+                return None
+        responses = self._map_requests(query_or_log, requests)
+        return {custom_id: response for (custom_id, _, _), response in zip(requests, responses) if response is not None}
+
+    def _load_frontier(self) -> tuple[int, list[tuple]]:
+        """
+        Returns:
+            tuple[int, list[tuple]]: The turn level and the frontier saved by a previous run if any, otherwise
+                                     level 0 with every dialogue not processed yet.
+        """
+        if self.frontier_path is not None and os.path.exists(self.frontier_path):
+            with open(self.frontier_path, "r", encoding="utf-8") as f:
+                saved = serialization.loads(f.read())
+            frontier = []
+            for state in saved["states"]:
+                dialogue = self.dialogues.get_dialogue_by_id(state["dialogue_id"])
+                # Frontiers saved by older versions hold each turn as a JSON string
+                dpo_turns = [
+                    DPOTurn(json_str=turn) if isinstance(turn, str) else DPOTurn(json_dict=turn)
+                    for turn in state["dpo_turns"]
+                ]
+                self.dialogue_seeds[dialogue.id] = state["seed"]
+                frontier.append((dialogue.id, dpo_turns, dialogue.turns, state["rules"]))
+            logger.info(f"Resuming from turn {saved['level']} with {len(frontier)} dialogues.")
+            return saved["level"], frontier
+
+        frontier = []
+        for dialogue in self.dialogues:
+            if self.already_processed.contains_std_dialogue(dialogue.id):
+                logger.info(f"Skipping dialogue {dialogue.id} as it has already been processed.")
+                continue
+            self._init_dialogue_seed(dialogue.id)
+            frontier.append((dialogue.id, [], dialogue.turns, None))
+        self._save_frontier(0, frontier)
+        return 0, frontier
+
+    def _save_frontier(self, level: int, frontier: list[tuple]) -> None:
+        if self.frontier_path is None:
+            return
+        # The DPO turns the frontier refers to must be on disk before it
+        self._checkpoint()
+        saved = {
+            "level": level,
+            "states": [
+                {
+                    "dialogue_id": dialogue_id,
+                    "seed": self.dialogue_seeds[dialogue_id],
+                    "dpo_turns": [turn.to_dict() for turn in dpo_turns],
+                    "rules": rules
+                }
+                for dialogue_id, dpo_turns, _, rules in frontier
+            ]
+        }
+        # Written aside and then renamed, so that a crash never leaves a truncated frontier
+        tmp_path = self.frontier_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(serialization.dumps(saved))
+        os.replace(tmp_path, self.frontier_path)
+
     def generate_single_dialogue(self, dialogue: Dialogue) -> None:
         logger.info(f"Generating DPO dialogues for dialogue {dialogue.id}")
         raw_turns = dialogue.turns
-        self.dfs_generation(dialogue.id, [], raw_turns, 0)
+        dpo_turns = self._resume_from_journal(dialogue.id)
+        self.dfs_generation(dialogue.id, dpo_turns, raw_turns, len(dpo_turns))
+        self._checkpoint()
+
+    def _checkpoint(self) -> None:
+        # Makes the DPO dialogues and journal entries saved so far durable
+        if self.writer is not None:
+            self.writer.checkpoint()
+
+    def _resume_from_journal(self, dialogue_id: str) -> list[DPOTurn]:
+        """
+        Restores the DFS state of a dialogue from the journal, or starts a new one.
+
+        Returns:
+            list[DPOTurn]: The DPO turns of the current path, empty for a new dialogue. The seed and the
+                           pending rule scores of the dialogue are restored as well.
+        """
+        entry = self.journal.get_entry(dialogue_id) if self.journal is not None else None
+        if entry is None:
+            self._init_dialogue_seed(dialogue_id)
+            self._record_journal(dialogue_id, [])
+            return []
+        logger.info(f"Resuming dialogue {dialogue_id} at turn {len(entry.path)}.")
+        self.dialogue_seeds[dialogue_id] = entry.seed
+        if entry.scores is not None:
+            self.pending_scores[dialogue_id] = entry.scores
+        return [
+            self.already_processed.get_dpo_dialogue_by_id(DPODialogue.get_id(dialogue_id, entry.path[:depth])).last_turn
+            for depth in range(1, len(entry.path) + 1)
+        ]
+
+    def _record_journal(self,
+                        dialogue_id: str,
+                        dpo_turns: list[DPOTurn],
+                        scores: list[int] = None,
+                        done: bool = False) -> None:
+        if self.journal is None:
+            return
+        entry = DPOJournalEntry(
+            output_file=self.journal.jsonl_path,
+            id=dialogue_id,
+            seed=self.dialogue_seeds[dialogue_id],
+            path=[turn.rule_used for turn in dpo_turns],
+            scores=scores,
+            done=done
+        )
+        with self.save_lock:
+            self.journal.add_entry(entry, self.writer)
+
+    def _init_dialogue_seed(self, dialogue_id: str) -> None:
+        self.dialogue_seeds[dialogue_id] = self.seed if self.seed is not None else random.getrandbits(63)
+
+    def _get_rng(self, dialogue_id: str, current: int, purpose: str) -> random.Random:
+        """
+        Returns the random generator of one choice of a dialogue. It only depends on the seed of the
+        dialogue, the turn and the purpose of the choice, so resumed or concurrent runs make the same choices.
+        """
+        return random.Random(f"{self.dialogue_seeds[dialogue_id]}:{dialogue_id}:{current}:{purpose}")
     
     def dfs_generation(self,
                        dialogue_id: str,
@@ -83,9 +457,9 @@ class DPOGenerator:
         """
         Recursively generates DPO (Direct Preference Optimization) dialogues by applying rules to transform raw dialogue turns.
         This method implements a depth-first search approach to generate variations of dialogues by:
-        1. Evaluating applicable rules for the current turn
+        1. Evaluating applicable rules for the current turn (concurrently if self.concurrency > 1)
         2. Selecting top scoring rules
-        3. Generating self.K modified turns using selected rules 
+        3. Generating self.K modified turns using selected rules (concurrently as well)
         4. Recursively continuing with one randomly selected modified turn
         Args:
             dialogue_id (str): Unique identifier for the original dialogue
@@ -99,15 +473,89 @@ class DPOGenerator:
             - At most K rules are randomly selected from highest scoring rules
             - Generated dialogues are saved before continuing recursion
             - Method terminates when reaching end of raw turns or when no rules are applicable
+            - With a journal, the scores and the chosen turn of each level are recorded before moving on
         """
         if current == len(raw_turns):
             logger.info(f"Reached the end of the dialogue with ID {dialogue_id}")
+            self._record_journal(dialogue_id, dpo_turns, done=True)
             return
         
         upcoming_turn = raw_turns[current]
+        scores = self.pending_scores.pop(dialogue_id, None)
+        if scores is None:
+            scores = self._score_rules(dpo_turns, upcoming_turn)
+            self._record_journal(dialogue_id, dpo_turns, scores=scores)
+        to_continue = self._expand_turn(dialogue_id, dpo_turns, upcoming_turn, current, scores)
+        if to_continue is None:
+            self._record_journal(dialogue_id, dpo_turns, done=True)
+            return
+        self._record_journal(dialogue_id, dpo_turns + [to_continue])
+        self.dfs_generation(dialogue_id, dpo_turns + [to_continue], raw_turns, current+1)
+
+    def _expand_turn(self,
+                     dialogue_id: str,
+                     dpo_turns: list[DPOTurn],
+                     upcoming_turn: Turn,
+                     current: int,
+                     scores: list[int]) -> DPOTurn:
+        """
+        Expands one node of the DFS tree given the scores of every rule for the upcoming turn: generates
+        and saves the DPO turns of (at most K of) the best rules and picks the one to continue with.
+
+        Args:
+            dialogue_id (str): Unique identifier for the original dialogue
+            dpo_turns (list[DPOTurn]): List of previously generated DPO turns in current path
+            upcoming_turn (Turn): The original turn being processed
+            current (int): Position of the upcoming turn in the dialogue
+            scores (list[int]): The score of each rule, in the order of self.rule_indices
+
+        Returns:
+            DPOTurn: The generated turn to continue the path with, None if no rule applies.
+        """
+        applicable_rules = self._select_rules(dialogue_id, current, scores)
+        if not applicable_rules:
+            return None
+
+        # Now for each rule we will generate the dpo turn
+        rules_to_generate = []
+        reused_turns = []
+        for rule_idx in applicable_rules:
+            possible_doc_id = DPODialogue.get_id(dialogue_id, [turn.rule_used for turn in dpo_turns]+[rule_idx])
+            if possible_doc_id in self.already_processed:
+                logger.info(f"Reusing rule {rule_idx} for dialogue {dialogue_id} as it has already been processed.")
+                reused_turns.append(self.already_processed.get_dpo_dialogue_by_id(possible_doc_id).last_turn)
+                continue
+            rules_to_generate.append(rule_idx)
+
+        # First the adapted student question and tutor response
+        answers = self._map_requests(
+            lambda rule_idx: self._get_good_answer_and_question(
+                dpo_turns[-1] if dpo_turns else None,
+                rule_idx,
+                upcoming_turn,
+            ),
+            rules_to_generate
+        )
+        local_dpo_turns = reused_turns + self._save_dpo_turns(dialogue_id, dpo_turns, upcoming_turn, zip(rules_to_generate, answers))
+        local_dpo_turns.sort(key=lambda turn: applicable_rules.index(turn.rule_used))
+
+        # Out of all the dpo turns generated so far, we will select only one random one to continue
+        return self._get_rng(dialogue_id, current, "continue").choice(local_dpo_turns)
+
+    def _select_rules(self, dialogue_id: str, current: int, scores: list[int]) -> list[int]:
+        """
+        Picks at most K of the best scoring rules, among the ones scoring 4 or 5.
+
+        Args:
+            dialogue_id (str): Unique identifier for the original dialogue
+            current (int): Position of the upcoming turn in the dialogue
+            scores (list[int]): The score of each rule, in the order of self.rule_indices
+
+        Returns:
+            list[int]: The indices of the rules to apply, empty if no rule applies.
+        """
         rules_scores = []
-        for rule_idx, rule in self.rules:
-            score = self._get_rule_scoring(rule_idx, dpo_turns, upcoming_turn)
+        for rule_idx, score in zip(self.rule_indices, scores):
             # We do not want to apply rules that have a score of 3 or less
             if score not in [4, 5]:
                 continue
@@ -116,7 +564,7 @@ class DPOGenerator:
         # If there are no rules to apply we will just skip this turn
         if not rules_scores:
             logger.warning(f"No applicable rules for dialogue {dialogue_id} at turn {current}. Skipping.")
-            return
+            return []
 
         # Isolating the rules that have the highest score [TODO] you can make it way more efficient
         rules_scores.sort(reverse=True)
@@ -124,22 +572,29 @@ class DPOGenerator:
         max_scoring_rules = [rule_idx for score, rule_idx in rules_scores if score == max_score]
 
         # Now we will randomly select K of the rules to apply
-        applicable_rules = random.sample(max_scoring_rules, min(self.K, len(max_scoring_rules)))
-        
-        # Now for each rule we will generate the dpo turn
-        local_dpo_turns = []
-        for rule_idx in applicable_rules:
-            possible_doc_id = DPODialogue.get_id(dialogue_id, [turn.rule_used for turn in dpo_turns]+[rule_idx])
-            if possible_doc_id in self.already_processed:
-                logger.info(f"Skipping rule {rule_idx} for dialogue {dialogue_id} as it has already been processed.")
-                continue
-            # First the adapted student question and tutor response
-            adapted_student, adapted_tutor = self._get_good_answer_and_question(
-                dpo_turns[-1] if dpo_turns else None,
-                rule_idx,
-                upcoming_turn,
-            )
+        rng = self._get_rng(dialogue_id, current, "select")
+        return rng.sample(max_scoring_rules, min(self.K, len(max_scoring_rules)))
 
+    def _save_dpo_turns(self,
+                        dialogue_id: str,
+                        dpo_turns: list[DPOTurn],
+                        upcoming_turn: Turn,
+                        rules_answers) -> list[DPOTurn]:
+        """
+        Builds and saves the DPO turns of the given rules, each as a new node of the dialogue tree.
+
+        Args:
+            dialogue_id (str): Unique identifier for the original dialogue
+            dpo_turns (list[DPOTurn]): List of previously generated DPO turns in current path
+            upcoming_turn (Turn): The original turn being processed
+            rules_answers (Iterable[tuple[int, tuple[str, str]]]): Each rule index with its adapted
+                student question and tutor response
+
+        Returns:
+            list[DPOTurn]: The saved DPO turns
+        """
+        local_dpo_turns = []
+        for rule_idx, (adapted_student, adapted_tutor) in rules_answers:
             # And now let's generate the dpo turn
             dpo_turn = DPOTurn(
                 student_question=adapted_student,
@@ -158,17 +613,81 @@ class DPOGenerator:
                 last_turn=turn,
                 output_jsonl=self.output_jsonl
             )
-            dialogue.save()
+            with self.save_lock:
+                self.already_processed.add_dpo_dialogue(dialogue, self.writer)
+        return local_dpo_turns
 
-        # Out of all the dpo turns generated so far, we will select only one random one to continue
-        to_continue = random.choice(local_dpo_turns)
-        self.dfs_generation(dialogue_id, dpo_turns + [to_continue], raw_turns, current+1)
+    def _map_requests(self, fn, items: list) -> list:
+        """
+        Applies fn to every item, through the request pool if concurrency > 1.
 
-    def _generate_prompt_apply_rule(self,
-                                    rule_index: int,
-                                    dialogue_so_far: list[DPOTurn],
-                                    upcoming_turn: Turn) -> str:
-        prompt = self.apply_rule_prompt.replace("<PEDAGOGICAL RULE>", self.rules[rule_index])
+        Args:
+            fn (callable): The function making the request
+            items (list): The arguments of each call
+
+        Returns:
+            list: The results, in the same order as the items. The first error raised by a call is re-raised.
+        """
+        if self.request_pool is None:
+            return [fn(item) for item in items]
+        return list(self.request_pool.map(fn, items))
+
+    def _score_rules(self, dialogue_so_far: list[DPOTurn], upcoming_turn: Turn) -> list[int]:
+        """
+        Scores every rule for the upcoming turn, either with one request per rule or, if a batched
+        rules prompt was given, with one request per group of rules.
+
+        Args:
+            dialogue_so_far (list[DPOTurn]): The DPO turns generated so far in the current path
+            upcoming_turn (Turn): The turn to score the rules for
+
+        Returns:
+            list[int]: The score of each rule, in the order of self.rule_indices
+        """
+        prompts = self._scoring_prompts(dialogue_so_far, upcoming_turn)
+        responses = self._map_requests(lambda prompt_schema: self._query_openai(*prompt_schema), prompts)
+        return self._scores_from_responses(responses)
+
+    @property
+    def scoring_jobs(self) -> list:
+        # What each scoring request covers: a single rule index, or a group of rule indices when batched
+        return self.rule_indices if self.batch_rules_prompt is None else self.rules_groups
+
+    def _scoring_prompts(self,
+                         dialogue_so_far: list[DPOTurn],
+                         upcoming_turn: Turn) -> list[tuple[str, type[BaseModel]]]:
+        """
+        Builds the prompts needed to score every rule for the upcoming turn.
+
+        Returns:
+            list[tuple[str, type[BaseModel]]]: The prompt and response schema of each request, one per
+                                               element of self.scoring_jobs
+        """
+        if self.batch_rules_prompt is None:
+            return [
+                (self._generate_prompt_apply_rule(rule_idx, dialogue_so_far, upcoming_turn), UseRuleSchema)
+                for rule_idx in self.rule_indices
+            ]
+        return [
+            (self._generate_prompt_apply_rules(group, dialogue_so_far, upcoming_turn), RulesScoringSchema)
+            for group in self.rules_groups
+        ]
+
+    def _scores_from_responses(self, responses: list[dict]) -> list[int]:
+        """
+        Turns the responses to the prompts of _scoring_prompts into the score of each rule.
+
+        Returns:
+            list[int]: The score of each rule, in the order of self.rule_indices
+        """
+        if self.batch_rules_prompt is None:
+            return [self._clip_score(response["rule_fit_score"]) for response in responses]
+        scores = {}
+        for group, response in zip(self.rules_groups, responses):
+            scores.update(self._parse_rules_scoring(group, response))
+        return [scores[rule_idx] for rule_idx in self.rule_indices]
+
+    def _format_conversation_so_far(self, dialogue_so_far: list[DPOTurn]) -> str:
         con_so_far = ""
         for turn in dialogue_so_far[-2:]: # We only need the last two interactions to make a call
             con_so_far += f"Student: {turn.student_question}\n"
@@ -176,7 +695,27 @@ class DPOGenerator:
         # If the conversation is empty we will replace the placeholder with an empty string
         if con_so_far == "":
             con_so_far = "// the conversation has just started, no conversation so far\n"
-        prompt = prompt.replace("<CONVERSATION SO FAR>", con_so_far)
+        return con_so_far
+
+    def _generate_prompt_apply_rule(self,
+                                    rule_index: int,
+                                    dialogue_so_far: list[DPOTurn],
+                                    upcoming_turn: Turn) -> str:
+        prompt = self.apply_rule_prompt.replace("<PEDAGOGICAL RULE>", self.rules[rule_index])
+        prompt = prompt.replace("<CONVERSATION SO FAR>", self._format_conversation_so_far(dialogue_so_far))
+
+        prompt = prompt.replace("<STUDENT QUESTION>", upcoming_turn.user)
+        prompt = prompt.replace("<TUTOR ANSWER>", upcoming_turn.assistant)
+
+        return prompt
+
+    def _generate_prompt_apply_rules(self,
+                                     rule_indices: list[int],
+                                     dialogue_so_far: list[DPOTurn],
+                                     upcoming_turn: Turn) -> str:
+        rules_list = "\n".join(f"RULE {rule_idx}: {self.rules[rule_idx]}" for rule_idx in rule_indices)
+        prompt = self.batch_rules_prompt.replace("<PEDAGOGICAL RULES>", rules_list)
+        prompt = prompt.replace("<CONVERSATION SO FAR>", self._format_conversation_so_far(dialogue_so_far))
 
         prompt = prompt.replace("<STUDENT QUESTION>", upcoming_turn.user)
         prompt = prompt.replace("<TUTOR ANSWER>", upcoming_turn.assistant)
@@ -205,28 +744,43 @@ class DPOGenerator:
         response = self._query_openai(prompt, GoodAnswerSchema)
         return response["adapted_response"], response["tutor_response"]
     
-    def _get_rule_scoring(self,
-                        rule_to_apply: int,
-                        dialogue_so_far: list[DPOTurn],
-                        upcoming_turn) -> int:
-        # If the rule has been applied in the past 3 turns, return False [TODO] ask confirmation to proceed
-        # if rule_to_apply in [turn.rule_used for turn in dialogue_so_far[-3:]]:
-        #     return 0
-        
-        # Else we will ask OpenAI if the rule should be applied
-        prompt = self._generate_prompt_apply_rule(rule_to_apply, dialogue_so_far, upcoming_turn)
-        response = self._query_openai(prompt, UseRuleSchema)
-        score = response["rule_fit_score"]
+    def _parse_rules_scoring(self, rules_to_apply: list[int], response: dict) -> dict[int, int]:
+        """
+        Reads the scores of a group of rules from a batched scoring response.
+
+        Args:
+            rules_to_apply (list[int]): The indices of the rules scored by the request
+            response (dict): The parsed RulesScoringSchema response
 
+        Returns:
+            dict[int, int]: The score of each rule. Rules missing from the response get the lowest score.
+        """
+        scores = {rule_idx: 1 for rule_idx in rules_to_apply}
+        returned = set()
+        for rule_score in response["scores"]:
+            if rule_score["rule_index"] in scores:
+                scores[rule_score["rule_index"]] = self._clip_score(rule_score["rule_fit_score"])
+                returned.add(rule_score["rule_index"])
+        if len(returned) < len(rules_to_apply):
+            logger.warning(f"Batched scoring returned no score for rules {sorted(set(rules_to_apply) - returned)}.")
+        return scores
+
+    @staticmethod
+    def _clip_score(score: int) -> int:
         # Manually clipping the score between 1 and 5
         if score < 1:
             score = 1
         elif score > 5:
             score = 5
-
         return score
 
     def _query_openai(self, prompt: str, schema: BaseModel) -> str:
+        if self.cache is not None:
+            response = self.cache.get(self.model, schema.__name__, prompt)
+            if response is not None:
+                return response
+        estimated_tokens = RateLimiter.estimate_tokens(prompt)
+        self.rate_limiter.acquire(estimated_tokens)
         completion = self.client.beta.chat.completions.parse(
             model=self.model,
             messages=[
@@ -234,7 +788,15 @@ class DPOGenerator:
             ],
             response_format=schema
         )
+        if completion.usage is not None:
+            self.rate_limiter.adjust(estimated_tokens, completion.usage.total_tokens)
+            with self.usage_lock:
+                self.usage["requests"] += 1
+                self.usage["prompt_tokens"] += completion.usage.prompt_tokens
+                self.usage["completion_tokens"] += completion.usage.completion_tokens
         # Parsing back to python object
         completion = completion.to_dict()
         response = completion["choices"][0]["message"]["parsed"]
+        if self.cache is not None:
+            self.cache.put(self.model, schema.__name__, prompt, response)
         return response
\ No newline at end of file
@@ -2,9 +2,11 @@ from openai import OpenAI
 from pydantic import BaseModel
 import os
 from tqdm import tqdm
-from ..loaders import DocumentLoader, DialogueLoader
+from ..loaders import DocumentLoader, DialogueLoader, JSONLWriter
 from ..components import Chunk, Dialogue, Turn, Document
+from ..clients import RateLimiter, ResponseCache, BatchClient, LocalBatchClient
 from ..logger import logger
+from concurrent.futures import ThreadPoolExecutor
 import random
 import traceback
 
@@ -32,6 +34,19 @@ class DialogueGenerator:
         output_jsonl (str): Path to output JSONL file for storing generated dialogues
         prompt_path (str): Path to prompt template file
         model (str, optional): OpenAI model name. Defaults to "gpt-4"
+        concurrency (int, optional): Maximum number of requests in flight. Defaults to 1 (sequential)
+        requests_per_minute (int, optional): Requests per minute limit. Defaults to None (no limit)
+        tokens_per_minute (int, optional): Tokens per minute limit. Defaults to None (no limit)
+        base_url (str, optional): Base URL of an OpenAI-compatible API, e.g. a local mock server.
+            Defaults to None (the OpenAI API, or the OPENAI_BASE_URL environment variable)
+        cache_path (str, optional): Path to a SQLite response cache, identical prompts are answered from it
+            without querying the API. Defaults to None (no cache)
+        cache_max_size (int, optional): Maximum size of the cached responses in bytes, least recently used
+            responses are evicted past it. Defaults to None (no limit)
+        batch_dir (str, optional): Work directory of the Batch API mode. When given, generate_all sends all the
+            queries as batches instead of one request each. Defaults to None
+        local_batch (bool, optional): Runs the batches with the file-based LocalBatchClient stand-in instead
+            of the OpenAI Batch API. Defaults to False
         - Requires OpenAI API key set in environment variables
         - Input JSONL should contain coherent text chunks from PDF files
         - Prompt file should contain <SOURCE_TEXT> token for replacement
@@ -42,7 +57,15 @@ class DialogueGenerator:
                  jsonl_file: str,
                  output_jsonl: str,
                  prompt_path: str,
-                 model: str = "gpt-4o"
+                 model: str = "gpt-4o",
+                 concurrency: int = 1,
+                 requests_per_minute: int = None,
+                 tokens_per_minute: int = None,
+                 base_url: str = None,
+                 cache_path: str = None,
+                 cache_max_size: int = None,
+                 batch_dir: str = None,
+                 local_batch: bool = False
                 ):
         """
         This class is a wrapper around the OpenAI API. It is meant to be used for creating dialogues
@@ -51,14 +74,27 @@ class DialogueGenerator:
         with the <SOURCE_TEXT> token to be replaced by the text extracted from the pdf file.
         As an output the class will generate a dialogue between a student and a tutor based on the text
         by querying the OpenAI API.
+        With concurrency > 1 the requests are sent from a pool of threads, while the dialogues are
+        still saved by the calling thread only and in the same order as the sequential run.
         """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1.")
         self.client = OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY")
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=base_url
         )
         self.model = model
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.cache = ResponseCache(cache_path, cache_max_size) if cache_path else None
+        self.batch_client = None
+        if batch_dir:
+            batch_client_class = LocalBatchClient if local_batch else BatchClient
+            self.batch_client = batch_client_class(self.client, model, batch_dir, cache=self.cache)
         self.docs = DocumentLoader(jsonl_file)
         self.output_jsonl = output_jsonl
-        self.already_processed = DialogueLoader(output_jsonl)
+        self.already_processed = DialogueLoader(output_jsonl, lazy=True)
+        self.writer = None # JSONLWriter of the running generation, the file is appended to directly otherwise
         self.prompt = open(prompt_path, "r").read() # The prompt with the <SOURCE_TEXT> token to be replaced
     
     def _generate_sub_sample(self, max_generations):
@@ -94,17 +130,64 @@ class DialogueGenerator:
         Iterates through all documents in self.docs and attempts to generate a dialogue
         for each one. If an error occurs during generation for a specific document,
         the error is printed and processing continues with the next document.
+        With concurrency > 1 up to self.concurrency dialogues are generated at once, but they
+        are saved one at a time by this thread, in the order of the source texts, through a
+        buffered JSONLWriter.
+        With a batch client all the queries are sent as batches, see _generate_all_batched.
 
         Raises:
             No direct exceptions, but may print errors from generate_single_dialogue()
         """
         logger.info(f"Generating dialogues for all documents.")
         source_texts = self._generate_sub_sample(max_generations)
-        for source_text in tqdm(source_texts):
+        with JSONLWriter() as self.writer:
             try:
-                self.generate_single_dialogue(source_text)
-            except Exception as e:
-                logger.error(f"Error while processing document {source_text[0]}: {e}\n {traceback.format_exc()}")
+                if self.batch_client is not None:
+                    self._generate_all_batched(source_texts)
+                    self._log_cache_stats()
+                    return
+                if self.concurrency > 1:
+                    with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                        # map yields the results in submission order, so the appends stay ordered
+                        dialogues = executor.map(self._build_dialogue_or_log, source_texts)
+                        for dialogue in tqdm(dialogues, total=len(source_texts)):
+                            if dialogue is not None:
+                                dialogue.save(self.writer)
+                    self._log_cache_stats()
+                    return
+
+                for source_text in tqdm(source_texts):
+                    try:
+                        self.generate_single_dialogue(source_text)
+                    except Exception as e:
+                        logger.error(f"Error while processing document {source_text[0]}: {e}\n {traceback.format_exc()}")
+                self._log_cache_stats()
+            finally:
+                self.writer = None
+
+    def _generate_all_batched(self, source_texts: list[tuple[list[str], str]]) -> None:
+        """
+        Sends the queries of all the source texts through the batch client, then saves the dialogues
+        in the order of the source texts. Failed requests are logged by the batch client and skipped.
+
+        Args:
+            source_texts (list[tuple[list[str], str]]): The chunk IDs and merged text of each source text
+        """
+        requests = []
+        for chunk_ids, source_text in source_texts:
+            dialogue_id = Dialogue.get_id(chunk_ids)
+            if dialogue_id in self.already_processed:
+                logger.info(f"Dialogue with ID {dialogue_id} already processed.")
+                continue
+            requests.append((dialogue_id, self._generate_prompt(source_text), DialogueSchema))
+        responses = self.batch_client.run("dialogues", requests)
+        for dialogue_id, _, _ in requests:
+            if dialogue_id in responses:
+                self.create_dialogue(responses[dialogue_id]["dialogue"], dialogue_id).save(self.writer)
+
+    def _log_cache_stats(self) -> None:
+        if self.cache is not None:
+            logger.info(f"Response cache: {self.cache.stats()}")
     
     def _generate_all_source_texts(self):
         """
@@ -136,14 +219,36 @@ class DialogueGenerator:
             - Dialogues are generated using OpenAI's API
             - Generated dialogues are saved to storage
         """
+        dialogue = self._build_dialogue(source_texts)
+        if dialogue is not None:
+            dialogue.save(self.writer)
+
+    def _build_dialogue(self, source_texts) -> Dialogue:
+        """
+        Queries the OpenAI API for a source text and builds the dialogue without saving it.
+
+        Args:
+            source_texts (tuple[list[str], str]): The chunk IDs and the merged source text
+
+        Returns:
+            Dialogue: The generated dialogue, None if it was already processed.
+        """
         logger.info(f"Generating dialogue for chunks {source_texts[0]}")
         chunk_ids, source_text = source_texts
         dialogue_id = Dialogue.get_id(chunk_ids)
         if dialogue_id in self.already_processed:
             logger.info(f"Dialogue with ID {dialogue_id} already processed.")
+            return None
         dialogue_list = self._query_openai(source_text)
-        dialogue = self.create_dialogue(dialogue_list, dialogue_id)
-        dialogue.save()
+        return self.create_dialogue(dialogue_list, dialogue_id)
+
+    def _build_dialogue_or_log(self, source_texts) -> Dialogue:
+        # Worker entry point, errors are logged here so that one failure does not stop the others
+        try:
+            return self._build_dialogue(source_texts)
+        except Exception as e:
+            logger.error(f"Error while processing document {source_texts[0]}: {e}\n {traceback.format_exc()}")
+            return None
 
 
     def create_dialogue(self, dialogue: list[dict], dialogue_id: str) -> Dialogue:
@@ -173,6 +278,12 @@ class DialogueGenerator:
             list[dict]: A list of dictionaries with the format {"student": str, "tutor": str}
         """
         prompt = self._generate_prompt(source_text)
+        if self.cache is not None:
+            parsed = self.cache.get(self.model, DialogueSchema.__name__, prompt)
+            if parsed is not None:
+                return parsed["dialogue"]
+        estimated_tokens = RateLimiter.estimate_tokens(prompt)
+        self.rate_limiter.acquire(estimated_tokens)
         completion = self.client.beta.chat.completions.parse(
             model=self.model,
             messages=[
@@ -180,9 +291,14 @@ class DialogueGenerator:
             ],
             response_format=DialogueSchema
         )
+        if completion.usage is not None:
+            self.rate_limiter.adjust(estimated_tokens, completion.usage.total_tokens)
         # Parsing back to python object
         completion = completion.to_dict()
-        dialogue = completion["choices"][0]["message"]["parsed"]["dialogue"]
+        parsed = completion["choices"][0]["message"]["parsed"]
+        if self.cache is not None:
+            self.cache.put(self.model, DialogueSchema.__name__, prompt, parsed)
+        dialogue = parsed["dialogue"]
         return dialogue
 
     def _generate_prompt(self, source_text: str) -> str:
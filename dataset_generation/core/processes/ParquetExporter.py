@@ -0,0 +1,236 @@
+from ..loaders import DocumentLoader, DialogueLoader, DPODialogueLoader
+from ..logger import logger
+from typing import Iterable
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # Optional, only needed to export the dataset
+    pa = None
+    pq = None
+
+class ParquetExporter:
+    """
+    Exports the generated dataset to columnar Parquet files, one table per kind of record, so that
+    the training scripts can load it with pyarrow / HF datasets instead of rebuilding it in Python.
+    The tables are written in the order of the JSONL files (the dpo_pairs in the order of the DPO
+    trees), one row group every row_group_size rows, so they can be streamed a row group at a time.
+    The IDs repeated across rows (e.g. the document ID of the chunks) are dictionary-encoded, the
+    primary IDs are plain strings.
+    Tables (<output_dir>/<name>.parquet):
+        documents: doc_id, file_name, n_chunks
+        chunks: chunk_id, doc_id, chunk_idx, text
+        dialogues: dialogue_id, doc_id, chunk_ids, messages (the turns in chat format, a list of
+            {"role": "user" | "assistant", "content"} as expected by the SFT script)
+        turns: dialogue_id, turn_idx, user, assistant
+        dpo_pairs: id, dialogue_id, doc_id, depth, rule_used, history (the previous student questions
+            and chosen answers, alternated), question, chosen, rejected. One row per DPO dialogue.
+    Attributes:
+        output_dir (str): Directory the Parquet files are written to
+        row_group_size (int): Number of rows of each row group
+        compression (str): Parquet compression codec
+    Args:
+        output_dir (str): Directory the Parquet files are written to, created if missing
+        documents_jsonl (str, optional): Documents JSONL file. Defaults to None (not exported)
+        dialogues_jsonl (str, optional): Dialogues JSONL file. Defaults to None (not exported)
+        dpo_dialogues_jsonl (str, optional): DPO dialogues JSONL file. Defaults to None (not exported)
+        row_group_size (int, optional): Number of rows of each row group. Defaults to 8192
+        compression (str, optional): Parquet compression codec. Defaults to "zstd"
+    Raises:
+        ImportError: If pyarrow is not installed
+    Example:
+        >>> ParquetExporter("data/parquet", dpo_dialogues_jsonl="data/dpo_dialogues.jsonl").export_all()
+    """
+    def __init__(self,
+                 output_dir: str,
+                 documents_jsonl: str = None,
+                 dialogues_jsonl: str = None,
+                 dpo_dialogues_jsonl: str = None,
+                 row_group_size: int = 8192,
+                 compression: str = "zstd"):
+        if pa is None:
+            raise ImportError("ParquetExporter requires pyarrow (pip install pyarrow).")
+        self.output_dir = output_dir
+        self.documents_jsonl = documents_jsonl
+        self.dialogues_jsonl = dialogues_jsonl
+        self.dpo_dialogues_jsonl = dpo_dialogues_jsonl
+        self.row_group_size = row_group_size
+        self.compression = compression
+        os.makedirs(output_dir, exist_ok=True)
+
+    @staticmethod
+    def schemas() -> dict[str, "pa.Schema"]:
+        """
+        Returns:
+            dict[str, pa.Schema]: The Arrow schema of each table.
+        """
+        # Dictionary-encoded strings, for the IDs and values repeated across rows
+        repeated = pa.dictionary(pa.int32(), pa.string())
+        return {
+            "documents": pa.schema([
+                ("doc_id", pa.string()),
+                ("file_name", pa.string()),
+                ("n_chunks", pa.int32())
+            ]),
+            "chunks": pa.schema([
+                ("chunk_id", pa.string()),
+                ("doc_id", repeated),
+                ("chunk_idx", pa.int32()),
+                ("text", pa.string())
+            ]),
+            "dialogues": pa.schema([
+                ("dialogue_id", pa.string()),
+                ("doc_id", repeated),
+                ("chunk_ids", pa.list_(pa.string())),
+                ("messages", pa.list_(pa.struct([("role", pa.string()), ("content", pa.string())])))
+            ]),
+            "turns": pa.schema([
+                ("dialogue_id", repeated),
+                ("turn_idx", pa.int16()),
+                ("user", pa.string()),
+                ("assistant", pa.string())
+            ]),
+            "dpo_pairs": pa.schema([
+                ("id", pa.string()),
+                ("dialogue_id", repeated),
+                ("doc_id", repeated),
+                ("depth", pa.int16()),
+                ("rule_used", pa.int16()),
+                ("history", pa.list_(pa.string())),
+                ("question", pa.string()),
+                ("chosen", pa.string()),
+                ("rejected", pa.string())
+            ])
+        }
+
+    def export_all(self) -> dict[str, int]:
+        """
+        Exports the tables of all the given JSONL files.
+
+        Returns:
+            dict[str, int]: The number of rows written to each table.
+        """
+        rows = {}
+        if self.documents_jsonl is not None:
+            rows.update(self.export_documents(self.documents_jsonl))
+        if self.dialogues_jsonl is not None:
+            rows.update(self.export_dialogues(self.dialogues_jsonl))
+        if self.dpo_dialogues_jsonl is not None:
+            rows.update(self.export_dpo_pairs(self.dpo_dialogues_jsonl))
+        return rows
+
+    def export_documents(self, jsonl_path: str) -> dict[str, int]:
+        """
+        Writes the documents and chunks tables. The documents are decoded one at a time.
+
+        Returns:
+            dict[str, int]: The number of rows of both tables.
+        """
+        documents = DocumentLoader(jsonl_path, lazy=True, cache_size=0)
+        def document_rows():
+            for document in documents.data:
+                yield {"doc_id": document.id, "file_name": document.file_name, "n_chunks": len(document.chunks)}
+        def chunk_rows():
+            for document in documents.data:
+                for chunk_idx, chunk in enumerate(document.chunks):
+                    yield {"chunk_id": chunk.id, "doc_id": document.id, "chunk_idx": chunk_idx, "text": chunk.text}
+        return {
+            "documents": self._write_table("documents", document_rows()),
+            "chunks": self._write_table("chunks", chunk_rows())
+        }
+
+    def export_dialogues(self, jsonl_path: str) -> dict[str, int]:
+        """
+        Writes the dialogues and turns tables. The dialogues are decoded one at a time.
+
+        Returns:
+            dict[str, int]: The number of rows of both tables.
+        """
+        dialogues = DialogueLoader(jsonl_path, lazy=True, cache_size=0)
+        def dialogue_rows():
+            for dialogue in dialogues.data:
+                messages = []
+                for turn in dialogue.turns:
+                    messages.append({"role": "user", "content": turn.user})
+                    messages.append({"role": "assistant", "content": turn.assistant})
+                yield {
+                    "dialogue_id": dialogue.id,
+                    "doc_id": dialogue.id.split("_ch")[0],
+                    "chunk_ids": dialogue.get_chunk_ids(),
+                    "messages": messages
+                }
+        def turn_rows():
+            for dialogue in dialogues.data:
+                for turn_idx, turn in enumerate(dialogue.turns):
+                    yield {"dialogue_id": dialogue.id, "turn_idx": turn_idx, "user": turn.user, "assistant": turn.assistant}
+        return {
+            "dialogues": self._write_table("dialogues", dialogue_rows()),
+            "turns": self._write_table("turns", turn_rows())
+        }
+
+    def export_dpo_pairs(self, jsonl_path: str) -> dict[str, int]:
+        """
+        Writes the dpo_pairs table, one row per DPO dialogue. Each DPO tree is walked depth first, the
+        history of a node being built once and extended by its children, so the rows are in tree order
+        (a DPO dialogue after its parent, in the order of the trees of the loader) and the DPO dialogues
+        are decoded one at a time.
+
+        Returns:
+            dict[str, int]: The number of rows of the table.
+
+        Raises:
+            KeyError: If an ancestor of a DPO dialogue is missing from the file
+        """
+        loader = DPODialogueLoader(jsonl_path, lazy=True, cache_size=0)
+        def pair_rows():
+            for std_id, root in loader.trees.items():
+                doc_id = std_id.split("_ch")[0]
+                # (node, history of its ancestors), the root holds no turn
+                stack = [(child, []) for child in reversed(root["children"].values())]
+                while stack:
+                    node, history = stack.pop()
+                    last_turn = loader.get_dpo_dialogue_by_id(node["id"]).last_turn
+                    yield {
+                        "id": node["id"],
+                        "dialogue_id": std_id,
+                        "doc_id": doc_id,
+                        "depth": len(history) // 2 + 1,
+                        "rule_used": last_turn.rule_used,
+                        "history": history,
+                        "question": last_turn.student_question,
+                        "chosen": last_turn.positive_answer,
+                        "rejected": last_turn.negative_answer
+                    }
+                    if node["children"]:
+                        history = history + [last_turn.student_question, last_turn.positive_answer]
+                        stack.extend((child, history) for child in reversed(node["children"].values()))
+        return {"dpo_pairs": self._write_table("dpo_pairs", pair_rows())}
+
+    def _write_table(self, name: str, rows: Iterable[dict]) -> int:
+        """
+        Writes the rows to <output_dir>/<name>.parquet, one row group at a time. The file is written
+        aside and renamed once complete.
+
+        Returns:
+            int: The number of rows written.
+        """
+        schema = self.schemas()[name]
+        path = os.path.join(self.output_dir, f"{name}.parquet")
+        tmp_path = path + ".tmp"
+        dictionary_columns = [field.name for field in schema if pa.types.is_dictionary(field.type)]
+        n_rows = 0
+        with pq.ParquetWriter(tmp_path, schema, compression=self.compression, use_dictionary=dictionary_columns) as writer:
+            columns = {field.name: [] for field in schema}
+            for row in rows:
+                for column, value in row.items():
+                    columns[column].append(value)
+                n_rows += 1
+                if n_rows % self.row_group_size == 0:
+                    writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                    columns = {field.name: [] for field in schema}
+            if n_rows % self.row_group_size != 0:
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+        os.replace(tmp_path, path)
+        logger.info(f"Exported {n_rows} rows to {path}.")
+        return n_rows
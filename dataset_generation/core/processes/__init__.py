@@ -1,9 +1,11 @@
 from .ChunkExtractor import ChunkExtractor
 from .DialogueGenerator import DialogueGenerator
 from .DPOGenerator import DPOGenerator
+from .ParquetExporter import ParquetExporter
 
 __all__ = [
     "ChunkExtractor",
     "DialogueGenerator",
-    "DPOGenerator"
+    "DPOGenerator",
+    "ParquetExporter"
 ]
\ No newline at end of file
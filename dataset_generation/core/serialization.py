@@ -0,0 +1,80 @@
+import json
+import os
+
+# The JSON libraries that can serialize the components, from the fastest. orjson and msgspec are
+# optional: the first one installed is used, the standard library otherwise. The JSON_BACKEND
+# environment variable forces one of them.
+BACKENDS = ["orjson", "msgspec", "json"]
+
+def _load_backend(name: str) -> tuple:
+    """
+    Imports a JSON library.
+
+    Args:
+        name (str): One of BACKENDS
+
+    Returns:
+        tuple: The dumps (object -> str) and loads (str or bytes -> object) functions of the library.
+
+    Raises:
+        ValueError: If the backend is unknown
+        ImportError: If the library is not installed
+    """
+    if name == "orjson":
+        import orjson
+        return (lambda obj: orjson.dumps(obj).decode("utf-8")), orjson.loads
+    if name == "msgspec":
+        import msgspec
+        encoder = msgspec.json.Encoder()
+        decoder = msgspec.json.Decoder()
+        return (lambda obj: encoder.encode(obj).decode("utf-8")), decoder.decode
+    if name == "json":
+        return json.dumps, json.loads
+    raise ValueError(f"Unknown JSON backend {name}, expected one of {BACKENDS}.")
+
+def set_backend(name: str) -> None:
+    """
+    Selects the JSON library used by dumps and loads.
+
+    Args:
+        name (str): One of BACKENDS
+
+    Raises:
+        ValueError: If the backend is unknown
+        ImportError: If the library is not installed
+    """
+    global backend, _dumps, _loads
+    _dumps, _loads = _load_backend(name)
+    backend = name
+
+def available_backends() -> list[str]:
+    """
+    Returns:
+        list[str]: The backends whose library is installed, from the fastest.
+    """
+    available = []
+    for name in BACKENDS:
+        try:
+            _load_backend(name)
+            available.append(name)
+        except ImportError:
+            pass
+    return available
+
+def dumps(obj) -> str:
+    """
+    Serializes an object to a JSON string with the selected backend. Non-ASCII characters may be
+    written as is (orjson, msgspec) or escaped (json), so files must be written as UTF-8.
+    """
+    return _dumps(obj)
+
+def loads(data):
+    """
+    Deserializes a JSON string (or UTF-8 bytes) with the selected backend.
+    """
+    return _loads(data)
+
+if "JSON_BACKEND" in os.environ:
+    set_backend(os.environ["JSON_BACKEND"])
+else:
+    set_backend(available_backends()[0])
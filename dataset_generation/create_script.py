@@ -12,24 +12,75 @@ def start_generation(raw_pdfs: str,
                      extracted_texts_json: str,
                      dialogues_json: str,
                      dpo_dialogues: str,
-                     max_generations: int):
+                     max_generations: int,
+                     extraction_workers: int = 1,
+                     streaming_extraction: bool = False,
+                     extraction_manifest: str = None,
+                     llm_concurrency: int = 1,
+                     requests_per_minute: int = None,
+                     tokens_per_minute: int = None,
+                     openai_base_url: str = None,
+                     dpo_dialogue_concurrency: int = 1,
+                     batch_rules_prompt: str = None,
+                     rules_group_size: int = None,
+                     response_cache: str = None,
+                     response_cache_max_mb: int = None,
+                     batch_dir: str = None,
+                     local_batch: bool = False,
+                     dpo_frontier: str = None,
+                     dpo_journal: str = None,
+                     seed: int = None):
+
+    cache_max_size = response_cache_max_mb * 1024 * 1024 if response_cache_max_mb else None
 
     # First you will need to extract the text from the pdfs, usually this is done in bulk once
     # This is done using the TextExtractor class
-    extractor = ChunkExtractor(raw_pdfs, extracted_texts_json)
+    extractor = ChunkExtractor(
+        raw_pdfs,
+        extracted_texts_json,
+        workers=extraction_workers,
+        streaming=streaming_extraction,
+        manifest_jsonl=extraction_manifest
+    )
     extractor.extract_texts()
 
-    dialogue_gen = DialogueGenerator(extracted_texts_json, dialogues_json, dialogue_prompt)
+    dialogue_gen = DialogueGenerator(
+        extracted_texts_json,
+        dialogues_json,
+        dialogue_prompt,
+        concurrency=llm_concurrency,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        base_url=openai_base_url,
+        cache_path=response_cache,
+        cache_max_size=cache_max_size,
+        batch_dir=batch_dir,
+        local_batch=local_batch
+    )
     dialogue_gen.generate_all(max_generations=max_generations)
 
-    dpo_gen = DPOGenerator(
+    with DPOGenerator(
         dialogues_json,
         dpo_dialogues,
         rules_list,
         good_answer_and_question_prompt,
-        choose_rule_prompt
-    )
-    dpo_gen.generate_all()
+        choose_rule_prompt,
+        concurrency=llm_concurrency,
+        dialogue_concurrency=dpo_dialogue_concurrency,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        base_url=openai_base_url,
+        batch_rules_prompt_path=batch_rules_prompt,
+        rules_group_size=rules_group_size,
+        cache_path=response_cache,
+        cache_max_size=cache_max_size,
+        batch_dir=batch_dir,
+        local_batch=local_batch,
+        frontier_path=dpo_frontier,
+        journal_path=dpo_journal,
+        seed=seed
+    ) as dpo_gen:
+        dpo_gen.generate_all()
 
 def print_statistics(extracted_texts_json: str, dialogues_json: str, dpo_dialogues: str):
     doc_loader = DocumentLoader(extracted_texts_json)
@@ -75,6 +126,23 @@ if __name__ == "__main__":
     parser.add_argument("--dialogues_json", type=str, required=True)
     parser.add_argument("--dpo_dialogues_json", type=str, required=True)
     parser.add_argument("--max_generations", type=int, required=True)
+    parser.add_argument("--extraction_workers", type=int, default=1)
+    parser.add_argument("--streaming_extraction", action="store_true")
+    parser.add_argument("--extraction_manifest", type=str, default=None)
+    parser.add_argument("--llm_concurrency", type=int, default=1)
+    parser.add_argument("--requests_per_minute", type=int, default=None)
+    parser.add_argument("--tokens_per_minute", type=int, default=None)
+    parser.add_argument("--openai_base_url", type=str, default=None)
+    parser.add_argument("--dpo_dialogue_concurrency", type=int, default=1)
+    parser.add_argument("--batch_rules_prompt", type=str, default=None)
+    parser.add_argument("--rules_group_size", type=int, default=None)
+    parser.add_argument("--response_cache", type=str, default=None)
+    parser.add_argument("--response_cache_max_mb", type=int, default=None)
+    parser.add_argument("--batch_dir", type=str, default=None)
+    parser.add_argument("--local_batch", action="store_true")
+    parser.add_argument("--dpo_frontier", type=str, default=None)
+    parser.add_argument("--dpo_journal", type=str, default=None)
+    parser.add_argument("--seed", type=int, default=None)
     args = parser.parse_args()
 
     start_generation(
@@ -86,6 +154,23 @@ if __name__ == "__main__":
         args.extracted_texts_json,
         args.dialogues_json,
         args.dpo_dialogues_json,
-        args.max_generations
+        args.max_generations,
+        args.extraction_workers,
+        args.streaming_extraction,
+        args.extraction_manifest,
+        args.llm_concurrency,
+        args.requests_per_minute,
+        args.tokens_per_minute,
+        args.openai_base_url,
+        args.dpo_dialogue_concurrency,
+        args.batch_rules_prompt,
+        args.rules_group_size,
+        args.response_cache,
+        args.response_cache_max_mb,
+        args.batch_dir,
+        args.local_batch,
+        args.dpo_frontier,
+        args.dpo_journal,
+        args.seed
     )
     print_statistics(args.extracted_texts_json, args.dialogues_json, args.dpo_dialogues_json)
\ No newline at end of file
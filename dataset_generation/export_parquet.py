@@ -0,0 +1,25 @@
+from core.processes import ParquetExporter
+from argparse import ArgumentParser
+
+def main(args):
+    exporter = ParquetExporter(
+        args.output_dir,
+        documents_jsonl=args.documents,
+        dialogues_jsonl=args.dialogues,
+        dpo_dialogues_jsonl=args.dpo_dialogues,
+        row_group_size=args.row_group_size,
+        compression=args.compression
+    )
+    for table, rows in exporter.export_all().items():
+        print(f"{table}: {rows} rows")
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Exports the documents, dialogues and DPO dialogues JSONL files to Parquet tables.")
+    parser.add_argument("--output_dir", type=str, required=True)
+    parser.add_argument("--documents", type=str, default=None, help="Documents JSONL file (documents and chunks tables)")
+    parser.add_argument("--dialogues", type=str, default=None, help="Dialogues JSONL file (dialogues and turns tables)")
+    parser.add_argument("--dpo_dialogues", type=str, default=None, help="DPO dialogues JSONL file (dpo_pairs table)")
+    parser.add_argument("--row_group_size", type=int, default=8192)
+    parser.add_argument("--compression", type=str, default="zstd")
+    args = parser.parse_args()
+    main(args)
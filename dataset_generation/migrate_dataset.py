@@ -0,0 +1,65 @@
+from core.components import Document, Dialogue, DPODialogue
+from argparse import ArgumentParser
+import json
+import os
+import shutil
+
+def detect_component(jsonl_path: str) -> type:
+    """
+    Detects the component stored in a JSONL file from the fields of its first record.
+    """
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                data = json.loads(line)
+                break
+        else:
+            return None
+    if "chunks" in data:
+        return Document
+    if "turns" in data:
+        return Dialogue
+    if "last_turn" in data:
+        return DPODialogue
+    raise ValueError(f"{jsonl_path}: unknown record with fields {list(data.keys())}.")
+
+def migrate_file(jsonl_path: str, backup: bool) -> tuple[int, int, int]:
+    """
+    Rewrites a JSONL file in the current format version, streaming it record by record. The new file
+    replaces the old one only once fully written, and the stale lazy loading index is removed.
+
+    Returns:
+        tuple[int, int, int]: The number of records, and the size of the file before and after in bytes.
+    """
+    component_cls = detect_component(jsonl_path)
+    old_size = os.path.getsize(jsonl_path)
+    if component_cls is None:
+        return 0, old_size, old_size
+    tmp_path = f"{jsonl_path}.migrating"
+    records = 0
+    with open(jsonl_path, "r", encoding="utf-8") as source, open(tmp_path, "w", encoding="utf-8") as target:
+        for line in source:
+            if line.strip():
+                target.write(component_cls(json_str=line).to_json_str() + "\n")
+                records += 1
+    if backup:
+        shutil.copy2(jsonl_path, f"{jsonl_path}.v1.bak")
+    os.replace(tmp_path, jsonl_path)
+    index_path = f"{jsonl_path}.idx"
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    return records, old_size, os.path.getsize(jsonl_path)
+
+def main(args):
+    for jsonl_path in args.jsonl_files:
+        records, old_size, new_size = migrate_file(jsonl_path, args.backup)
+        change = f" ({(new_size - old_size) / old_size:+.1%})" if old_size else ""
+        print(f"{jsonl_path}: {records} records migrated to format version {Document.FORMAT_VERSION}, "
+              f"{old_size} -> {new_size} bytes{change}")
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Converts documents, dialogues and DPO dialogues JSONL files to the current on-disk format.")
+    parser.add_argument("jsonl_files", type=str, nargs="+")
+    parser.add_argument("--backup", action="store_true", help="Keep a copy of each original file as <file>.v1.bak")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,139 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from argparse import ArgumentParser
+import hashlib
+import json
+import re
+import threading
+import time
+
+class MockOpenAIServer:
+    """
+    A local OpenAI-compatible chat completions endpoint, to run and benchmark the generators offline.
+    Every request waits `delay` seconds, as a remote API would, and is answered with a deterministic
+    structured output (derived from a hash of the prompt) matching the response_format schema of the
+    generators: DialogueSchema, UseRuleSchema, RulesScoringSchema and GoodAnswerSchema. Unknown schemas
+    get their string fields filled in.
+    GET / returns the request counters: requests, in_flight and max_in_flight (the highest concurrency seen).
+    Attributes:
+        port (int): The port the server listens on (chosen by the system if 0 is given)
+        base_url (str): The base URL to give to the OpenAI client
+        delay (float): Latency of each request in seconds
+    Example:
+        with MockOpenAIServer(delay=0.2) as server:
+            DialogueGenerator(..., base_url=server.base_url).generate_all()
+    """
+    def __init__(self, port: int = 0, delay: float = 0.2):
+        self.delay = delay
+        self.stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self.base_url = f"http://127.0.0.1:{self.port}/v1"
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self) -> None:
+        """
+        Serves the requests from a background thread.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops serving and closes the socket.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats.update(requests=0, max_in_flight=self.stats["in_flight"])
+
+    @staticmethod
+    def completion(schema_name: str, schema: dict, prompt: str) -> dict:
+        """
+        Returns the deterministic structured output of a prompt.
+        """
+        h = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+        if schema_name == "DialogueSchema":
+            return {"dialogue": [{"student_question": f"question {h % 1000}-{i}", "tutor_response": f"answer {h % 997}-{i}"} for i in range(3)]}
+        if schema_name == "UseRuleSchema":
+            return {"rule_fit_score": 3 + h % 3}
+        if schema_name == "RulesScoringSchema":
+            rule_indices = [int(rule_idx) for rule_idx in re.findall(r"^RULE (\d+):", prompt, re.M)]
+            return {"scores": [{"rule_index": rule_idx, "rule_fit_score": 3 + (h + rule_idx) % 3} for rule_idx in rule_indices]}
+        if schema_name == "GoodAnswerSchema":
+            return {"adapted_response": f"student {h % 1000}", "tutor_response": f"tutor {h % 1000}"}
+        properties = schema.get("properties", {})
+        return {key: (f"value {h % 1000}" if value.get("type") == "string" else 1) for key, value in properties.items()}
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server._lock:
+                    server.stats["requests"] += 1
+                    server.stats["in_flight"] += 1
+                    server.stats["max_in_flight"] = max(server.stats["max_in_flight"], server.stats["in_flight"])
+                try:
+                    time.sleep(server.delay)
+                    json_schema = body.get("response_format", {}).get("json_schema", {})
+                    prompt = body["messages"][-1]["content"]
+                    content = server.completion(json_schema.get("name"), json_schema.get("schema", {}), prompt)
+                    response = {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": body["model"],
+                        "choices": [{
+                            "index": 0,
+                            "finish_reason": "stop",
+                            "message": {"role": "assistant", "content": json.dumps(content), "refusal": None}
+                        }],
+                        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 50, "total_tokens": len(prompt) // 4 + 50}
+                    }
+                    self._send(response)
+                finally:
+                    with server._lock:
+                        server.stats["in_flight"] -= 1
+
+            def do_GET(self):
+                with server._lock:
+                    self._send(dict(server.stats))
+
+            def _send(self, payload: dict):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Serves a mock OpenAI-compatible chat completions API answering the generators' structured outputs.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.2, help="Latency of each request in seconds")
+    args = parser.parse_args()
+    server = MockOpenAIServer(args.port, args.delay)
+    print(f"Serving on {server.base_url} with {args.delay}s of latency")
+    server.serve_forever()
@@ -10,15 +10,16 @@ if len(argv) > 1:
 else:
     base_path = "/home/gp1108/Code/Thesis/dataset_generation/data"
     rules_path = "/home/gp1108/Code/Thesis/dataset_generation/prompts/rules.txt"
-document_loader = DocumentLoader(f"{base_path}/extracted_texts.jsonl")
-dialogue_loader = DialogueLoader(f"{base_path}/dialogues.jsonl")
-dpo_dialogue_loader = DPODialogueLoader(f"{base_path}/dpo_dialogues.jsonl")
+document_loader = DocumentLoader(f"{base_path}/extracted_texts.jsonl", lazy=True)
+dialogue_loader = DialogueLoader(f"{base_path}/dialogues.jsonl", lazy=True)
+dpo_dialogue_loader = DPODialogueLoader(f"{base_path}/dpo_dialogues.jsonl", lazy=True)
 rules = PedagogicalRules(rules_path)
 
 @app.route("/")
 def home():
-    documents = [doc.id for doc in document_loader]
-    dialogues = [dlg.id for dlg in dialogue_loader]
+    # Only the IDs are listed, read from the indexes without decoding the records
+    documents = list(document_loader.strid2idx.keys())
+    dialogues = list(dialogue_loader.ids)
     dpo_dialogues = dpo_dialogue_loader.get_unique_dpo_ids()
 
     return render_template("home.html",
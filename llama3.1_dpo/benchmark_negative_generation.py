@@ -0,0 +1,54 @@
+from negative_ans_from_sft import load_tiny_random_model, load_samples, generate_negative_answers
+from argparse import ArgumentParser
+import numpy as np
+import time
+import torch
+import utils as ut
+
+def measure(samples: dict, max_new_tokens: np.ndarray, model, tokenizer, batch_size: int) -> float:
+    # Time to answer all the samples, in seconds
+    start = time.perf_counter()
+    for _ in generate_negative_answers(
+        samples["prompt"],
+        samples["prompt_len"],
+        max_new_tokens,
+        model,
+        tokenizer,
+        "cpu",
+        batch_size=batch_size
+    ):
+        pass
+    return time.perf_counter() - start
+
+def main(args):
+    torch.set_num_threads(args.threads)
+    model, tokenizer = load_tiny_random_model(args.tokenizer, "cpu", args.hidden_size, args.layers)
+    dataset = ut.load_local_dpo_dataset(args.local_dpo_path)
+    dataset = dataset.select(range(min(args.samples, len(dataset))))
+    samples = load_samples([("local_dpo", dataset)], tokenizer)
+    # The random model seldom samples <|eot_id|>, so the answers are capped to keep the run short
+    max_new_tokens = np.minimum(samples["chosen_len"], args.max_new_tokens)
+    n_samples = len(samples["prompt"])
+    print(f"{n_samples} samples, prompts of {samples['prompt_len'].mean():.0f} tokens on average, "
+          f"{max_new_tokens.sum()} new tokens at most")
+    print(f"{'batch':>6} {'seconds':>9} {'samples/s':>10} {'speedup':>8}")
+    baseline = None
+    for batch_size in args.batch_sizes:
+        torch.manual_seed(args.seed)
+        elapsed = measure(samples, max_new_tokens, model, tokenizer, batch_size)
+        baseline = baseline or elapsed
+        print(f"{batch_size:>6} {elapsed:>9.2f} {n_samples / elapsed:>10.2f} {baseline / elapsed:>7.1f}x")
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Measures the negative answers generation throughput on CPU with a tiny random Llama, for several batch sizes.")
+    parser.add_argument("--tokenizer", type=str, required=True, help="Tokenizer with the Llama 3 special tokens (e.g. the SFT model).")
+    parser.add_argument("--local_dpo_path", type=str, required=True)
+    parser.add_argument("--samples", type=int, default=256)
+    parser.add_argument("--max_new_tokens", type=int, default=64)
+    parser.add_argument("--hidden_size", type=int, default=64)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
@@ -85,8 +85,10 @@ def main(args):
     # Load dataset
     accelerator.print("Loading Dataset")
     dataset = ut.load_dataset(args.dataset_path)
-    # dataset = ut.filter_dataset_mad(dataset, tokenizer)
-    # dataset = ut.filter_dataset_by_length(dataset, tokenizer, args.max_len)
+    if args.filter_mad:
+        dataset = ut.filter_dataset_mad(dataset, tokenizer, cache_dir=args.cache_dir)
+    if args.max_len is not None:
+        dataset = ut.filter_dataset_by_length(dataset, tokenizer, args.max_len, cache_dir=args.cache_dir)
     dataset = dataset.shuffle()
     dataset = dataset.train_test_split(test_size=args.test_split)
 
@@ -167,7 +169,9 @@ if __name__ == "__main__":
     parser.add_argument("--gradient_acc", type=int, default=4, help="Gradient accumulation steps.")
     parser.add_argument("--wandb", action="store_true", help="Enable logging with wandb.")
     parser.add_argument("--epochs", type=int, default=1, help="Number of epochs to train the model.")
-    parser.add_argument("--max_len", type=int, default=1E6, help="Maximum length of the samples (prompt+max(chosen, rejected))")
+    parser.add_argument("--filter_mad", action="store_true", help="Drop the samples whose length is an outlier by modified z-score.")
+    parser.add_argument("--max_len", type=int, default=None, help="Drop the samples longer than this many tokens (prompt+max(chosen, rejected)), not filtered by default.")
+    parser.add_argument("--cache_dir", type=str, default=None, help="Directory of the cached token lengths of the length filters (default: see utils.add_token_lengths).")
 
     args = parser.parse_args()
     main(args)
@@ -1,10 +1,16 @@
+import heapq
 import json
+import os
+import time
+import numpy as np
 import torch
 import argparse
-from transformers import AutoModelForCausalLM, AutoTokenizer
-from datasets import load_dataset, Dataset
+from transformers import AutoModelForCausalLM, AutoTokenizer, LlamaConfig, LlamaForCausalLM, StoppingCriteria, StoppingCriteriaList
+from core.loaders import JSONLWriter
 import utils as ut
 
+EOT_TOKEN = "<|eot_id|>"
+
 # Function to format the conversation prompt
 def format_prompt(conversation):
     """
@@ -25,184 +31,340 @@ def format_prompt(conversation):
     prompt += "<|start_header_id|>assistant<|end_header_id|>\n"
     return prompt
 
+def prepare_tokenizer(tokenizer):
+    """
+    Sets up the tokenizer for batched generation: prompts padded on the left, so that the new tokens of
+    all the rows start at the same position, and <|eot_id|> as padding token if there is none.
+
+    Raises:
+        ValueError: If the tokenizer has no <|eot_id|> token
+    """
+    if EOT_TOKEN not in tokenizer.get_vocab():
+        raise ValueError(f"The tokenizer has no {EOT_TOKEN} token.")
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = EOT_TOKEN
+    return tokenizer
 
 # Load the SFT model
 def load_sft_model(model_name, device='cuda'):
     model = AutoModelForCausalLM.from_pretrained(model_name).to(device)
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer = prepare_tokenizer(AutoTokenizer.from_pretrained(model_name))
+    model.eval()
     return model, tokenizer
 
-def generate_negative_answer(prompt, model, tokenizer, device, max_length):
-    tokenized = tokenizer(prompt, return_tensors="pt").to(device)
-    input_ids = tokenized['input_ids']
-    response_ids = model.generate(
-        input_ids,
-        max_new_tokens=max_length,
-        temperature=0.8,
-        do_sample=True
+def load_tiny_random_model(tokenizer_name, device='cpu', hidden_size=64, num_hidden_layers=2):
+    """
+    Builds a randomly initialized Llama of a few small layers with the vocabulary of the given tokenizer, to
+    run and benchmark the generation on CPU, without the SFT weights.
+    """
+    tokenizer = prepare_tokenizer(AutoTokenizer.from_pretrained(tokenizer_name))
+    config = LlamaConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 2,
+        num_hidden_layers=num_hidden_layers,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=8192,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.convert_tokens_to_ids(EOT_TOKEN),
+        pad_token_id=tokenizer.pad_token_id
     )
-    response = tokenizer.decode(response_ids[0], skip_special_tokens=True)
-    return response
+    model = LlamaForCausalLM(config).to(device)
+    model.eval()
+    return model, tokenizer
 
-def main():
-    # Parse command-line arguments
-    parser = argparse.ArgumentParser(description="Generate negative answers using an SFT model.")
-    parser.add_argument("--local_dpo_path", type=str, required=True, help="Path to the local DPO dataset.")
-    parser.add_argument("--sft_model_name", type=str, required=True, help="Path to the SFT model.")
-    parser.add_argument("--output_file", type=str, required=True, help="Path to save the output JSONL file.")
-    args = parser.parse_args()
+class _RowLengthLimit(StoppingCriteria):
+    """
+    Stops each row of a batch once it has generated its own number of new tokens.
+    """
+    def __init__(self, max_new_tokens: torch.Tensor, prompt_width: int):
+        self.max_new_tokens = max_new_tokens
+        self.prompt_width = prompt_width
 
-    # Load datasets and model
-    print("Loading datasets...")
-    local_dpo = ut.load_local_dpo_dataset(args.local_dpo_path)
-    argilla_ds = ut.load_argilla_ds()
-    print("Loading model...")
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model, tokenizer = load_sft_model(args.sft_model_name, device)
-
-    # Open output file
-    with open(args.output_file, "w") as f:
-        # Iterate through each sample
-        for idx, sample in enumerate(argilla_ds):
-            prompt = sample["prompt"]
-            positive_answer = sample["chosen"]
-            max_length = len(tokenizer(positive_answer)["input_ids"])
-
-            # Generate negative answer
-            negative_answer = generate_negative_answer(prompt, model, tokenizer, device, max_length)
-
-            # Save result
-            output = {
-                "prompt": prompt,
-                "positive_answer": positive_answer,
-                "negative_answer": negative_answer,
-                "dataset": "argilla"
-            }
-            f.write(json.dumps(output) + "\n")
-
-            if (idx + 1) % 10 == 0:
-                print(f"Processed {idx + 1} samples...")
-
-        for idx, sample in enumerate(local_dpo):
-            prompt = sample["prompt"]
-            positive_answer = sample["chosen"]
-            max_length = len(tokenizer(positive_answer)["input_ids"])
-
-            # Generate negative answer
-            negative_answer = generate_negative_answer(prompt, model, tokenizer, device, max_length)
-
-            # Save result
-            output = {
-                "prompt": prompt,
-                "positive_answer": positive_answer,
-                "negative_answer": negative_answer,
-                "dataset": "local_dpo"
-            }
-            f.write(json.dumps(output) + "\n")
-
-            if (idx + 1) % 10 == 0:
-                print(f"Processed {idx + 1} samples...")
-
-    print("Processing complete. Output saved to", args.output_file)
+    def __call__(self, input_ids: torch.Tensor, scores: torch.Tensor, **kwargs) -> torch.Tensor:
+        return self.max_new_tokens <= input_ids.shape[1] - self.prompt_width
 
-if __name__ == "__main__":
-    main()
-import json
-import torch
-import argparse
-from transformers import AutoModelForCausalLM, AutoTokenizer
-from datasets import load_dataset, Dataset
-
-# Load the datasets
-def load_local_dpo_dataset(dataset_path: str) -> Dataset:
-    loader = DPODialogueLoader(dataset_path)
-    trl_compatible_dataset = from_loader_to_pref_std_dataset(loader)
-    return trl_compatible_dataset
-
-def load_argilla_ds():
-    train_argilla = load_dataset("argilla/distilabel-intel-orca-dpo-pairs", split="train")
-    train_argilla = train_argilla.filter(
-        lambda r: r["status"] != "tie" and r["chosen_score"] >= 8
-    )
-    train_argilla = train_argilla.rename_column("input", "prompt")
-    accepted_columns = set(["prompt", "chosen", "rejected"])
-    all_columns = set(train_argilla.column_names)
-    columns_to_remove = all_columns - accepted_columns
-    train_argilla = train_argilla.remove_columns(list(columns_to_remove))
-    new_ds_dict = {"prompt": [], "chosen": [], "rejected": []}
-    for r in train_argilla:
-        prompt, chosen, rejected = format_interaction([r["prompt"]], r["chosen"], r["rejected"])
-        new_ds_dict["prompt"].append(prompt)
-        new_ds_dict["chosen"].append(chosen)
-        new_ds_dict["rejected"].append(rejected)
-    return Dataset.from_dict(new_ds_dict)
+def generate_batch(prompts, max_new_tokens, model, tokenizer, device, temperature=0.8):
+    """
+    Samples an answer for each prompt of a batch. Every row stops at its own <|eot_id|> or after its own
+    number of new tokens, the batch once all its rows are done.
 
-def format_prompt(conversation):
-    if len(conversation) == 0:
-        return "<|begin_of_text|><|start_header_id|>assistant<|end_header_id|>\n"
-    prompt = "<|begin_of_text|>"
-    for turn in conversation:
-        prompt += f"<|start_header_id|>{turn['role']}<|end_header_id|>\n{turn['content']}<|eot_id|>"
-    prompt += "<|start_header_id|>assistant<|end_header_id|>\n"
-    return prompt
+    Args:
+        prompts (list of str): The formatted prompts.
+        max_new_tokens (list of int): Maximum number of new tokens of each prompt.
+        model (transformers.PreTrainedModel): The language model.
+        tokenizer (transformers.PreTrainedTokenizer): The tokenizer, set up by prepare_tokenizer.
+        device (str): Device the model runs on.
+        temperature (float): Sampling temperature.
 
-# Load the SFT model
-def load_sft_model(model_name, device='cuda'):
-    model = AutoModelForCausalLM.from_pretrained(model_name).to(device)
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    return model, tokenizer
+    Returns:
+        list of str: The answer of each prompt, without the prompt and the special tokens.
+    """
+    tokenized = tokenizer(prompts, return_tensors="pt", padding=True).to(device)
+    prompt_width = tokenized["input_ids"].shape[1]
+    limits = torch.tensor(max_new_tokens, dtype=torch.long, device=device)
+    eos_token_ids = [tokenizer.convert_tokens_to_ids(EOT_TOKEN)]
+    model_eos = model.generation_config.eos_token_id
+    for token_id in (model_eos if isinstance(model_eos, list) else [model_eos]):
+        if token_id is not None and token_id not in eos_token_ids:
+            eos_token_ids.append(token_id)
+    with torch.inference_mode():
+        response_ids = model.generate(
+            input_ids=tokenized["input_ids"],
+            attention_mask=tokenized["attention_mask"],
+            max_new_tokens=int(limits.max()),
+            stopping_criteria=StoppingCriteriaList([_RowLengthLimit(limits, prompt_width)]),
+            eos_token_id=eos_token_ids,
+            pad_token_id=tokenizer.pad_token_id,
+            temperature=temperature,
+            do_sample=True
+        )
+    # The rows done early are padded up to the longest one
+    new_ids = [row[:limit] for row, limit in zip(response_ids[:, prompt_width:].tolist(), max_new_tokens)]
+    return tokenizer.batch_decode(new_ids, skip_special_tokens=True)
+
+def load_samples(datasets, tokenizer, cache_dir=None):
+    """
+    Gathers the samples of the datasets, one after the other, with the token lengths of their prompts
+    and positive answers, counted in batches (and cached, see utils.add_token_lengths).
 
-def generate_negative_answer(prompt, model, tokenizer, device, max_length):
-    tokenized = tokenizer(prompt, return_tensors="pt").to(device)
-    input_ids = tokenized['input_ids']
-    response_ids = model.generate(
-        input_ids,
-        max_new_tokens=max_length,
-        temperature=0.7,
-        do_sample=True
-    )
-    response = tokenizer.decode(response_ids[0], skip_special_tokens=True)
-    return response
+    Args:
+        datasets (list of (str, Dataset)): The name and the preference dataset of each source.
+        tokenizer (transformers.PreTrainedTokenizer): The tokenizer of the model.
+        cache_dir (str, optional): Directory of the cached token lengths (default: see utils.add_token_lengths).
+
+    Returns:
+        dict: The prompt, chosen and dataset lists and the prompt_len and chosen_len arrays.
+    """
+    samples = {"prompt": [], "chosen": [], "dataset": [], "prompt_len": [], "chosen_len": []}
+    for name, dataset in datasets:
+        dataset = ut.add_token_lengths(dataset, tokenizer, cache_dir=cache_dir)
+        table = dataset.select_columns(["prompt", "chosen", "prompt_len", "chosen_len"]).with_format("arrow")[:]
+        samples["prompt"].extend(table.column("prompt").to_pylist())
+        samples["chosen"].extend(table.column("chosen").to_pylist())
+        samples["prompt_len"].append(table.column("prompt_len").to_numpy())
+        samples["chosen_len"].append(table.column("chosen_len").to_numpy())
+        samples["dataset"].extend([name] * len(dataset))
+    samples["prompt_len"] = np.concatenate(samples["prompt_len"]) if samples["prompt_len"] else np.zeros(0, dtype=np.int64)
+    samples["chosen_len"] = np.concatenate(samples["chosen_len"]) if samples["chosen_len"] else np.zeros(0, dtype=np.int64)
+    return samples
+
+def generate_negative_answers(prompts, prompt_lengths, max_new_tokens, model, tokenizer, device, batch_size=16, window_size=None, indices=None):
+    """
+    Generates the answers of the given prompts, a window of window_size prompts at a time.
+    The prompts of a window are sorted by length and split into batches, so that each batch is padded
+    to prompts of close lengths and asks for close numbers of new tokens.
+
+    Args:
+        prompts (list of str): The formatted prompts.
+        prompt_lengths (np.ndarray): Token length of each prompt.
+        max_new_tokens (np.ndarray): Maximum number of new tokens of each prompt.
+        model (transformers.PreTrainedModel): The language model.
+        tokenizer (transformers.PreTrainedTokenizer): The tokenizer, set up by prepare_tokenizer.
+        device (str): Device the model runs on.
+        batch_size (int): Number of prompts per generate call.
+        window_size (int): Number of prompts sorted together. Defaults to 32 batches.
+        indices (np.ndarray): Increasing indices of the prompts to answer. Defaults to all of them.
+
+    Yields:
+        tuple: The indices of the prompts of the window and their answers, in order.
+    """
+    window_size = window_size or batch_size * 32
+    indices = np.arange(len(prompts)) if indices is None else np.asarray(indices)
+    for window_start in range(0, len(indices), window_size):
+        window_indices = indices[window_start:window_start + window_size]
+        window = window_indices[np.lexsort((max_new_tokens[window_indices], prompt_lengths[window_indices]))]
+        answers = {}
+        for batch_start in range(0, len(window), batch_size):
+            batch = window[batch_start:batch_start + batch_size].tolist()
+            batch_answers = generate_batch(
+                [prompts[i] for i in batch],
+                [int(max_new_tokens[i]) for i in batch],
+                model,
+                tokenizer,
+                device
+            )
+            answers.update(zip(batch, batch_answers))
+        window_indices = window_indices.tolist()
+        yield window_indices, [answers[i] for i in window_indices]
+
+def parse_shard(shard):
+    """
+    Parses a --shard argument "i/N" (shard i of N, from 0).
+    """
+    try:
+        shard_idx, num_shards = (int(part) for part in shard.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard {shard!r}, expected i/N")
+    if num_shards < 1 or not 0 <= shard_idx < num_shards:
+        raise argparse.ArgumentTypeError(f"invalid shard {shard!r}, expected 0 <= i < N")
+    return shard_idx, num_shards
+
+def get_shard_file(output_file, shard_idx, num_shards):
+    """
+    Returns the path of the output file of a shard, next to the merged output file.
+    """
+    return f"{output_file}.shard{shard_idx}-of-{num_shards}"
+
+def get_shard_indices(n_samples, shard_idx, num_shards):
+    """
+    Returns the indices of the samples of a shard: one sample every num_shards, so that all the shards
+    get the same mix of datasets and lengths.
+    """
+    return np.arange(shard_idx, n_samples, num_shards)
+
+def read_done_indices(output_file, prompts):
+    """
+    Reads the indices of the samples already saved to an output file by an interrupted run, checking
+    that they are samples of the current input. A partial last record is skipped (the writer removes it).
+
+    Raises:
+        ValueError: If the saved records do not match the samples
+    """
+    done = set()
+    if not os.path.exists(output_file):
+        return done
+    with open(output_file, "r", encoding="utf-8") as f:
+        for line_idx, line in enumerate(f, 1):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                if not line.endswith("\n"):
+                    break
+                raise ValueError(f"{output_file}: invalid record at line {line_idx}.")
+            idx = record.get("index")
+            if not isinstance(idx, int) or not 0 <= idx < len(prompts) or record.get("prompt") != prompts[idx]:
+                raise ValueError(f"{output_file}: line {line_idx} is not a sample of the current datasets, cannot resume.")
+            done.add(idx)
+    return done
+
+def _iter_shard_records(shard_file):
+    # (index, line) of the complete records of a shard file, in file order
+    with open(shard_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.endswith("\n"):
+                yield json.loads(line)["index"], line
+
+def merge_shards(output_file, num_shards, n_samples):
+    """
+    Merges the files of the num_shards shards into output_file, ordered by sample index. Each shard file
+    is sorted (its samples are saved in order), so they are merged one record at a time. The output is
+    written aside and renamed once complete.
+
+    Raises:
+        ValueError: If a shard file is missing or the shards do not hold each of the n_samples samples once
+    """
+    shard_files = [get_shard_file(output_file, shard_idx, num_shards) for shard_idx in range(num_shards)]
+    missing = [shard_file for shard_file in shard_files if not os.path.exists(shard_file)]
+    if missing:
+        raise ValueError(f"Missing shard files: {missing}.")
+    tmp_file = output_file + ".tmp"
+    expected = 0
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        for idx, line in heapq.merge(*(_iter_shard_records(shard_file) for shard_file in shard_files), key=lambda record: record[0]):
+            if idx != expected:
+                os.remove(tmp_file)
+                if idx < expected:
+                    raise ValueError(f"Sample {idx} is saved twice, see {shard_files[idx % num_shards]}.")
+                raise ValueError(f"Sample {expected} is missing, see {shard_files[expected % num_shards]}.")
+            f.write(line)
+            expected += 1
+    if expected != n_samples:
+        os.remove(tmp_file)
+        raise ValueError(f"Only {expected}/{n_samples} samples were generated, see {shard_files[expected % num_shards]}.")
+    os.replace(tmp_file, output_file)
+    return expected
 
 def main():
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Generate negative answers using an SFT model.")
     parser.add_argument("--local_dpo_path", type=str, required=True, help="Path to the local DPO dataset.")
-    parser.add_argument("--sft_model_name", type=str, required=True, help="Path to the SFT model.")
+    parser.add_argument("--sft_model_name", type=str, default=None, help="Path to the SFT model.")
     parser.add_argument("--output_file", type=str, required=True, help="Path to save the output JSONL file.")
+    parser.add_argument("--batch_size", type=int, default=16, help="Number of prompts per generate call.")
+    parser.add_argument("--window_size", type=int, default=None, help="Number of prompts sorted by length together (default: 32 batches).")
+    parser.add_argument("--resume", action="store_true", help="Continue after the samples already in the output file.")
+    parser.add_argument("--shard", type=parse_shard, default=None, help="Generate only shard i/N (from 0) into <output_file>.shard<i>-of-<N>, skipping the samples it already holds.")
+    parser.add_argument("--merge_shards", type=int, default=None, help="Merge the files of the given number of shards into the output file.")
+    parser.add_argument("--tiny_random_model", action="store_true", help="Use a tiny random Llama with the tokenizer of --sft_model_name (CPU tests).")
+    parser.add_argument("--seed", type=int, default=None, help="Sampling seed.")
+    parser.add_argument("--cache_dir", type=str, default=None, help="Directory of the cached preference dataset and token lengths (default: see utils.load_local_dpo_dataset and utils.add_token_lengths).")
     args = parser.parse_args()
+    if args.merge_shards is None and args.sft_model_name is None:
+        parser.error("--sft_model_name is required to generate.")
+
+    if args.seed is not None:
+        torch.manual_seed(args.seed)
+
+    if args.merge_shards is not None:
+        # The shards built the preference dataset of the local DPO dialogues, only its size is needed
+        n_samples = len(ut.load_argilla_ds()) + ut.count_local_dpo_samples(args.local_dpo_path, args.cache_dir)
+        n_merged = merge_shards(args.output_file, args.merge_shards, n_samples)
+        print(f"Merged {n_merged} samples of {args.merge_shards} shards into {args.output_file}")
+        return
 
     # Load datasets and model
     print("Loading datasets...")
-    local_dpo = load_local_dpo_dataset(args.local_dpo_path)
-    argilla_ds = load_argilla_ds()
+    local_dpo = ut.load_local_dpo_dataset(args.local_dpo_path, args.cache_dir)
+    argilla_ds = ut.load_argilla_ds()
     print("Loading model...")
     device = "cuda" if torch.cuda.is_available() else "cpu"
-    model, tokenizer = load_sft_model(args.sft_model_name, device)
-
-    # Open output file
-    with open(args.output_file, "w") as f:
-        # Iterate through each sample
-        for idx, sample in enumerate(argilla_ds):
-            prompt = sample["prompt"]
-            positive_answer = sample["chosen"]
-            max_length = len(tokenizer(positive_answer)["input_ids"])
-
-            # Generate negative answer
-            negative_answer = generate_negative_answer(prompt, model, tokenizer, device, max_length)
-
-            # Save result
-            output = {
-                "prompt": prompt,
-                "positive_answer": positive_answer,
-                "negative_answer": negative_answer
-            }
-            f.write(json.dumps(output) + "\n")
-
-            if (idx + 1) % 10 == 0:
-                print(f"Processed {idx + 1} samples...")
-
-    print("Processing complete. Output saved to", args.output_file)
+    if args.tiny_random_model:
+        model, tokenizer = load_tiny_random_model(args.sft_model_name, device)
+    else:
+        model, tokenizer = load_sft_model(args.sft_model_name, device)
+    samples = load_samples([("argilla", argilla_ds), ("local_dpo", local_dpo)], tokenizer, args.cache_dir)
+    n_samples = len(samples["prompt"])
+
+    if args.shard is not None:
+        output_file = get_shard_file(args.output_file, *args.shard)
+        indices = get_shard_indices(n_samples, *args.shard)
+    else:
+        output_file = args.output_file
+        indices = np.arange(n_samples)
+    # A shard always continues its own file
+    if args.resume or args.shard is not None:
+        done = read_done_indices(output_file, samples["prompt"])
+        if done:
+            print(f"Resuming after the {len(done)} samples of {output_file}...")
+            indices = indices[~np.isin(indices, np.fromiter(done, dtype=np.int64, count=len(done)))]
+    else:
+        done = set()
+        open(output_file, "w").close()
+    n_total = len(indices) + len(done)
+
+    # Each window is saved and flushed to disk once generated, so an interrupted run loses at most one window
+    start_time = time.time()
+    processed = 0
+    with JSONLWriter() as writer:
+        for window_indices, answers in generate_negative_answers(
+            samples["prompt"],
+            samples["prompt_len"],
+            samples["chosen_len"],
+            model,
+            tokenizer,
+            device,
+            batch_size=args.batch_size,
+            window_size=args.window_size,
+            indices=indices
+        ):
+            for idx, negative_answer in zip(window_indices, answers):
+                # Save result
+                output = {
+                    "index": idx,
+                    "prompt": samples["prompt"][idx],
+                    "positive_answer": samples["chosen"][idx],
+                    "negative_answer": negative_answer,
+                    "dataset": samples["dataset"][idx]
+                }
+                writer.write(output_file, json.dumps(output))
+            writer.checkpoint()
+            processed += len(answers)
+            print(f"Processed {len(done) + processed}/{n_total} samples ({processed / (time.time() - start_time):.2f} samples/s)...")
+
+    print("Processing complete. Output saved to", output_file)
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,18 @@
 from core.loaders import DPODialogueLoader
-from datasets import Dataset, load_dataset
+from datasets import Dataset, concatenate_datasets, load_dataset
+from datasets.config import HF_DATASETS_CACHE
+from datasets.fingerprint import Hasher
+from datasets.table import InMemoryTable, MemoryMappedTable
+from array import array
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import json
 import numpy as np
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+import tempfile
 
 def format_interaction(previous_turns: list, chosen: str, rejected: str) -> tuple:
     """
@@ -34,83 +46,353 @@ def format_interaction(previous_turns: list, chosen: str, rejected: str) -> tupl
 
     return prompt, formatted_chosen, formatted_rejected
 
-def from_loader_to_pref_std_dataset(loader: DPODialogueLoader):
-    dataset_dict = {
-        "prompt": [],
-        "chosen": [],
-        "rejected": []
-    }
+PREF_SCHEMA = pa.schema([("prompt", pa.string()), ("chosen", pa.string()), ("rejected", pa.string())])
+
+# The pieces of the prompt built by format_interaction, UTF-8 encoded
+BEGIN_OF_TEXT = "<begin_of_text>".encode("utf-8")
+USER_HEADER = "<|start_header_id|>user<|end_header_id|>\n".encode("utf-8")
+ASSISTANT_HEADER = "<|start_header_id|>assistant<|end_header_id|>\n".encode("utf-8")
+EOT = "<|eot_id|>".encode("utf-8")
+
+class _StringColumnBuilder:
+    """
+    Accumulates a UTF-8 string column directly in Arrow layout: one data buffer and int32 offsets.
+    """
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("i", [0])
+
+    def append(self, value: bytes) -> None:
+        self.data += value
+        self.offsets.append(len(self.data))
 
-    for i in range(len(loader)):
-        dpo_turns = loader.get_dpo_turns_by_dialogue_id(loader[i].id)
-        prev_interactions = []
-        for i in range(0, len(dpo_turns)-1):
-            prev_interactions.append(dpo_turns[i].student_question)
-            prev_interactions.append(dpo_turns[i].positive_answer)
-        prev_interactions.append(dpo_turns[-1].student_question)
-        chosen = dpo_turns[-1].positive_answer
-        rejected = dpo_turns[-1].negative_answer
+    def finish(self) -> pa.Array:
+        column = pa.StringArray.from_buffers(len(self.offsets) - 1, pa.py_buffer(self.offsets), pa.py_buffer(bytes(self.data)))
+        self.data = bytearray()
+        self.offsets = array("i", [0])
+        return column
+
+def iter_pref_batches(loader: DPODialogueLoader, batch_size: int = 65536, max_batch_bytes: int = 512 << 20):
+    """
+    Yields the preference pairs of all the DPO dialogues of the loader as Arrow record batches (see PREF_SCHEMA).
 
-        prompt, chosen, rejected = format_interaction(prev_interactions, chosen, rejected)
+    Each DPO tree is walked once, depth first: the conversation so far of a node (its ancestors' questions
+    and chosen answers, already formatted and encoded) is built once and extended by its children, instead
+    of walking up the ancestors and formatting the whole conversation again for every node. The rows are in
+    tree order, and the strings are written straight into the Arrow buffers of the batch.
 
-        dataset_dict["prompt"].append(prompt)
-        dataset_dict["chosen"].append(chosen)
-        dataset_dict["rejected"].append(rejected)
+    Args:
+        loader (DPODialogueLoader): The DPO dialogues, each is read once (lazy loaders decode them in tree order)
+        batch_size (int): Maximum number of rows of a batch
+        max_batch_bytes (int): Size of the strings of a column that closes a batch (checked every 1024 rows), so that
+            its int32 offsets never overflow
+
+    Raises:
+        KeyError: If an ancestor of a DPO dialogue is missing from the loader
+    """
+    columns = {name: _StringColumnBuilder() for name in PREF_SCHEMA.names}
+    prompt = columns["prompt"]
+    n_rows = 0
+    for root in loader.trees.values():
+        # (node, conversation of its ancestors), the root holds no turn
+        stack = [(child, b"") for child in reversed(root["children"].values())]
+        while stack:
+            node, conversation = stack.pop()
+            turn = loader.get_dpo_dialogue_by_id(node["id"]).last_turn
+            question = USER_HEADER + turn.student_question.encode("utf-8") + EOT
+            chosen = turn.positive_answer.encode("utf-8") + EOT
+            prompt.append(BEGIN_OF_TEXT + conversation + question + ASSISTANT_HEADER)
+            columns["chosen"].append(chosen)
+            columns["rejected"].append(turn.negative_answer.encode("utf-8") + EOT)
+            n_rows += 1
+            if node["children"]:
+                conversation += question + ASSISTANT_HEADER + chosen
+                stack.extend((child, conversation) for child in reversed(node["children"].values()))
+            if n_rows == batch_size or (n_rows % 1024 == 0 and max(len(column.data) for column in columns.values()) >= max_batch_bytes):
+                yield pa.RecordBatch.from_arrays([columns[name].finish() for name in PREF_SCHEMA.names], schema=PREF_SCHEMA)
+                n_rows = 0
+    if n_rows:
+        yield pa.RecordBatch.from_arrays([columns[name].finish() for name in PREF_SCHEMA.names], schema=PREF_SCHEMA)
+
+def from_loader_to_pref_std_dataset(loader: DPODialogueLoader, cache_file: str = None, batch_size: int = 65536,
+                                    fingerprint: str = None, metadata: dict = None) -> Dataset:
+    """
+    Builds the preference dataset (prompt, chosen, rejected) of all the DPO dialogues of the loader, see iter_pref_batches.
+
+    Args:
+        loader (DPODialogueLoader): The DPO dialogues
+        cache_file (str, optional): Arrow file the batches are streamed to, the dataset then memory-maps it so
+            that only one batch is held in memory. The file is written aside and renamed once complete, so the
+            processes that memory-map a previous version keep reading it unchanged. Defaults to None (the
+            dataset is kept in memory)
+        batch_size (int, optional): Number of rows of each batch. Defaults to 65536
+        fingerprint (str, optional): Fingerprint of the dataset. Defaults to None (a hash of its content)
+        metadata (dict, optional): str -> str pairs saved in the schema of cache_file. Defaults to None
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    def hash_batches(batches):
+        for batch in batches:
+            for column in batch.columns:
+                for buffer in column.buffers()[1:]: # Offsets and data, there is no validity buffer
+                    digest.update(buffer)
+            yield batch
+
+    batches = iter_pref_batches(loader, batch_size)
+    if fingerprint is None:
+        batches = hash_batches(batches)
+    if cache_file is None:
+        table = InMemoryTable(pa.Table.from_batches(list(batches), schema=PREF_SCHEMA))
+    else:
+        schema = PREF_SCHEMA.with_metadata(metadata) if metadata else PREF_SCHEMA
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(cache_file)), prefix=f"{os.path.basename(cache_file)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as sink, pa.ipc.new_stream(sink, schema) as writer:
+                for batch in batches:
+                    writer.write_batch(batch)
+            # mkstemp creates the file readable by its owner only, the cache gets the mode of a regular
+            # file instead so that the other users loading the dataset can read it
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+            os.replace(tmp_path, cache_file)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        table = MemoryMappedTable.from_file(cache_file)
+    # Fingerprinted by content rather than by path, so that the transforms cached by HF datasets
+    # (e.g. add_token_lengths) are only reused on the same rows
+    return Dataset(table, fingerprint=fingerprint or digest.hexdigest())
+
+def from_parquet_to_pref_std_dataset(parquet_path: str) -> Dataset:
+    """
+    Loads the dpo_pairs table written by the dataset_generation ParquetExporter. The table is converted
+    once to the memory-mapped Arrow cache of HF datasets, and the prompts are formatted in batches on top
+    of it (cached as well), so the DPO dialogues are not rebuilt from the JSONL file.
+    """
+    def format_batch(batch):
+        formatted = {"prompt": [], "chosen": [], "rejected": []}
+        for history, question, chosen, rejected in zip(batch["history"], batch["question"], batch["chosen"], batch["rejected"]):
+            prompt, chosen, rejected = format_interaction(history + [question], chosen, rejected)
+            formatted["prompt"].append(prompt)
+            formatted["chosen"].append(chosen)
+            formatted["rejected"].append(rejected)
+        return formatted
+
+    pairs = Dataset.from_parquet(parquet_path, columns=["history", "question", "chosen", "rejected"])
+    return pairs.map(format_batch, batched=True, remove_columns=pairs.column_names)
+
+# Version of the rows built from the DPO dialogues (format_interaction, iter_pref_batches): bump it when
+# they change, so that the cached preference datasets are rebuilt
+PREF_CACHE_VERSION = "1"
+
+def _file_digest(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _read_pref_cache_metadata(cache_file: str) -> dict:
+    # The metadata saved in the schema of a cached preference dataset, None if there is no readable cache
+    try:
+        with pa.memory_map(cache_file) as source:
+            metadata = pa.ipc.open_stream(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    return {key.decode("utf-8"): value.decode("utf-8") for key, value in metadata.items()}
+
+def _pref_cache_source(dataset_path: str, cached: dict) -> dict:
+    # The metadata of a cache built from dataset_path now. The file is only hashed if its size or mtime
+    # differ from the ones of the cache
+    stat = os.stat(dataset_path)
+    source = {"source_size": str(stat.st_size), "source_mtime_ns": str(stat.st_mtime_ns), "version": PREF_CACHE_VERSION}
+    if cached is not None and all(cached.get(key) == value for key, value in source.items()):
+        source["source_hash"] = cached["source_hash"]
+    else:
+        source["source_hash"] = _file_digest(dataset_path)
+    return source
+
+def _is_pref_cache_valid(cached: dict, source: dict) -> bool:
+    return cached is not None and cached.get("source_hash") == source["source_hash"] and cached.get("version") == PREF_CACHE_VERSION
+
+@contextmanager
+def _file_lock(lock_file: str):
+    # Exclusive lock between the processes of the machine (or of a shared filesystem supporting flock).
+    # The file is opened read-only, so a lock file created by another user can be locked as well
+    fd = os.open(lock_file, os.O_RDONLY | os.O_CREAT, 0o666)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+def _pref_cache_file(dataset_path: str, cache_dir: str = None) -> tuple:
+    # The cache of the preference dataset of dataset_path, and the metadata of a cache built from it now.
+    # The cache is <dataset_path>.pref.arrow, unless cache_dir is given or the directory of the file is not
+    # writable (and holds no up-to-date cache): it is then named after the content hash of the file in
+    # cache_dir (by default a directory of the HF datasets cache)
+    cache_file = f"{dataset_path}.pref.arrow"
+    if cache_dir is None:
+        cached = _read_pref_cache_metadata(cache_file)
+        source = _pref_cache_source(dataset_path, cached)
+        if _is_pref_cache_valid(cached, source) or os.access(os.path.dirname(os.path.abspath(dataset_path)), os.W_OK):
+            return cache_file, source
+        cache_dir = os.path.join(HF_DATASETS_CACHE, "pref_datasets")
+    else:
+        source = _pref_cache_source(dataset_path, None)
+    return os.path.join(cache_dir, f"pref_{source['source_hash']}.arrow"), source
+
+def load_local_dpo_dataset(dataset_path: str, cache_dir: str = None) -> Dataset:
+    """
+    Loads the preference dataset from a DPO dialogues JSONL file, or from the dpo_pairs Parquet table.
+    From the JSONL file, the dataset is written one batch at a time to (and memory-mapped from)
+    <dataset_path>.pref.arrow, so only the DPO dialogues are held in memory. The cache records the size,
+    mtime and content hash of the JSONL file it was built from: it is reused as long as the file has the
+    same size and mtime (without reading it) or the same content (e.g. only touched), and rebuilt otherwise.
+    Processes loading the same file together (e.g. the shards of negative_ans_from_sft.py) build the cache
+    once: the first one builds it while the others wait, and then memory-map it.
+
+    Args:
+        dataset_path (str): The JSONL or Parquet file
+        cache_dir (str, optional): Directory of the cache, named after the content hash of the JSONL file.
+            Defaults to None (next to the JSONL file, or in the HF datasets cache if its directory is read-only)
+    """
+    if dataset_path.endswith(".parquet"):
+        return from_parquet_to_pref_std_dataset(dataset_path)
+    cache_file, source = _pref_cache_file(dataset_path, cache_dir)
+    fingerprint = Hasher.hash([source["source_hash"], PREF_CACHE_VERSION])
+    # The cache is replaced atomically, an up-to-date one is memory-mapped without taking the lock
+    if _is_pref_cache_valid(_read_pref_cache_metadata(cache_file), source):
+        return Dataset(MemoryMappedTable.from_file(cache_file), fingerprint=fingerprint)
+    os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+    with _file_lock(f"{cache_file}.lock"):
+        if _is_pref_cache_valid(_read_pref_cache_metadata(cache_file), source):
+            return Dataset(MemoryMappedTable.from_file(cache_file), fingerprint=fingerprint)
+        loader = DPODialogueLoader(dataset_path)
+        return from_loader_to_pref_std_dataset(loader, cache_file=cache_file, fingerprint=fingerprint, metadata=source)
+
+def count_local_dpo_samples(dataset_path: str, cache_dir: str = None) -> int:
+    """
+    Returns the number of samples of load_local_dpo_dataset(dataset_path, cache_dir) without building the
+    dataset: from the Parquet metadata, or from the cached preference dataset of the JSONL file.
+
+    Raises:
+        ValueError: If the cache is missing or was built from another version of the JSONL file
+    """
+    if dataset_path.endswith(".parquet"):
+        return pq.ParquetFile(dataset_path).metadata.num_rows
+    cache_file, source = _pref_cache_file(dataset_path, cache_dir)
+    if not _is_pref_cache_valid(_read_pref_cache_metadata(cache_file), source):
+        raise ValueError(f"{cache_file} is missing or was built from another version of {dataset_path}, "
+                         f"see load_local_dpo_dataset.")
+    with pa.memory_map(cache_file) as source:
+        return sum(batch.num_rows for batch in pa.ipc.open_stream(source))
+
+LENGTH_COLUMNS = ["prompt_len", "chosen_len", "rejected_len"]
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """
+    Returns a hash of everything that determines the token ids of a tokenizer: the full serialized
+    pipeline of a fast tokenizer (normalizer, model, post-processor adding the special tokens...), the
+    vocabulary of a slow one.
+    """
+    if getattr(tokenizer, "is_fast", False):
+        state = tokenizer.backend_tokenizer.to_str()
+    else:
+        state = json.dumps(tokenizer.get_vocab(), sort_keys=True)
+    return hashlib.sha256(f"{type(tokenizer).__name__}\0{state}".encode("utf-8")).hexdigest()[:16]
+
+def _token_lengths(batch: dict, tokenizer) -> dict:
+    lengths = {}
+    for column in ["prompt", "chosen", "rejected"]:
+        encoded = tokenizer(batch[column], return_attention_mask=False, return_length=True)
+        lengths[f"{column}_len"] = encoded["length"]
+    return lengths
+
+def add_token_lengths(dataset: Dataset, tokenizer, num_proc: int = None, batch_size: int = 1000, cache_dir: str = None) -> Dataset:
+    """
+    Adds the prompt_len, chosen_len and rejected_len columns: the number of tokens of each string, as
+    len(tokenizer.encode(string)). The strings are tokenized in batches (one call per batch, parallel in a
+    fast tokenizer), over num_proc worker processes.
+    The result is cached by HF datasets under a fingerprint of the dataset and of the tokenizer, so a later
+    launch on the same data with the same tokenizer loads the lengths instead of tokenizing again. The
+    cache lives in cache_dir if given, otherwise next to the dataset's cache files, or in the HF datasets
+    cache directory for in-memory datasets (e.g. load_argilla_ds, merge_datasets), which have none.
 
-    return Dataset.from_dict(dataset_dict)
+    Args:
+        dataset (Dataset): Preference dataset with prompt, chosen and rejected columns
+        tokenizer: The tokenizer of the model
+        num_proc (int, optional): Number of worker processes. Defaults to None (this process)
+        batch_size (int, optional): Number of rows tokenized per call. Defaults to 1000
+        cache_dir (str, optional): Directory of the cached lengths. Defaults to None (the dataset's cache directory)
 
-def load_local_dpo_dataset(dataset_path: str) -> Dataset:
-    loader = DPODialogueLoader(dataset_path)
-    trl_compatible_dataset = from_loader_to_pref_std_dataset(loader)
-    return trl_compatible_dataset
+    Returns:
+        Dataset: The dataset with the length columns, unchanged if it already has them.
+    """
+    if all(column in dataset.column_names for column in LENGTH_COLUMNS):
+        return dataset
+    # Explicit fingerprint, so that the tokenizer is not hashed by value (slow and unstable across runs)
+    fingerprint = Hasher.hash([dataset._fingerprint, tokenizer_fingerprint(tokenizer), "token_lengths"])
+    if cache_dir is None and not dataset.cache_files:
+        cache_dir = os.path.join(HF_DATASETS_CACHE, "token_lengths")
+    cache_file_name = None
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_file_name = os.path.join(cache_dir, f"token_lengths_{fingerprint}.arrow")
+    return dataset.map(
+        _token_lengths,
+        fn_kwargs={"tokenizer": tokenizer},
+        batched=True,
+        batch_size=batch_size,
+        num_proc=num_proc,
+        cache_file_name=cache_file_name,
+        new_fingerprint=fingerprint,
+        desc="Counting tokens"
+    )
 
-def filter_dataset_mad(dataset, tokenizer, threshold=3.5):
-    chosen_lengths = [len(tokenizer.encode(chosen)) for chosen in dataset["chosen"]]
-    rejected_lengths = [len(tokenizer.encode(rejected)) for rejected in dataset["rejected"]]
-    prompt_lengths = [len(tokenizer.encode(prompt)) for prompt in dataset["prompt"]]
+def _token_length_arrays(dataset: Dataset) -> tuple:
+    # Read as one Arrow table, the rows of a shuffled or selected dataset included
+    lengths = dataset.select_columns(LENGTH_COLUMNS).with_format("arrow")[:]
+    return tuple(lengths.column(column).to_numpy() for column in LENGTH_COLUMNS)
 
-    max_lengths = [max(chosen_lengths[i], rejected_lengths[i], prompt_lengths[i]) for i in range(len(chosen_lengths))]
+def filter_dataset_mad(dataset, tokenizer, threshold=3.5, num_proc=None, cache_dir=None):
+    """
+    Drops the samples whose longest string (in tokens) is an outlier by modified z-score.
+    The returned dataset keeps the token length columns (see add_token_lengths, cache_dir included).
+    """
+    dataset = add_token_lengths(dataset, tokenizer, num_proc=num_proc, cache_dir=cache_dir)
+    prompt_lengths, chosen_lengths, rejected_lengths = _token_length_arrays(dataset)
+    max_lengths = np.maximum(np.maximum(chosen_lengths, rejected_lengths), prompt_lengths)
 
     # Computing the MAD of the chosen lenghts
     # https://www.statology.org/modified-z-score/
-    mad = np.median(np.abs(np.median(max_lengths) - np.array(max_lengths)))
-    mod_z_scores = [0.6745 * (x - np.median(max_lengths)) / mad for x in max_lengths]
+    median = np.median(max_lengths)
+    mad = np.median(np.abs(median - max_lengths))
+    mod_z_scores = 0.6745 * (max_lengths - median) / mad
     # Ideally we should use eliminate < -3.5 and > 3.5 so it would be np.abs(mod_z_scores) > threshold
     # But we don't really care about the samples that are too short as they do fit in memory
-    mask = np.array(mod_z_scores) < threshold
+    mask = mod_z_scores < threshold
 
-    # Creating a new dataset with the filtered samples
-    new_dataset = {
-        "prompt": [dataset["prompt"][i] for i in range(len(dataset["prompt"])) if mask[i]],
-        "chosen": [dataset["chosen"][i] for i in range(len(dataset["chosen"])) if mask[i]],
-        "rejected": [dataset["rejected"][i] for i in range(len(dataset["rejected"])) if mask[i]]
-    }
+    return dataset.select(np.flatnonzero(mask))
 
-    return Dataset.from_dict(new_dataset)
-
-def filter_dataset_by_length(dataset, tokenizer, max_length=None):
+def filter_dataset_by_length(dataset, tokenizer, max_length=None, num_proc=None, cache_dir=None):
+    """
+    Drops the samples whose prompt plus longest answer exceeds max_length tokens.
+    The returned dataset keeps the token length columns (see add_token_lengths, cache_dir included).
+    """
     if not max_length:
         return dataset
 
-    # Vectorize tokenization
-    chosen_lengths = np.array([len(tokenizer.encode(chosen)) for chosen in dataset["chosen"]])
-    rejected_lengths = np.array([len(tokenizer.encode(rejected)) for rejected in dataset["rejected"]])
-    prompt_lengths = np.array([len(tokenizer.encode(prompt)) for prompt in dataset["prompt"]])
-
-    # Vectorized max operation
+    dataset = add_token_lengths(dataset, tokenizer, num_proc=num_proc, cache_dir=cache_dir)
+    prompt_lengths, chosen_lengths, rejected_lengths = _token_length_arrays(dataset)
     max_lengths = np.maximum(chosen_lengths, rejected_lengths) + prompt_lengths
 
-    # Create mask using numpy comparison
     mask = max_lengths <= max_length
 
-    # Filter using numpy boolean indexing
-    new_dataset = {
-        "prompt": np.array(dataset["prompt"])[mask].tolist(),
-        "chosen": np.array(dataset["chosen"])[mask].tolist(),
-        "rejected": np.array(dataset["rejected"])[mask].tolist()
-    }
-
-    return Dataset.from_dict(new_dataset)
+    return dataset.select(np.flatnonzero(mask))
 
 def load_argilla_ds():
     # Loading it
@@ -131,7 +413,7 @@ def load_argilla_ds():
     accepted_columns = set(["prompt", "chosen", "rejected"])
     all_columns = set(train_argilla.column_names)
     columns_to_remove = all_columns - accepted_columns
-    train_argilla = train_argilla.remove_columns(list(columns_to_remove))
+    train_argilla = train_argilla.remove_columns(sorted(columns_to_remove)) # Sorted, the fingerprint depends on the order
 
     # Formatting the dataset using the format_interaction function
     new_ds_dict = {
@@ -145,45 +427,45 @@ def load_argilla_ds():
         new_ds_dict["prompt"].append(prompt)
         new_ds_dict["chosen"].append(chosen)
         new_ds_dict["rejected"].append(rejected)
-    
-    return Dataset.from_dict(new_ds_dict)
 
-def merge_datasets(original_dpo: Dataset, perc_original: float, *datasets: Dataset):
-    """
-    Merges datasets with optimized performance using numpy operations.
-    Args remain the same as original function.
+    # Fingerprinted after the source rows rather than at random, so that the transforms cached by
+    # HF datasets (e.g. add_token_lengths) are reused by the next launches
+    fingerprint = Hasher.hash([train_argilla._fingerprint, PREF_CACHE_VERSION])
+    return Dataset(InMemoryTable.from_pydict(new_ds_dict), fingerprint=fingerprint)
+
+def merge_datasets(original_dpo: Dataset, perc_original: float, *datasets: Dataset, seed: int = None) -> Dataset:
     """
-    # Convert original dataset to numpy arrays for faster operations
-    final_dataset = {
-        "prompt": list(original_dpo["prompt"]),
-        "chosen": list(original_dpo["chosen"]),
-        "rejected": list(original_dpo["rejected"])
-    }
+    Mixes the original DPO dataset with samples of other preference datasets, so that the original rows
+    make up perc_original of the result (or as much as the other datasets allow).
+    The samples are drawn as indices first and taken with Dataset.select, then everything is joined with
+    concatenate_datasets: the rows stay in the Arrow tables (behind an indices mapping), no text is copied
+    into Python or NumPy.
 
-    # Concatenate all other datasets efficiently
-    other_prompts = []
-    other_chosen = []
-    other_rejected = []
-    
-    for ds in datasets:
-        other_prompts.extend(ds["prompt"])
-        other_chosen.extend(ds["chosen"])
-        other_rejected.extend(ds["rejected"])
+    Args:
+        original_dpo (Dataset): The original preference dataset, kept entirely and first
+        perc_original (float): Fraction of the result made of original rows, in (0, 1]
+        *datasets (Dataset): The preference datasets to sample from, as if concatenated
+        seed (int, optional): Seed of the sampling, the same seed picks the same rows. Defaults to None (random)
+
+    Returns:
+        Dataset: The prompt, chosen and rejected columns of the original rows followed by the sampled ones.
+    """
+    columns = ["prompt", "chosen", "rejected"]
+    original = original_dpo.select_columns(columns)
+    others = [dataset.select_columns(columns) for dataset in datasets]
+    # concatenate_datasets needs identical features, e.g. string and large_string columns are cast
+    others = [dataset if dataset.features == original.features else dataset.cast(original.features) for dataset in others]
+    n_others = sum(len(dataset) for dataset in others)
 
     # Calculate samples to pick
-    n_original = len(original_dpo["prompt"])
+    n_original = len(original)
     n_samples_to_pick = min(
         int(n_original * ((1 - perc_original) / perc_original)),
-        len(other_prompts)
+        n_others
     )
+    if n_samples_to_pick <= 0:
+        return original
 
-    if n_samples_to_pick > 0:
-        # Use numpy's efficient random selection
-        indices = np.random.choice(len(other_prompts), n_samples_to_pick, replace=False)
-        
-        # Extend final dataset with selected samples
-        final_dataset["prompt"].extend(np.array(other_prompts)[indices])
-        final_dataset["chosen"].extend(np.array(other_chosen)[indices])
-        final_dataset["rejected"].extend(np.array(other_rejected)[indices])
-
-    return Dataset.from_dict(final_dataset)
+    indices = np.random.default_rng(seed).choice(n_others, n_samples_to_pick, replace=False)
+    sampled = concatenate_datasets(others).select(indices)
+    return concatenate_datasets([original, sampled])
@@ -26,7 +26,9 @@ def parse_args():
 
 def load_dataset(path: str) -> Dataset:
     """
-    This function loads the dataset from the given path.
+    This function loads the dataset from the given path: a JSON list of conversations, or the
+    dialogues table (.parquet) exported by the dataset_generation ParquetExporter, whose "messages"
+    column holds the conversations. The Parquet table is memory-mapped through the HF datasets cache.
     """
     def format_prompt(sample_conversation):
         """
@@ -50,6 +52,15 @@ def load_dataset(path: str) -> Dataset:
             prompt += f"<|start_header_id|>{turn['role']}<|end_header_id|>\n{turn['content']}<|eot_id|>"
         return prompt
     
+    if path.endswith(".parquet"):
+        conversations = Dataset.from_parquet(path, columns=["messages"])
+        dataset = conversations.map(
+            lambda batch: {"prompt": [format_prompt(sample_conversation) for sample_conversation in batch["messages"]]},
+            batched=True,
+            remove_columns=conversations.column_names
+        ).shuffle()
+        return dataset
+
     data = json.load(open(path))
     formatted_data = {"prompt": [format_prompt(sample_conversation) for sample_conversation in data]}
     dataset = Dataset.from_dict(formatted_data).shuffle()